@@ -1,5 +1,5 @@
 from django.urls import path
-from bhtom2.bhtom_calibration.views import CalibrationResultsApiView, GetCatalogsApiView, GetCpcsArchiveDataApiView,GetAlertLCDataView,\
+from bhtom2.bhtom_calibration.views import CalibrationResultsApiView, GetCatalogsApiView, GetCpcsArchiveDataApiView,GetAlertLCDataView, GetAlertsLCDataView,\
       RestartCalibrationApiView, RestartCalibrationByTargetApiView, RestartCalibrationByDataProductApiView
 
 app_name = 'bhtom2.bhtom_calibration'
@@ -11,5 +11,6 @@ urlpatterns = [
     path('get-catalogs/',GetCatalogsApiView.as_view()),
     path('get-cpcs-archive/', GetCpcsArchiveDataApiView.as_view()),
     path('get_alert_lc_data/',GetAlertLCDataView.as_view()),
+    path('get_alerts_lc_data/', GetAlertsLCDataView.as_view()),
     
 ]
\ No newline at end of file
@@ -7,16 +7,26 @@ from rest_framework.exceptions import PermissionDenied
 from rest_framework.authtoken.models import Token
 from rest_framework import status
 import base64
-from django.db.models import Q
+import hashlib
+import pyarrow.compute as pc
+from itertools import groupby
+from operator import itemgetter
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.db.models import Case, FloatField, OuterRef, Q, Subquery, Value, When
+from django.utils.http import parse_etags, quote_etag
 from django_guid import get_guid
 from bhtom2.bhtom_calibration.models import Calibration_data
 from django.core import serializers
 from bhtom2.bhtom_calibration.models import Catalogs as calibration_catalog
-from bhtom_base.bhtom_dataproducts.models import DataProduct, ReducedDatum, CCDPhotJob
+from bhtom_base.bhtom_dataproducts.models import DataProduct, ReducedDatum, ReducedDatumUnit, CCDPhotJob
 from bhtom_base.bhtom_targets.models import Target
 from bhtom2.utils.api_pagination import StandardResultsSetPagination
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from bhtom2.utils.bhtom_logger import BHTOMLogger
+from bhtom2.utils.light_curve_store import get_data_products, get_light_curve
+from bhtom2.utils.reduced_data_utils import table_rows
+from bhtom2.utils.target_cache import get_target_version
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 import json
@@ -244,73 +254,201 @@ class GetAlertLCDataView(APIView):
             logger.error(f"Target does not exist with name: {alert_name}")
             return Response(f"You need to provide correct alert_name, target does not exist in db", status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            # Define a regular expression pattern to match the format
-            pattern = re.compile(r'(\w+)\((\w+)\)')
+        etag = self.get_etag(target, alert_name)
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match and (etag in parse_etags(if_none_match) or '*' in parse_etags(if_none_match)):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            response['ETag'] = etag
+            return response
 
-            data = ReducedDatum.objects.filter(target=target, value_unit="MAG").values_list(
-                'id', 'mjd', 'value', 'error', 'filter', 'data_product__observatory__id',
-                'data_product__observatory__observatory__name', 'data_product', 'source_location'
-            )
+        try:
+            data = alert_light_curve_rows(target.pk)
 
-            test = ReducedDatum.objects.filter(target=target, value_unit="MAG").values_list(
-                'id', 'mjd', 'value', 'error', 'filter', 'data_product__observatory__id',
-                'data_product__observatory__observatory__name', 'data_product', 'source_location'
-            )
-        
-            caliberrs = [self.get_caliberr(reduce_datum) for reduce_datum in data]
-            try:
-                ids, mjds, mags, magerrs, bhtom_filters, obsids, obsnames, dp, source = zip(*data)
-            except Exception as e:
+            if not data:
                 logger.error("No data for this alert!") 
                 return Response('No data for this alert!', status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            # Parse filters and catalogs
-            filters, catalogs = self.parse_filters(bhtom_filters, pattern)
-
-            lc_hash = {
-                'alert_name': alert_name,
-                'mjd': list(mjds),
-                'mag': list(mags),
-                'magerr': list(magerrs),
-                'caliberr': caliberrs,
-                'filter': filters,
-                'catalog': catalogs,
-                'observatory_id': list(obsids),
-                'observatory': list(obsnames),
-                'id': list(ids),
-            }
+
+            lc_hash = build_lc_hash(alert_name, data)
 
         except Exception as e:
             logger.error(f"Error while getting reduced data: {str(e)}")
             return Response('Oops something went wrong: ' + str(e), status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        return Response(lc_hash, status=status.HTTP_200_OK)
+        response = Response(lc_hash, status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        return response
+
+    def get_etag(self, target, alert_name):
+        """
+        Weak ETag of the light curve: the target version, which database triggers bump whenever the target, its
+        datums or the calibrations of its data products are written by any writer (CPCS included). Renaming an
+        observatory does not change it.
+        """
+        version = get_target_version(target.pk)
+        return 'W/' + quote_etag(hashlib.sha1(f'{target.pk}:{alert_name}:{version}'.encode()).hexdigest())
+
+
+# Define a regular expression pattern to match the format
+FILTER_PATTERN = re.compile(r'(\w+)\((\w+)\)')
+
+LC_FIELDS = ('id', 'mjd', 'value', 'error', 'filter', 'data_product__observatory__id',
+             'data_product__observatory__observatory__name', 'caliberr')
+
+# most targets a batch light curve request may ask for
+MAX_BATCH_LIGHT_CURVES = 1000
+
+
+def parse_filters(bhtom_filters):
+    """
+    Splits filters of the form 'name(catalog)' into filters and catalogs. Each distinct filter
+    is matched once, a light curve has only a few of them.
+    """
+    parsed = {}
+    for filter_value in set(bhtom_filters):
+        match = FILTER_PATTERN.match(filter_value) if filter_value is not None else None
+        if match:
+            parsed[filter_value] = (match.group(1), match.group(2))
+        else:
+            parsed[filter_value] = (filter_value, None)
+
+    filters = [parsed[filter_value][0] for filter_value in bhtom_filters]
+    catalogs = [parsed[filter_value][1] for filter_value in bhtom_filters]
+    return filters, catalogs
+
+
+def alert_light_curve_data(target_ids):
+    """
+    Magnitudes of the targets, annotated with caliberr: the scatter of the CPCS calibration
+    of the data product, for CPCS points only.
+    """
+    scatter = Calibration_data.objects.filter(dataproduct=OuterRef('data_product')) \
+        .order_by('-id').values('scatter')[:1]
+
+    return ReducedDatum.objects.filter(target_id__in=target_ids, value_unit="MAG").annotate(
+        caliberr=Case(When(source_location='cpcs', then=Subquery(scatter)),
+                      default=Value(None), output_field=FloatField())
+    )
 
-    def get_caliberr(self, reduce_datum):
-        caliberr = None
-        if reduce_datum[-1] == 'cpcs':
-            try:
-                caliberr = Calibration_data.objects.get(dataproduct=reduce_datum[-2]).scatter
-            except Calibration_data.DoesNotExist as e:
-                logger.error(f"There is no Calibration_data for DataProduct: {reduce_datum.data_product.id}, {str(e)}")
-        return caliberr
-
-    def parse_filters(self, bhtom_filters, pattern):
-        filters = []
-        catalogs = []
-
-        for filter_value in bhtom_filters:
-            match = pattern.match(filter_value)
-            if match:
-                filter_name = match.group(1)
-                catalog_name = match.group(2)
-                filters.append(filter_name)
-                catalogs.append(catalog_name)
-            else:
-                filters.append(filter_value)
-                catalogs.append(None)
 
-        return filters, catalogs
+def alert_light_curve_rows(target_id):
+    """
+    Rows of LC_FIELDS of one target ordered by mjd, read from the light-curve store: the observatories of the
+    data products and the latest calibration scatter of the CPCS ones are looked up with one query each.
+    """
+    table = get_light_curve(target_id, units=[ReducedDatumUnit.MAGNITUDE], active_only=False)
+    observatories = get_data_products(table, 'observatory__id', 'observatory__observatory__name')
+    cpcs_ids = pc.unique(table.filter(pc.equal(table.column('source_location'), 'cpcs'))
+                         .column('data_product_id').drop_null()).to_pylist()
+    scatters = dict(Calibration_data.objects.filter(dataproduct_id__in=cpcs_ids)
+                    .order_by('dataproduct_id', '-id').distinct('dataproduct_id')
+                    .values_list('dataproduct_id', 'scatter')) if cpcs_ids else {}
+
+    return [(datum_id, mjd, value, error, filter) + observatories.get(data_product_id, (None, None)) +
+            (scatters.get(data_product_id) if source_location == 'cpcs' else None,)
+            for datum_id, mjd, value, error, filter, data_product_id, source_location
+            in table_rows(table, ('id', 'mjd', 'value', 'error', 'filter', 'data_product_id', 'source_location'))]
+
+
+def build_lc_hash(alert_name, rows):
+    """
+    The light curve of one alert from rows of LC_FIELDS.
+    """
+    ids, mjds, mags, magerrs, bhtom_filters, obsids, obsnames, caliberrs = zip(*rows) if rows else ((),) * 8
+    # Parse filters and catalogs
+    filters, catalogs = parse_filters(bhtom_filters)
+
+    return {
+        'alert_name': alert_name,
+        'mjd': list(mjds),
+        'mag': list(mags),
+        'magerr': list(magerrs),
+        'caliberr': list(caliberrs),
+        'filter': filters,
+        'catalog': catalogs,
+        'observatory_id': list(obsids),
+        'observatory': list(obsnames),
+        'id': list(ids),
+    }
+
+
+class GetAlertsLCDataView(APIView):
+    """
+    Batch variant of GetAlertLCDataView: the light curves of many alerts, read with one ordered scan
+    and streamed per target as a JSON document or as NDJSON (one lc_hash per line).
+    """
+
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'alert_names': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING),
+                                              description='Names of the alerts.'),
+                'target_ids': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER),
+                                             description='Ids of the targets.'),
+                'format': openapi.Schema(type=openapi.TYPE_STRING, enum=['json', 'ndjson'],
+                                         description='Response format, default json.'),
+            },
+        ),
+    )
+    def post(self, request):
+        alert_names = request.data.get('alert_names') or []
+        target_ids = request.data.get('target_ids') or []
+
+        if not isinstance(alert_names, list) or not isinstance(target_ids, list):
+            return Response("alert_names and target_ids must be lists", status=status.HTTP_400_BAD_REQUEST)
+        if not alert_names and not target_ids:
+            return Response("You need to provide alert_names or target_ids", status=status.HTTP_400_BAD_REQUEST)
+        if len(alert_names) + len(target_ids) > MAX_BATCH_LIGHT_CURVES:
+            return Response(f"You can request at most {MAX_BATCH_LIGHT_CURVES} light curves",
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            alert_names = [str(name) for name in alert_names]
+            target_ids = [int(target_id) for target_id in target_ids]
+        except (TypeError, ValueError):
+            return Response("target_ids must be integers", status=status.HTTP_400_BAD_REQUEST)
+
+        targets = dict(Target.objects.filter(Q(name__in=alert_names) | Q(pk__in=target_ids))
+                       .values_list('id', 'name'))
+        found_names = set(targets.values())
+        not_found = [name for name in alert_names if name not in found_names] + \
+                    [str(target_id) for target_id in target_ids if target_id not in targets]
+
+        ndjson = request.data.get('format') == 'ndjson' or 'application/x-ndjson' in request.META.get('HTTP_ACCEPT', '')
+        logger.info(f"Batch light curves of {len(targets)} targets, {len(not_found)} not found")
+
+        rows = alert_light_curve_data(list(targets)).order_by('target_id', 'mjd', 'id') \
+            .values_list('target_id', *LC_FIELDS).iterator(chunk_size=2000)
+        light_curves = self.light_curves(targets, rows)
+
+        if ndjson:
+            return StreamingHttpResponse(self.ndjson_stream(light_curves, not_found),
+                                         content_type='application/x-ndjson')
+        return StreamingHttpResponse(self.json_stream(light_curves, not_found), content_type='application/json')
+
+    def light_curves(self, targets, rows):
+        """
+        Groups the rows, ordered by target id, into one lc_hash per target; targets without data get empty lists.
+        """
+        groups = groupby(rows, key=itemgetter(0))
+        group = next(groups, None)
+        for target_id in sorted(targets):
+            target_rows = []
+            if group is not None and group[0] == target_id:
+                target_rows = [row[1:] for row in group[1]]
+                group = next(groups, None)
+            yield build_lc_hash(targets[target_id], target_rows)
+
+    def json_stream(self, light_curves, not_found):
+        yield '{"not_found": %s, "light_curves": [' % json.dumps(not_found)
+        for i, lc_hash in enumerate(light_curves):
+            yield (',' if i else '') + json.dumps(lc_hash, cls=DjangoJSONEncoder)
+        yield ']}'
+
+    def ndjson_stream(self, light_curves, not_found):
+        for name in not_found:
+            yield json.dumps({'alert_name': name, 'error': 'target does not exist in db'}) + '\n'
+        for lc_hash in light_curves:
+            yield json.dumps(lc_hash, cls=DjangoJSONEncoder) + '\n'
 
 
 class RestartCalibrationByTargetApiView(APIView):
@@ -2,7 +2,7 @@ from django.urls import path
 
 from bhtom2.bhtom_common.views import GetDataProductApi, DataListView, ReloadFits, ReloadPhotometry, \
      DeletePointAndRestartProcess, UpdateFits, ReloadPhotometryWithFits, NewsletterView, DataListCompletedView, CommentAPIView,DataListCCDPHOTErrorView, \
-     DataListInProgressView, DataListInCalibView, DataListCPCSErrorView, DataListCPCSLimitView, GetReducedDataApi  ,DeleteReduceDatumApiView, \
+     DataListInProgressView, DataListInCalibView, DataListCPCSErrorView, DataListCPCSLimitView, GetReducedDataApi  ,GetReducedDataChangesApi, DeleteReduceDatumApiView, \
           DeactivateReduceDatumApiView, DeleteDataProductApiView, GetUsersDetails,ChangeObserversView,GetPhotometryFile
 
 from bhtom_base.bhtom_common.api_router import SharedAPIRootRouter
@@ -28,6 +28,7 @@ urlpatterns = [
      path('api/data/', GetDataProductApi.as_view(), name='data_api'),
      path('api/deleteDataProduct/', DeleteDataProductApiView.as_view()),
      path('api/reducedDatum/', GetReducedDataApi.as_view(), name='reduced_datum'),
+     path('api/reducedDatumChanges/', GetReducedDataChangesApi.as_view(), name='reduced_datum_changes'),
      path('api/deleteReducedDatum/', DeleteReduceDatumApiView.as_view()),
      path('api/deactivateReducedDatum/',DeactivateReduceDatumApiView.as_view()),
      path('newsletter/', NewsletterView.as_view(), name='newsletter'),
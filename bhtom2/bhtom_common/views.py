@@ -8,6 +8,7 @@ from django.http import FileResponse
 from django.views.generic import TemplateView
 from django.http import HttpResponseRedirect
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django_guid import get_guid
 from rest_framework.authtoken.models import Token
 from django.shortcuts import redirect
@@ -23,6 +24,7 @@ from bhtom2.bhtom_common.forms import UpdateFitsForm
 from bhtom2.kafka.producer.calibEvent import CalibCreateEventProducer
 from bhtom2.utils.bhtom_logger import BHTOMLogger
 from bhtom2.utils.api_pagination import StandardResultsSetPagination
+from bhtom2.utils.reduced_datum_sync import changes_since
 from django_tables2.views import SingleTableMixin
 from bhtom_base.bhtom_dataproducts.models import DataProduct, ReducedDatum, CCDPhotJob
 from django.contrib import messages
@@ -740,6 +742,11 @@ class GetDataProductApi(views.APIView):
                 'mjd_min': openapi.Schema(type=openapi.TYPE_NUMBER),
                 'mjd_max': openapi.Schema(type=openapi.TYPE_NUMBER),
                 'page': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'cursor': openapi.Schema(type=openapi.TYPE_STRING,
+                                         description='Keyset pagination: send an empty cursor for the first page, '
+                                                     'then the returned next_cursor. Replaces page.'),
+                'with_count': openapi.Schema(type=openapi.TYPE_BOOLEAN,
+                                             description='Return the total count in cursor mode'),
             },
             required=[]
         ),
@@ -822,6 +829,12 @@ class GetDataProductApi(views.APIView):
         queryset = DataProduct.objects.filter(query).distinct().order_by('-created')
 
         page_size = 500 if not request.user.is_staff else 1000
+
+        if self.pagination_class.is_cursor_request(request):
+            pagination = self.pagination_class()
+            data_products = pagination.paginate_queryset_by_cursor(queryset, request, ('-created', '-id'), page_size)
+            return pagination.get_cursor_paginated_response(self.serializer_class(data_products, many=True).data)
+
         paginator = Paginator(queryset, page_size)
 
         try:
@@ -899,6 +912,11 @@ class GetReducedDataApi(views.APIView):
             properties={
                 'target_id': openapi.Schema(type=openapi.TYPE_INTEGER),
                 'target_name': openapi.Schema(type=openapi.TYPE_STRING),
+                'cursor': openapi.Schema(type=openapi.TYPE_STRING,
+                                         description='Keyset pagination: send an empty cursor for the first page, '
+                                                     'then the returned next_cursor. Replaces page.'),
+                'with_count': openapi.Schema(type=openapi.TYPE_BOOLEAN,
+                                             description='Return the total count in cursor mode'),
             },
             required=[]  # Optional fields
         ),
@@ -938,6 +956,12 @@ class GetReducedDataApi(views.APIView):
         queryset = ReducedDatum.objects.filter(target_id=target_id).distinct()
 
         page_size = 1000 if request.user.is_staff else 500
+
+        if self.pagination_class.is_cursor_request(request):
+            pagination = self.pagination_class()
+            reduced_data = pagination.paginate_queryset_by_cursor(queryset, request, ('mjd', 'id'), page_size)
+            return pagination.get_cursor_paginated_response(self.serializer_class(reduced_data, many=True).data)
+
         paginator = Paginator(queryset, page_size)
 
         try:
@@ -955,6 +979,100 @@ class GetReducedDataApi(views.APIView):
         }, status=status.HTTP_200_OK)
 
 
+class GetReducedDataChangesApi(views.APIView):
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    serializer_class = ReducedDataSerializer
+
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'target_ids': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER)),
+                'target_names': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING)),
+                'watermark': openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'last_id': openapi.Schema(type=openapi.TYPE_INTEGER, description='Last seen datum id'),
+                        'modified': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME,
+                                                   description='Start time of the previous sync'),
+                        'cursor': openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                'modified': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+                                'datum_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                            },
+                            description='Position in the changes, set while has_more is true'),
+                    },
+                    description='Watermark returned by the previous call, empty for a full sync'),
+            },
+            required=[]
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                name='Authorization',
+                in_=openapi.IN_HEADER,
+                type=openapi.TYPE_STRING,
+                required=True,
+                description='Token <Your Token>'
+            ),
+        ],
+    )
+    def post(self, request):
+        target_ids = request.data.get('target_ids') or []
+        target_names = request.data.get('target_names') or []
+        watermark = request.data.get('watermark') or {}
+
+        if not isinstance(target_ids, list) or not isinstance(target_names, list) or not isinstance(watermark, dict):
+            return Response({"error": "target_ids and target_names must be lists, watermark an object."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not target_ids and not target_names:
+            return Response({"error": "Provide 'target_ids' or 'target_names'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            last_id = watermark.get('last_id')
+            last_id = int(last_id) if last_id is not None else None
+            modified = self.parse_time(watermark.get('modified'))
+            cursor = watermark.get('cursor')
+            if cursor is not None:
+                cursor = (self.parse_time(cursor['modified']), int(cursor['datum_id']))
+                if cursor[0] is None:
+                    raise ValueError('cursor')
+            if last_id is None and (modified is not None or cursor is not None):
+                # inserted datums are found by id only
+                raise ValueError('last_id')
+        except (TypeError, ValueError, KeyError):
+            return Response({"error": "Invalid watermark."}, status=status.HTTP_400_BAD_REQUEST)
+
+        targets = Target.objects.filter(Q(pk__in=[int(target_id) for target_id in target_ids if str(target_id).isdigit()])
+                                        | Q(name__in=target_names)).values_list('id', flat=True)
+        target_ids = list(targets)
+        if not target_ids:
+            return Response({"error": "Target does not exist."}, status=status.HTTP_404_NOT_FOUND)
+
+        result = changes_since(target_ids, last_id=last_id, modified=modified, cursor=cursor)
+
+        return Response({
+            'inserted': self.serializer_class(result['inserted'], many=True).data,
+            'updated': self.serializer_class(result['updated'], many=True).data,
+            'deactivated': result['deactivated'],
+            'deleted': result['deleted'],
+            'watermark': result['watermark'],
+            'has_more': result['has_more'],
+        }, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def parse_time(value):
+        if value is None:
+            return None
+        parsed = parse_datetime(str(value))
+        if parsed is None:
+            raise ValueError(value)
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, timezone.utc)
+        return parsed
+
+
 class NewsletterView(LoginRequiredMixin, TemplateView):
     template_name = 'bhtom_common/newsletter.html'
 
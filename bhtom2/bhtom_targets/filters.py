@@ -1,10 +1,11 @@
 from django.conf import settings
-from django.db.models import Q
+from django.db.models import F, Q
 import django_filters
 
 from django.core.exceptions import ValidationError
 from bhtom_base.bhtom_targets.models import Target, TargetList
-from bhtom_base.bhtom_targets.utils import cone_search_filter
+from bhtom2.utils.name_resolver import filter_by_name, resolve_target
+from bhtom2.utils.sky_index import cone_search_filter
 from django.contrib import messages
 
 CLASSIFICATION_TYPES = settings.CLASSIFICATION_TYPES
@@ -24,6 +25,18 @@ def filter_for_field(field):
         )
 
 
+class NullsLastOrderingFilter(django_filters.OrderingFilter):
+    """
+    Puts the targets without a value last in both directions (Postgres sorts NULLs first in descending order).
+    """
+
+    def get_ordering_value(self, param):
+        value = super().get_ordering_value(param)
+        if value.startswith('-'):
+            return F(value[1:]).desc(nulls_last=True)
+        return F(value).asc(nulls_last=True)
+
+
 def filter_number(queryset, name, value):
     if value.start and value.stop:
         return queryset.filter(
@@ -74,7 +87,7 @@ class TargetFilter(django_filters.FilterSet):
                     self.form.fields[flag].initial = True
 
     def filter_name(self, queryset, name, value):
-        return queryset.filter(Q(name__icontains=value) | Q(aliases__name__icontains=value)).distinct()
+        return filter_by_name(queryset, value)
    
     def filter_description(self, queryset, description, value):
         return queryset.filter(Q(description__icontains=value)).distinct()
@@ -149,6 +162,26 @@ class TargetFilter(django_filters.FilterSet):
         elif value.stop is not None:
             return queryset.filter(Q(mag_last__lte=value.stop))
 
+    def filter_microlensing_score(self, queryset, name, value):
+
+        if value.start is not None and value.stop is not None:
+            return queryset.filter(Q(microlensing_screening__score__gte=value.start) &
+                                   Q(microlensing_screening__score__lte=value.stop))
+        elif value.start is not None:
+            return queryset.filter(Q(microlensing_screening__score__gte=value.start))
+        elif value.stop is not None:
+            return queryset.filter(Q(microlensing_screening__score__lte=value.stop))
+
+    def filter_microlensing_te(self, queryset, name, value):
+
+        if value.start is not None and value.stop is not None:
+            return queryset.filter(Q(microlensing_screening__te__gte=value.start) &
+                                   Q(microlensing_screening__te__lte=value.stop))
+        elif value.start is not None:
+            return queryset.filter(Q(microlensing_screening__te__gte=value.start))
+        elif value.stop is not None:
+            return queryset.filter(Q(microlensing_screening__te__lte=value.stop))
+
     def filter_cone_search(self, queryset, name, value):
         """
         Perform a cone search filter on this filter's queryset,
@@ -173,12 +206,10 @@ class TargetFilter(django_filters.FilterSet):
                 messages.error(self.request,   'Invalid input format for target_cone_search. Please provide Target Name and radius separated by commas.')
                 return queryset
             
-            targets = Target.objects.filter(
-                Q(name__icontains=target_name) | Q(aliases__name__icontains=target_name)
-            ).distinct()
-            if len(targets) == 1:
-                ra = targets[0].ra
-                dec = targets[0].dec
+            target = resolve_target(target_name)
+            if target is not None:
+                ra = target.ra
+                dec = target.dec
             else:
                 return queryset.filter(name=None)
         else:
@@ -212,6 +243,10 @@ class TargetFilter(django_filters.FilterSet):
 #    priority: django_filters.RangeFilter = django_filters.RangeFilter(method='filter_priority', label='Priority')
     sun: django_filters.RangeFilter = django_filters.RangeFilter(method='filter_sunDistance', label='Sun separation')
     mag: django_filters.RangeFilter = django_filters.RangeFilter(method='filter_magLast', label='Last magnitude')
+    microlensing_score: django_filters.RangeFilter = django_filters.RangeFilter(method='filter_microlensing_score',
+                                                                                label='Microlensing score (0,1)')
+    microlensing_te: django_filters.RangeFilter = django_filters.RangeFilter(method='filter_microlensing_te',
+                                                                             label='Microlensing tE [days]')
 
     targetlist__name = django_filters.ModelChoiceFilter(queryset=get_target_list_queryset, label="Target Grouping")
 
@@ -223,8 +258,11 @@ class TargetFilter(django_filters.FilterSet):
     has_gamma = django_filters.BooleanFilter(field_name='has_gamma', label='Has Gamma')
     has_polarimetry = django_filters.BooleanFilter(field_name='has_polarimetry', label='Has Polarimetry')
 
-    order = django_filters.OrderingFilter(
-        fields=['name', 'mag_last', 'importance', 'priority', 'sun_separation', 'galb', 'created', 'modified'],
+    order = NullsLastOrderingFilter(
+        fields=['name', 'mag_last', 'importance', 'priority', 'sun_separation', 'galb', 'created', 'modified',
+                ('microlensing_screening__score', 'microlensing_score'),
+                ('microlensing_screening__t0', 'microlensing_t0'),
+                ('microlensing_screening__te', 'microlensing_te')],
         field_labels={
             'name': 'Name',
             'created': 'Creation Date',
@@ -233,7 +271,10 @@ class TargetFilter(django_filters.FilterSet):
             'importance': 'Importance',
             'priority' : 'Observing Priority',
             'sun_separation': 'Sun Separation',
-            'galb': 'Galactic Latitude'
+            'galb': 'Galactic Latitude',
+            'microlensing_score': 'Microlensing Score',
+            'microlensing_t0': 'Microlensing t0',
+            'microlensing_te': 'Microlensing tE',
         }
     )
 
@@ -4,6 +4,7 @@ from bhtom2.kafka.producer.targetEvent import TargetCreateEventProducer
 from django.contrib.contenttypes.models import ContentType
 from bhtom2.kafka.topic import kafkaTopic
 from bhtom2.utils.bhtom_logger import BHTOMLogger
+from bhtom2.utils.photometry_summary import schedule_photometry_summary_update
 from bhtom2.bhtom_targets.utils import get_brokers
 from bhtom_base.bhtom_dataproducts.models import BrokerCadence, ReducedDatum, Target
 from django_comments.models import Comment
@@ -61,6 +62,7 @@ def update_alias(target, broker):
     try:
         datum = ReducedDatum.objects.filter(target=target, source_name=broker)
         datum.delete()
+        schedule_photometry_summary_update(target.id)
     except Exception as e:
         logger.error(str(e))
 
@@ -77,6 +79,7 @@ def delete_alias(target, broker):
     try:
         datum = ReducedDatum.objects.filter(target=target, source_name=broker)
         datum.delete()
+        schedule_photometry_summary_update(target.id)
         headers = {
             'Correlation-ID': get_guid(),
         }
@@ -96,7 +99,7 @@ def update_priority(target):
 
     try:
         logger.info("Start clean target list cache")
-        update_targetList_cache()
+        update_targetList_cache(target)
     except Exception as e:
         logger.error("Clean cache error: %s" % str(e))
 
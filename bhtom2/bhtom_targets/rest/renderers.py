@@ -0,0 +1,14 @@
+from rest_framework.renderers import JSONRenderer
+
+from bhtom2.utils.plot_encoding import encode_typed_arrays
+
+
+class TypedArrayJSONRenderer(JSONRenderer):
+    """
+    JSON with the numeric arrays as base64 typed arrays, selected with Accept: application/vnd.bhtom.typed+json.
+    """
+    media_type = 'application/vnd.bhtom.typed+json'
+    format = 'typed'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(encode_typed_arrays(data), accepted_media_type, renderer_context)
@@ -1,6 +1,10 @@
+import datetime
+import decimal
 import re
 
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
+from django.utils.encoding import is_protected_type
 
 from rest_framework import serializers
 
@@ -94,6 +98,49 @@ class TargetsSerializers(serializers.ModelSerializer):
         return Target.objects.create(**validated_data)
 
 
+class TargetListSerializer(serializers.BaseSerializer):
+    """
+    Read-only serializer used by the getTargetList API.
+
+    Emits the same per-target dictionary as the 'fields' part of django.core.serializers 'json' output,
+    extended with 'aliases' ([source_name, name]) and 'groups' ([name, id]). Aliases and groups are read
+    from the prefetched relations (see TARGET_LIST_PREFETCH), so a whole page costs a fixed number of queries.
+    """
+
+    _json_encoder = DjangoJSONEncoder()
+
+    @staticmethod
+    def get_field_names():
+        return [field.name for field in Target._meta.local_fields if field.serialize] + \
+               [field.name for field in Target._meta.local_many_to_many if field.serialize] + \
+               ['aliases', 'groups']
+
+    def _field_value(self, instance, field):
+        value = field.value_from_object(instance)
+        if not is_protected_type(value):
+            value = field.value_to_string(instance)
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time, decimal.Decimal)):
+            # same representation as DjangoJSONEncoder used by the 'json' serializer
+            value = self._json_encoder.default(value)
+        return value
+
+    def to_representation(self, instance):
+        data = {}
+        for field in instance._meta.local_fields:
+            if field.serialize:
+                data[field.name] = self._field_value(instance, field)
+        for field in instance._meta.local_many_to_many:
+            if field.serialize:
+                data[field.name] = [related.pk for related in getattr(instance, field.name).all()]
+        data['aliases'] = [[alias.source_name, alias.name] for alias in instance.aliases.all()]
+        data['groups'] = [[group.name, group.id] for group in instance.targetlist_set.all()]
+        return data
+
+
+TARGET_LIST_PREFETCH = ['aliases', 'targetlist_set'] + \
+                       [field.name for field in Target._meta.local_many_to_many if field.serialize]
+
+
 class TargetDownloadDataSerializer(serializers.Serializer):
     name = serializers.CharField(required=True)
 
@@ -1,5 +1,5 @@
-from django.db.models import Q
-from django.http import Http404
+from django.db.models import Q, prefetch_related_objects
+from django.http import Http404, StreamingHttpResponse
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import views
@@ -7,23 +7,26 @@ from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.status import HTTP_500_INTERNAL_SERVER_ERROR
 from django.contrib.auth.models import User
-from bhtom2.bhtom_targets.rest.serializers import TargetsSerializers, TargetDownloadDataSerializer, DownloadedTargetSerializer,TargetsGroupsSerializer
+from bhtom2.bhtom_targets.rest.serializers import TargetsSerializers, TargetDownloadDataSerializer, DownloadedTargetSerializer,TargetsGroupsSerializer, \
+    TargetListSerializer, TARGET_LIST_PREFETCH
+from bhtom2.bhtom_targets.rest.renderers import TypedArrayJSONRenderer
 from bhtom2.bhtom_targets.utils import update_targetList_cache, update_targetDetails_cache, get_client_ip
 from bhtom2.utils.bhtom_logger import BHTOMLogger
 from bhtom_base.bhtom_common.hooks import run_hook
-from bhtom_base.bhtom_targets.utils import cone_search_filter
-from bhtom_base.bhtom_targets.models import Target, DownloadedTarget, TargetList, TargetName
+from bhtom2.utils.name_resolver import resolve_target
+from bhtom2.utils.plot_cache import get_plot
+from bhtom2.utils.sky_index import cone_search_filter
+from bhtom_base.bhtom_targets.models import Target, DownloadedTarget, TargetList
 from rest_framework import status
+import csv
 import json
 from django.conf import settings
-from django.core import serializers
-import os
 import math
-from django.http import FileResponse
-from bhtom2.utils.reduced_data_utils import save_high_energy_data_for_target_to_csv_file, save_photometry_data_for_target_to_csv_file, \
-    save_radio_data_for_target_to_csv_file
+from bhtom2.utils.reduced_data_utils import stream_high_energy_data_for_target, stream_photometry_data_for_target, \
+    stream_radio_data_for_target, streaming_file_response
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from bhtom2.utils.api_pagination import StandardResultsSetPagination
 
@@ -56,7 +59,159 @@ def clean_floats_for_json(obj):
             return [clean_floats_for_json(v) for v in obj]
         else:
             return obj
-        
+
+
+TARGET_LIST_FILTER_PROPERTIES = {
+    'name': openapi.Schema(type=openapi.TYPE_STRING),
+    'type': openapi.Schema(type=openapi.TYPE_STRING),
+    'raMin': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
+    'raMax': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
+    'decMin': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
+    'decMax': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
+    'importanceMin': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
+    'importanceMax': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
+    'classification': openapi.Schema(type=openapi.TYPE_STRING),
+    'targetGroup': openapi.Schema(type=openapi.TYPE_STRING),
+    'coneSearchTarget':  openapi.Schema(type=openapi.TYPE_STRING),
+    'coneSearchRaDecRadius':  openapi.Schema(type=openapi.TYPE_STRING),
+    'priority': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
+    'galacticLatMin': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
+    'galacticLatMax': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
+    'galacticLonMin': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
+    'galacticLonMax': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
+    'description': openapi.Schema(type=openapi.TYPE_STRING),
+    'sunSeparationMin': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
+    'sunSeparationMax': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
+    'lastMagMin': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
+    'lastMagMax': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
+    'hasOptical': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+    'hasInfrared': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+    'hasRadio': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+    'hasXray': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+    'hasGamma': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+    'hasPolarimetry': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+}
+
+
+def filter_target_list(data):
+    """
+    Builds the Target queryset (ordered by creation) for the getTargetList filter body.
+    Shared by GetTargetListApi and TargetListExportApi.
+
+    :raises ValueError: on malformed filter values
+    """
+    query = Q()
+
+    name = data.get('name', None)
+    targetType = data.get('type', None)
+    raMin = data.get('raMin', None)
+    raMax = data.get('raMax', None)
+    decMin = data.get('decMin', None)
+    decMax = data.get('decMax', None)
+    importanceMin = data.get('importanceMin', None)
+    importanceMax = data.get('importanceMax', None)
+    classification = data.get('classification', None)
+    targetGroup = data.get('targetGroup', None)
+    coneSearchTarget = data.get('coneSearchTarget', None)
+    coneSearchRaDecRadius = data.get('coneSearchRaDecRadius', None)
+    priority = data.get('priority', None)
+    lastMagMin = data.get('lastMagMin', None)
+    lastMagMax = data.get('lastMagMax', None)
+    sunSeparationMin = data.get('sunSeparationMin', None)
+    sunSeparationMax = data.get('sunSeparationMax', None)
+    galacticLatMin = data.get('galacticLatMin', None)
+    galacticLatMax = data.get('galacticLatMax', None)
+    galacticLonMin = data.get('galacticLonMin', None)
+    galacticLonMax = data.get('galacticLonMax', None)
+    description = data.get('description', None)
+    hasOptical = data.get('hasOptical', None)
+    hasInfrared = data.get('hasInfrared', None)
+    hasRadio = data.get('hasRadio', None)
+    hasXray = data.get('hasXray', None)
+    hasGamma = data.get('hasGamma', None)
+    hasPolarimetry = data.get('hasPolarimetry', None)
+
+    if name is not None:
+        query &= Q(name=name)
+    if targetType is not None:
+        query &= Q(type=targetType)
+    if raMin is not None:
+        query &= Q(ra__gte=float(raMin))
+    if raMax is not None:
+        query &= Q(ra__lte=float(raMax))
+    if decMin is not None:
+        query &= Q(dec__gte=float(decMin))
+    if decMax is not None:
+        query &= Q(dec__lte=float(decMax))
+    if importanceMin is not None:
+        query &= Q(importance__gte=float(importanceMin))
+    if importanceMax is not None:
+        query &= Q(importance__lte=float(importanceMax))
+    if priority is not None:
+        query &= Q(priority=float(priority))
+    if lastMagMin is not None:
+        query &= Q(mag_last__gte=float(lastMagMin))
+    if lastMagMax is not None:
+        query &= Q(mag_last__lte=float(lastMagMax))
+    if sunSeparationMin is not None:
+        query &= Q(sun_separation__gte=float(sunSeparationMin))
+    if sunSeparationMax is not None:
+        query &= Q(sun_separation__lte=float(sunSeparationMax))
+    if galacticLatMin is not None:
+        query &= Q(galactic_lat__gte=float(galacticLatMin))
+    if galacticLatMax is not None:
+        query &= Q(galactic_lat__lte=float(galacticLatMax))
+    if galacticLonMin is not None:
+        query &= Q(galactic_lng__gte=float(galacticLonMin))
+    if galacticLonMax is not None:
+        query &= Q(galactic_lng__lte=float(galacticLonMax))
+    if description is not None:
+        query &= Q(description=description)
+    if classification is not None:
+        query &= Q(classification=classification)
+    if targetGroup is not None:
+        query &= Q(targetlist__name=targetGroup)
+    if hasOptical is not None:
+        query &= Q(has_optical=_parse_bool(hasOptical))
+    if hasInfrared is not None:
+        query &= Q(has_infrared=_parse_bool(hasInfrared))
+    if hasRadio is not None:
+        query &= Q(has_radio=_parse_bool(hasRadio))
+    if hasXray is not None:
+        query &= Q(has_xray=_parse_bool(hasXray))
+    if hasGamma is not None:
+        query &= Q(has_gamma=_parse_bool(hasGamma))
+    if hasPolarimetry is not None:
+        query &= Q(has_polarimetry=_parse_bool(hasPolarimetry))
+
+    queryset = Target.objects.filter(query).order_by('created')
+
+    # Obsługa coneSearchRaDecRadius: "RA,DEC,RADIUS"
+    if coneSearchRaDecRadius:
+        try:
+            ra_dec_radius = [float(x.strip()) for x in coneSearchRaDecRadius.split(',')]
+            if len(ra_dec_radius) == 3:
+                ra, dec, radius = ra_dec_radius
+                queryset = cone_search_filter(queryset, ra, dec, radius)
+        except Exception as e:
+            logger.error(f"Cone search by RA/Dec error: {e}")
+
+    # Obsługa coneSearchTarget: "TargetName,RADIUS"
+    if coneSearchTarget:
+        try:
+            target_name, radius = [x.strip() for x in coneSearchTarget.split(',')]
+            radius = float(radius)
+            target_obj = resolve_target(target_name, unique=False)
+            if target_obj:
+                ra = target_obj.ra
+                dec = target_obj.dec
+                queryset = cone_search_filter(queryset, ra, dec, radius)
+        except Exception as e:
+            logger.error(f"Cone search by target name error: {e}")
+
+    return queryset
+
+
 class GetTargetListApi(views.APIView):
 
 
@@ -68,35 +223,13 @@ class GetTargetListApi(views.APIView):
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             properties={
-                'name': openapi.Schema(type=openapi.TYPE_STRING),
-                'type': openapi.Schema(type=openapi.TYPE_STRING),  
-                'raMin': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
-                'raMax': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
-                'decMin': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
-                'decMax': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
-                'importanceMin': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
-                'importanceMax': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
-                'classification': openapi.Schema(type=openapi.TYPE_STRING),
-                'targetGroup': openapi.Schema(type=openapi.TYPE_STRING),
-                'coneSearchTarget':  openapi.Schema(type=openapi.TYPE_STRING),
-                'coneSearchRaDecRadius':  openapi.Schema(type=openapi.TYPE_STRING),
-                'priority': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
-                'galacticLatMin': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
-                'galacticLatMax': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
-                'galacticLonMin': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
-                'galacticLonMax': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
-                'description': openapi.Schema(type=openapi.TYPE_STRING),
-                'sunSeparationMin': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
-                'sunSeparationMax': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
-                'lastMagMin': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
-                'lastMagMax': openapi.Schema(type=openapi.TYPE_NUMBER, format=openapi.FORMAT_FLOAT),
-                'hasOptical': openapi.Schema(type=openapi.TYPE_BOOLEAN),
-                'hasInfrared': openapi.Schema(type=openapi.TYPE_BOOLEAN),
-                'hasRadio': openapi.Schema(type=openapi.TYPE_BOOLEAN),
-                'hasXray': openapi.Schema(type=openapi.TYPE_BOOLEAN),
-                'hasGamma': openapi.Schema(type=openapi.TYPE_BOOLEAN),
-                'hasPolarimetry': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                **TARGET_LIST_FILTER_PROPERTIES,
                 'page': openapi.Schema(type=openapi.TYPE_INTEGER, description='Page number for pagination'),
+                'cursor': openapi.Schema(type=openapi.TYPE_STRING,
+                                         description='Keyset pagination: send an empty cursor for the first page, '
+                                                     'then the returned next_cursor. Replaces page.'),
+                'with_count': openapi.Schema(type=openapi.TYPE_BOOLEAN,
+                                             description='Return the total count in cursor mode'),
             },
             required=[]
         ),
@@ -111,125 +244,19 @@ class GetTargetListApi(views.APIView):
         ],
     )
     def post(self, request):
-        query = Q()
-
-        name = request.data.get('name', None)
-        targetType = request.data.get('type', None)
-        raMin = request.data.get('raMin', None)
-        raMax = request.data.get('raMax', None)
-        decMin = request.data.get('decMin', None)
-        decMax = request.data.get('decMax', None)
-        importanceMin = request.data.get('importanceMin', None)
-        importanceMax = request.data.get('importanceMax', None)
-        classification = request.data.get('classification', None)
-        targetGroup = request.data.get('targetGroup', None)
-        coneSearchTarget = request.data.get('coneSearchTarget', None)
-        coneSearchRaDecRadius = request.data.get('coneSearchRaDecRadius', None)
-        priority = request.data.get('priority', None)
-        lastMagMin = request.data.get('lastMagMin', None)
-        lastMagMax = request.data.get('lastMagMax', None)
-        sunSeparationMin = request.data.get('sunSeparationMin', None)
-        sunSeparationMax = request.data.get('sunSeparationMax', None)
-        galacticLatMin = request.data.get('galacticLatMin', None)
-        galacticLatMax = request.data.get('galacticLatMax', None)
-        galacticLonMin = request.data.get('galacticLonMin', None)
-        galacticLonMax = request.data.get('galacticLonMax', None)
-        description = request.data.get('description', None)
-        hasOptical = request.data.get('hasOptical', None)
-        hasInfrared = request.data.get('hasInfrared', None)
-        hasRadio = request.data.get('hasRadio', None)
-        hasXray = request.data.get('hasXray', None)
-        hasGamma = request.data.get('hasGamma', None)
-        hasPolarimetry = request.data.get('hasPolarimetry', None)
         page = request.data.get('page', 1)
-      
-        
 
         try:
-            if name is not None:
-                query &= Q(name=name)
-            if targetType is not None:
-                query &= Q(type=targetType)
-            if raMin is not None:
-                query &= Q(ra__gte=float(raMin))
-            if raMax is not None:
-                query &= Q(ra__lte=float(raMax))
-            if decMin is not None:
-                query &= Q(dec__gte=float(decMin))
-            if decMax is not None:
-                query &= Q(dec__lte=float(decMax))
-            if importanceMin is not None:
-                query &= Q(importance__gte=float(importanceMin))
-            if importanceMax is not None:
-                query &= Q(importance__lte=float(importanceMax))
-            if priority is not None:
-                query &= Q(priority=float(priority))
-            if lastMagMin is not None:
-                query &= Q(mag_last__gte=float(lastMagMin))
-            if lastMagMax is not None:
-                query &= Q(mag_last__lte=float(lastMagMax))
-            if sunSeparationMin is not None:
-                query &= Q(sun_separation__gte=float(sunSeparationMin))
-            if sunSeparationMax is not None:
-                query &= Q(sun_separation__lte=float(sunSeparationMax))
-            if galacticLatMin is not None:
-                query &= Q(galactic_lat__gte=float(galacticLatMin))
-            if galacticLatMax is not None:
-                query &= Q(galactic_lat__lte=float(galacticLatMax))
-            if galacticLonMin is not None:
-                query &= Q(galactic_lng__gte=float(galacticLonMin))
-            if galacticLonMax is not None:
-                query &= Q(galactic_lng__lte=float(galacticLonMax))
-            if description is not None:
-                query &= Q(description=description)
-            if classification is not None:
-                query &= Q(classification=classification)
-            if targetGroup is not None:
-                query &= Q(targetlist__name=targetGroup)
-            if hasOptical is not None:
-                query &= Q(has_optical=_parse_bool(hasOptical))
-            if hasInfrared is not None:
-                query &= Q(has_infrared=_parse_bool(hasInfrared))
-            if hasRadio is not None:
-                query &= Q(has_radio=_parse_bool(hasRadio))
-            if hasXray is not None:
-                query &= Q(has_xray=_parse_bool(hasXray))
-            if hasGamma is not None:
-                query &= Q(has_gamma=_parse_bool(hasGamma))
-            if hasPolarimetry is not None:
-                query &= Q(has_polarimetry=_parse_bool(hasPolarimetry))
-
+            queryset = filter_target_list(request.data).prefetch_related(*TARGET_LIST_PREFETCH)
         except ValueError as e:
             logger.error("Value error in targetList " + str(e))
             return Response("Wrong format: " + str(e), status=400)
 
-        queryset = Target.objects.filter(query).order_by('created')
- 
-        # Obsługa coneSearchRaDecRadius: "RA,DEC,RADIUS"
-        if coneSearchRaDecRadius:
-            try:
-                ra_dec_radius = [float(x.strip()) for x in coneSearchRaDecRadius.split(',')]
-                if len(ra_dec_radius) == 3:
-                    ra, dec, radius = ra_dec_radius
-                    queryset = cone_search_filter(queryset, ra, dec, radius)
-            except Exception as e:
-                logger.error(f"Cone search by RA/Dec error: {e}")
-
-        # Obsługa coneSearchTarget: "TargetName,RADIUS"
-        if coneSearchTarget:
-            try:
-                target_name, radius = [x.strip() for x in coneSearchTarget.split(',')]
-                radius = float(radius)
-                target_obj = Target.objects.filter(
-                    Q(name__icontains=target_name) | Q(aliases__name__icontains=target_name)
-                ).distinct().first()
-                if target_obj:
-                    ra = target_obj.ra
-                    dec = target_obj.dec
-                    queryset = cone_search_filter(queryset, ra, dec, radius)
-            except Exception as e:
-                logger.error(f"Cone search by target name error: {e}")
-
+        if self.pagination_class.is_cursor_request(request):
+            pagination = self.pagination_class()
+            targets = pagination.paginate_queryset_by_cursor(queryset, request, ('created', 'id'))
+            serialized_data = TargetListSerializer(targets, many=True).data
+            return pagination.get_cursor_paginated_response(clean_floats_for_json(serialized_data))
 
         paginator = Paginator(queryset, self.pagination_class.max_page_size)
 
@@ -240,41 +267,107 @@ class GetTargetListApi(views.APIView):
         except EmptyPage:
             paginated_queryset = paginator.page(paginator.num_pages)
 
-        serialized_queryset = serializers.serialize('json', paginated_queryset)
-
-        serialized_data = json.loads(serialized_queryset)
-        fields_only = [item['fields'] for item in serialized_data]
-
-        for target in fields_only:
-            aliases = []
-            target_list_names = []
-            
-            try:
-                temp = Target.objects.get(name=target['name'])
-                aliases = TargetName.objects.filter(target_id=temp.id).values_list('source_name','name')
-            except Exception as e:
-                logger.error("Ops, something went wrong" + str(e))
-                aliases = []
-            try:
-                temp = Target.objects.get(name=target['name'])
-                target_lists = TargetList.objects.filter(targets=temp)
-                target_list_names = target_lists.values_list('name', 'id')
-            except Exception as e:
-                logger.error("Ops, something went wrong" + str(e))
-                target_list_names = []
-
-            target['aliases'] = aliases
-            target['groups'] = target_list_names
+        serialized_data = TargetListSerializer(paginated_queryset.object_list, many=True).data
 
         response_data = {
             'count': paginator.count,
             'num_pages': paginator.num_pages,
             'current_page': paginated_queryset.number,
-            'data': clean_floats_for_json(fields_only)
+            'data': clean_floats_for_json(serialized_data)
         }
         return Response(response_data, status=200)
 
 
+class _Echo:
+    """File-like object for csv.writer: returns the written line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def _iterate_target_list(queryset, chunk_size):
+    """
+    Reads the queryset with a server-side cursor and serializes it chunk by chunk,
+    fetching aliases and groups with one query per chunk.
+    """
+    chunk = []
+    for target in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(target)
+        if len(chunk) == chunk_size:
+            prefetch_related_objects(chunk, *TARGET_LIST_PREFETCH)
+            yield from TargetListSerializer(chunk, many=True).data
+            chunk = []
+    if chunk:
+        prefetch_related_objects(chunk, *TARGET_LIST_PREFETCH)
+        yield from TargetListSerializer(chunk, many=True).data
+
+
+def _stream_target_list_ndjson(rows):
+    for row in rows:
+        yield json.dumps(clean_floats_for_json(dict(row))) + '\n'
+
+
+def _stream_target_list_csv(rows):
+    columns = TargetListSerializer.get_field_names()
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        row['aliases'] = ';'.join(f'{source_name}:{name}' for source_name, name in row['aliases'])
+        row['groups'] = ';'.join(name for name, _ in row['groups'])
+        yield writer.writerow([row.get(column) for column in columns])
+
+
+class TargetListExportApi(views.APIView):
+    """
+    Streams all targets matching the getTargetList filter body as NDJSON (default) or CSV,
+    without pagination. Memory use does not depend on the number of matching targets.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    chunk_size = 2000
+
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                **TARGET_LIST_FILTER_PROPERTIES,
+                'format': openapi.Schema(type=openapi.TYPE_STRING, enum=['ndjson', 'csv'],
+                                         description='Output format, default ndjson'),
+            },
+            required=[]
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                name='Authorization',
+                in_=openapi.IN_HEADER,
+                type=openapi.TYPE_STRING,
+                required=True,
+                description='Token <Your Token>'
+            ),
+        ],
+    )
+    def post(self, request):
+        export_format = request.data.get('format', 'ndjson')
+        if export_format not in ('ndjson', 'csv'):
+            return Response("Wrong format: format must be 'ndjson' or 'csv'", status=400)
+
+        try:
+            queryset = filter_target_list(request.data)
+        except ValueError as e:
+            logger.error("Value error in targetList export " + str(e))
+            return Response("Wrong format: " + str(e), status=400)
+
+        logger.info(f'Exporting target list as {export_format}')
+        rows = _iterate_target_list(queryset, self.chunk_size)
+
+        if export_format == 'csv':
+            response = StreamingHttpResponse(_stream_target_list_csv(rows), content_type='text/csv')
+            response['Content-Disposition'] = 'attachment; filename="targets.csv"'
+        else:
+            response = StreamingHttpResponse(_stream_target_list_ndjson(rows), content_type='application/x-ndjson')
+        return response
+
+
 # this is API for SIDEREAL target creation, non-sidereal has to go to a different api
 class TargetCreateApi(views.APIView):
     authentication_classes = [TokenAuthentication]
@@ -446,6 +539,8 @@ class CleanTargetDetailsCache(views.APIView):
 class GetPlotsApiView(views.APIView):
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    # JSON by default, base64 typed arrays with Accept: application/vnd.bhtom.typed+json
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [TypedArrayJSONRenderer]
 
     @swagger_auto_schema(
         request_body=openapi.Schema(
@@ -470,14 +565,11 @@ class GetPlotsApiView(views.APIView):
         targetNames = request.data['targetNames']
         results = {}
         try:
-            base_path = settings.DATA_PLOTS_PATH
             for target_name in targetNames:
 
                 target = Target.objects.get(name=target_name)
                 if target.photometry_plot:
-                    with open(base_path + str(target.photometry_plot), 'r') as json_file:
-                        plot = json.load(json_file)
-                    results[target.name] = plot
+                    results[target.name] = get_plot(target.photometry_plot).figure
                 else:
                     results[target.name] = "None"
 
@@ -491,6 +583,8 @@ class GetPlotsApiView(views.APIView):
 class GetPlotsObsApiView(views.APIView):
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    # JSON by default, base64 typed arrays with Accept: application/vnd.bhtom.typed+json
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [TypedArrayJSONRenderer]
 
     @swagger_auto_schema(
         request_body=openapi.Schema(
@@ -515,14 +609,11 @@ class GetPlotsObsApiView(views.APIView):
         targetNames = request.data['targetNames']
         results = {}
         try:
-            base_path = settings.DATA_PLOTS_PATH
             for target_name in targetNames:
 
                 target = Target.objects.get(name=target_name)
                 if target.photometry_plot_obs:
-                    with open(base_path + str(target.photometry_plot_obs), 'r') as json_file:
-                        plot = json.load(json_file)
-                    results[target.name] = plot
+                    results[target.name] = get_plot(target.photometry_plot_obs).figure
                 else:
                     results[target.name] = "None"
 
@@ -561,13 +652,13 @@ class TargetDownloadRadioDataApiView(views.APIView):
             return Response({"Error": 'Something went wrong'}, status=status.HTTP_400_BAD_REQUEST)
 
         name = serializer.validated_data['name']
-        target_id = Target.objects.get(name=name).id
+        target = Target.objects.get(name=name)
+        target_id = target.id
 
         logger.info(f'API Generating radio data in CSV file for target with id={target_id}...')
 
-        tmp = None
         try:
-            tmp, filename = save_radio_data_for_target_to_csv_file(name)
+            stream, filename = stream_radio_data_for_target(target)
             ip_address = get_client_ip(request)
             DownloadedTarget.objects.create(
                 user=request.user,
@@ -575,15 +666,10 @@ class TargetDownloadRadioDataApiView(views.APIView):
                 download_type='R',
                 ip_address=ip_address
             )
-            return FileResponse(open(tmp.name, 'rb'),
-                                as_attachment=True,
-                                filename=filename)
+            return streaming_file_response(stream, filename)
         except Exception as e:
             logger.error(f'Error while generating radio data to CSV file for target with id={target_id}: {e}')
             return Response({"Error ": 'Something went wrong ' + str(e)}, status=HTTP_500_INTERNAL_SERVER_ERROR)
-        finally:
-            if tmp:
-                os.remove(tmp.name)
 
 class TargetDownloadHEDataApiView(views.APIView):
     authentication_classes = [TokenAuthentication]
@@ -614,13 +700,13 @@ class TargetDownloadHEDataApiView(views.APIView):
             return Response({"Error": 'Something went wrong, bad request in API '}, status=status.HTTP_400_BAD_REQUEST)
 
         name = serializer.validated_data['name']
-        target_id = Target.objects.get(name=name).id
+        target = Target.objects.get(name=name)
+        target_id = target.id
 
         logger.info(f'API Generating radio data in CSV file for target with id={target_id}...')
 
-        tmp = None
         try:
-            tmp, filename = save_high_energy_data_for_target_to_csv_file(name)
+            stream, filename = stream_high_energy_data_for_target(target)
             ip_address = get_client_ip(request)
             DownloadedTarget.objects.create(
                 user=request.user,
@@ -628,15 +714,10 @@ class TargetDownloadHEDataApiView(views.APIView):
                 download_type='H',
                 ip_address=ip_address
             )
-            return FileResponse(open(tmp.name, 'rb'),
-                                as_attachment=True,
-                                filename=filename)
+            return streaming_file_response(stream, filename)
         except Exception as e:
             logger.error(f'Error while generating high energy data to CSV file for target with id={target_id}: {e}')
             return Response({"Error ": 'Something went wrong in high energy download' + str(e)}, status=HTTP_500_INTERNAL_SERVER_ERROR)
-        finally:
-            if tmp:
-                os.remove(tmp.name)
 
 
 class TargetDownloadPhotometryDataApiView(views.APIView):
@@ -667,13 +748,13 @@ class TargetDownloadPhotometryDataApiView(views.APIView):
             logger.info('Error bad request')
             return Response({"Error": 'Something went wrong'}, status=status.HTTP_400_BAD_REQUEST)
         name = serializer.validated_data['name']
-        target_id = Target.objects.get(name=name).id
+        target = Target.objects.get(name=name)
+        target_id = target.id
 
         logger.info(f'API Generating photometry CSV file for target with id={target_id}')
 
-        tmp = None
         try:
-            tmp, filename = save_photometry_data_for_target_to_csv_file(name)
+            stream, filename = stream_photometry_data_for_target(target)
             ip_address = get_client_ip(request)
             DownloadedTarget.objects.create(
                 user=request.user,
@@ -681,15 +762,10 @@ class TargetDownloadPhotometryDataApiView(views.APIView):
                 download_type='P',
                 ip_address=ip_address
             )
-            return FileResponse(open(tmp.name, 'rb'),
-                                as_attachment=True,
-                                filename=filename)
+            return streaming_file_response(stream, filename)
         except Exception as e:
             logger.error(f'Error while generating photometry CSV file for target with id={target_id}: {e}')
             return Response({"Error ": 'Something went wrong ' + str(e)}, status=HTTP_500_INTERNAL_SERVER_ERROR)
-        finally:
-            if tmp:
-                os.remove(tmp.name)
 
 
 
@@ -3,12 +3,12 @@ from django.urls import path
 from bhtom_base.bhtom_targets.views import TargetAddRemoveGroupingView, TargetDeleteView, \
     TargetExportView, TargetGroupingCreateView, TargetGroupingDeleteView, TargetGroupingView, TargetNameSearchView
 from .rest.views import CleanTargetListCache, GetTargetListApi, CleanTargetDetailsCache, TargetCreateApi, TargetDownloadHEDataApiView, \
-    TargetUpdateApi, TargetDeleteApi, GetPlotsApiView, TargetDownloadRadioDataApiView, TargetDownloadPhotometryDataApiView, GetDownloadedTargetListApi,\
-        GetTargetsGroups, GetTargetsFromGroup
+    TargetUpdateApi, TargetDeleteApi, GetPlotsApiView, GetPlotsObsApiView, TargetDownloadRadioDataApiView, TargetDownloadPhotometryDataApiView, GetDownloadedTargetListApi,\
+        GetTargetsGroups, GetTargetsFromGroup, TargetListExportApi
 
 from .views import TargetCreateView, TargetDownloadHEDataView, TargetUpdateView, TargetGenerateTargetDescriptionLatexView, TargetImportView, \
     TargetDownloadPhotometryStatsLatexTableView, TargetListImagesView, TargetDownloadPhotometryDataView, \
-    TargetDownloadRadioDataView, TargetMicrolensingView, TargetListView, UpdateReducedDatum, TargetNotFoundView, TargetAddNewGroupingView, \
+    TargetDownloadRadioDataView, TargetMicrolensingView, TargetMicrolensingFitStatusView, TargetPhotometryPlotWindowView, TargetThumbnailView, TargetListView, UpdateReducedDatum, TargetNotFoundView, TargetAddNewGroupingView, \
         TargetDetailView
 
 from bhtom_base.bhtom_common.api_router import SharedAPIRootRouter
@@ -24,10 +24,12 @@ urlpatterns = [
      path('cleanTargetListCache/', CleanTargetListCache.as_view()),
      path('cleanTargetDetailCache/', CleanTargetDetailsCache.as_view()),
      path('getTargetList/', GetTargetListApi.as_view()),
+     path('exportTargetList/', TargetListExportApi.as_view()),
      path('createTarget/', TargetCreateApi.as_view()),
      path('updateTarget/<str:name>/', TargetUpdateApi.as_view()),
      path('deleteTarget/', TargetDeleteApi.as_view()),
      path('get-plots/', GetPlotsApiView.as_view()),
+     path('get-plots-obs/', GetPlotsObsApiView.as_view()),
      path('get-downloaded-target-list/', GetDownloadedTargetListApi.as_view()),
      path('download-photometry/', TargetDownloadPhotometryDataApiView.as_view()),
      path('download-radio/', TargetDownloadRadioDataApiView.as_view()),
@@ -60,6 +62,9 @@ urlpatterns = [
      path('<int:pk>/download-photometry', TargetDownloadPhotometryDataView.as_view(), name='download_photometry_data'),
      path('<str:name>/download-photometry', TargetDownloadPhotometryDataView.as_view(),
          name='download_photometry_data'),
+     path('<int:pk>/photometry-plot-window', TargetPhotometryPlotWindowView.as_view(),
+         name='photometry_plot_window'),
+     path('<int:pk>/thumbnail/<str:version>', TargetThumbnailView.as_view(), name='thumbnail'),
      path('<int:pk>/download-radio', TargetDownloadRadioDataView.as_view(), name='download_radio_data'),
      path('<str:name>/download-radio', TargetDownloadRadioDataView.as_view(), name='download_radio_data'),
      path('<int:pk>/download-high-energy', TargetDownloadHEDataView.as_view(), name='download_high_energy'),
@@ -70,6 +75,8 @@ urlpatterns = [
      path('<int:pk>/microlensing_parallax',
          TargetMicrolensingView.as_view(template_name='bhtom_targets/target_microlensing_parallax.html'),
          name="microlensing_parallax_model"),
+     path('<int:pk>/microlensing/status/<str:key>', TargetMicrolensingFitStatusView.as_view(),
+         name='microlensing_fit_status'),
 
      path('<int:pk>/', TargetDetailView.as_view(template_name='bhtom_targets/target_detail.html'),
          name='detail'),
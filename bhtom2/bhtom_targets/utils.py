@@ -1,4 +1,5 @@
 import os
+from datetime import datetime
 from sqlite3 import IntegrityError
 from typing import Dict, Any, Tuple, List
 
@@ -7,8 +8,6 @@ from django.db.models import Count
 
 import csv
 
-from django.http import HttpRequest
-from django.shortcuts import render
 
 from bhtom2.bhtom_targets.filters import TargetFilter
 from bhtom2.templatetags.bhtom_targets_extras import target_table
@@ -25,15 +24,163 @@ from math import radians
 from bhtom_base.bhtom_common.hooks import run_hook
 from astropy.coordinates import Angle
 from astropy import units as u
+from dateutil.parser import parse
 from django.db import transaction
 
-from bhtom_base.bhtom_targets.utils import cone_search_filter
+from bhtom2.utils.harvester_client import HarvesterClient
+from bhtom2.utils.name_resolver import bulk_index_target_names
+from bhtom2.utils.sky_index import cone_search_filter, InMemorySkyIndex, bulk_update_sky_positions
+from bhtom2.utils.target_cache import bump_cache_generation, bump_target_version, TARGET_LIST_CACHE, \
+    TARGET_DETAILS_CACHE
 
 logger: BHTOMLogger = BHTOMLogger(__name__, 'Bhtom: bhtom_targets.utils')
 
 
 
-def import_targets(targets, group_name=None, user=None):
+def _parse_import_row(row, base_target_fields):
+    """
+    Splits one CSV row into Target fields, aliases (source name -> name) and extra fields.
+
+    :raises ValueError: if the row has no coordinates and no Gaia Alerts name
+    """
+    row = {k.strip(): v.strip() for k, v in row.items() if not (k.strip() in base_target_fields and not v.strip())}
+    target_extra_fields = []
+    target_names = {}
+    target_fields = {}
+
+    uppercase_source_names = [sc[0].upper() for sc in settings.SOURCE_CHOICES]
+
+    for kk in row:
+        k = kk.strip()
+        row_k_value = row[k].strip()
+        k_source_name = k.upper().replace('_NAME', '')
+        if row_k_value:
+            if k != 'name' and k.endswith('name') and k_source_name in uppercase_source_names:
+                target_names[k_source_name] = row_k_value
+            elif k_source_name == 'CALIB_SERVER':
+                target_names['CPCS'] = row_k_value
+            elif k_source_name == 'GAIA_ALERT':
+                target_names['GAIA_ALERTS'] = row_k_value
+            elif k == 'classification':
+                target_fields['classification'] = row_k_value
+            elif k == 'description':
+                target_fields['description'] = row_k_value
+            elif k == 'priority':
+                target_fields['importance'] = row_k_value
+            elif k == 'maglast':
+                target_fields['mag_last'] = row_k_value
+            elif k == 'Sun_separation':
+                target_fields['sun_separation'] = row_k_value
+            elif k not in base_target_fields:
+                target_extra_fields.append((k, row_k_value))
+            else:
+                target_fields[k] = row_k_value
+
+    if "ra" not in target_fields and "GAIA_ALERTS" not in target_names:
+        raise ValueError("Error: 'ra' not found in import field names")
+    if "dec" not in target_fields and "GAIA_ALERTS" not in target_names:
+        raise ValueError("Error: 'dec' not found in import field names")
+
+    return target_fields, target_names, target_extra_fields
+
+
+def _gaia_alerts_term(target_names):
+    return target_names['GAIA_ALERTS'].lower().replace("gaia", "Gaia")
+
+
+def _resolve_gaia_alerts(rows, harvester=None):
+    """
+    Pre-resolution stage of the imports: looks up all Gaia Alerts names of the file at once,
+    concurrently, so the import waits for the slowest lookup instead of the sum of them.
+
+    :param rows: parsed rows, tuples (index, target_fields, target_names, target_extra_fields)
+    :param harvester: HarvesterClient, by default one connected to settings.HARVESTER_URL
+    :returns: dictionary Gaia Alerts name -> harvester data or HarvesterError
+    """
+    terms = [_gaia_alerts_term(target_names) for _, _, target_names, _ in rows if "GAIA_ALERTS" in target_names]
+    if not terms:
+        return {}
+    if harvester is not None:
+        return harvester.find_targets(terms, "Gaia Alerts")
+    with HarvesterClient() as client:
+        return client.find_targets(terms, "Gaia Alerts")
+
+
+def _fill_target_fields_from_gaia_alerts(target_fields, target_names, resolved):
+    """
+    Replaces the row's Target fields with the Gaia Alerts data found by the harvester service,
+    keeping the description, importance, cadence, type and classification given in the file.
+    """
+    gaia_alerts_name = _gaia_alerts_term(target_names)
+    catalog_data = resolved.get(gaia_alerts_name)
+    if catalog_data is None or isinstance(catalog_data, Exception):
+        logger.error(f"Oops something went wrong: {catalog_data}")
+        raise ValueError("Error fetching Gaia Alerts data")
+
+    ra = catalog_data["ra"]
+    dec = catalog_data["dec"]
+    disc = catalog_data["discovery_date"]
+    # Use catalog_data's description as the default
+    description = target_fields.get('description', catalog_data.get("description", ''))
+    importance = target_fields.get('importance', str(9.99))
+    cadence = target_fields.get('cadence', str(1.0))
+    targetType = target_fields.get('type', Target.SIDEREAL)
+    classification = target_fields.get('classification', '')
+    logger.info(f"Import: Gaia Alerts harvester used to fill the target info as {gaia_alerts_name}")
+    return {
+        "name": gaia_alerts_name, "ra": ra, "dec": dec, "epoch": 2000.0,
+        "discovery_date": disc, "importance": importance, "cadence": cadence,
+        "description": description, "type": targetType, 'classification': classification,
+    }
+
+
+def _parse_import_rows(targetreader, base_target_fields, errors):
+    """
+    Parses all rows of the file. Rows that cannot be parsed are reported in errors.
+    """
+    rows = []
+    for index, row in enumerate(targetreader):
+        logger.debug(f"import: {index} {row}")
+        if not any(row.values()):
+            continue
+        try:
+            rows.append((index, *_parse_import_row(row, base_target_fields)))
+        except Exception as e:
+            error = f"Error importing row {index}: {str(e)}"
+            logger.error(error)
+            errors.append(error)
+    return rows
+
+
+def _create_target(target_fields, target_names, target_extra_fields):
+    target = Target.objects.create(**target_fields)
+
+    for name in target_names.items():
+        if name:
+            source_name = name[0].upper().replace('_NAME', '')
+            TargetName.objects.create(target=target, source_name=source_name, name=name[1])
+            logger.debug(f"Target {name} added to names for {source_name}")
+
+    for extra in target_extra_fields:
+        TargetExtra.objects.create(target=target, key=extra[0], value=extra[1])
+
+    if 'type' not in target_fields:
+        target.type = Target.SIDEREAL
+        logger.debug(f"Target {target.name} set by default to SIDEREAL.")
+
+    target.save()
+    return target
+
+
+def _get_import_group(group_name):
+    with transaction.atomic():
+        group, created = TargetList.objects.get_or_create(name=group_name)
+        if not created:
+            raise ValueError(f"Group with name '{group_name}' already exists.")
+    return group
+
+
+def import_targets(targets, group_name=None, user=None, harvester=None):
     """
     Imports a set of targets into the TOM and saves them to the database.
 
@@ -43,6 +190,8 @@ def import_targets(targets, group_name=None, user=None):
     :type targets: StringIO
     :param group_name: Optional name of the group to add targets to
     :type group_name: str or None
+    :param harvester: Optional HarvesterClient used to resolve Gaia Alerts names
+    :type harvester: HarvesterClient or None
     :returns: dictionary of successfully imported targets and errors
     :rtype: dict
     """
@@ -56,118 +205,22 @@ def import_targets(targets, group_name=None, user=None):
     group = None
     if group_name:
         try:
-            with transaction.atomic():
-                group, created = TargetList.objects.get_or_create(name=group_name)
-                if not created:
-                    raise ValueError(f"Group with name '{group_name}' already exists.")
+            group = _get_import_group(group_name)
         except Exception as e:
             errors.append(str(e))
             return {'targets': targets_list, 'errors': errors}
 
-    for index, row in enumerate(targetreader):
-        logger.debug(f"import: {index} {row}")
-        if not any(row.values()):
-            continue
+    rows = _parse_import_rows(targetreader, base_target_fields, errors)
+    resolved = _resolve_gaia_alerts(rows, harvester)
 
+    for index, target_fields, target_names, target_extra_fields in rows:
         try:
             with transaction.atomic():
-                row = {k.strip(): v.strip() for k, v in row.items() if not (k.strip() in base_target_fields and not v.strip())}
-                target_extra_fields = []
-                target_names = {}
-                target_fields = {}
-
-                uppercase_source_names = [sc[0].upper() for sc in settings.SOURCE_CHOICES]
-
-                for kk in row:
-                    k = kk.strip()
-                    row_k_value = row[k].strip()
-                    k_source_name = k.upper().replace('_NAME', '')
-                    if row_k_value:
-                        if k != 'name' and k.endswith('name') and k_source_name in uppercase_source_names:
-                            target_names[k_source_name] = row_k_value
-                        elif k_source_name == 'CALIB_SERVER':
-                            target_names['CPCS'] = row_k_value
-                        elif k_source_name == 'GAIA_ALERT':
-                            target_names['GAIA_ALERTS'] = row_k_value
-                        elif k == 'classification':
-                            target_fields['classification'] = row_k_value
-                        elif k == 'description':
-                            target_fields['description'] = row_k_value
-                        elif k == 'priority':
-                            target_fields['importance'] = row_k_value
-                        elif k == 'maglast':
-                            target_fields['mag_last'] = row_k_value
-                        elif k == 'Sun_separation':
-                            target_fields['sun_separation'] = row_k_value
-                        elif k not in base_target_fields:
-                            target_extra_fields.append((k, row_k_value))
-                        else:
-                            target_fields[k] = row_k_value
-
-                if "ra" not in target_fields and "GAIA_ALERTS" not in target_names:
-                    raise ValueError("Error: 'ra' not found in import field names")
-                if "dec" not in target_fields and "GAIA_ALERTS" not in target_names:
-                    raise ValueError("Error: 'dec' not found in import field names")
-
                 if "GAIA_ALERTS" in target_names:
-                    for name in target_names.items():
-                        source_name = name[0].upper().replace('_NAME', '')
-                        if source_name == "GAIA_ALERTS":
-                            gaia_alerts_name = name[1].lower().replace("gaia", "Gaia")
-                            post_data = {
-                                'terms': gaia_alerts_name,
-                                'harvester': "Gaia Alerts"
-                            }
-                            header = {
-                                "Correlation-ID": get_guid(),
-                            }
-                            try:
-                                response = requests.post(settings.HARVESTER_URL + '/findTargetWithHarvester/', data=post_data, headers=header)
-                                if response.status_code == 200:
-                                    catalog_data = json.loads(response.text)
-                                else:
-                                    response.raise_for_status()
-                            except Exception as e:
-                                logger.error("Oops something went wrong: " + str(e))
-                                raise ValueError("Error fetching Gaia Alerts data")
-
-                            ra = catalog_data["ra"]
-                            dec = catalog_data["dec"]
-                            disc = catalog_data["discovery_date"]
-                            # description = catalog_data["description"]
-                            # description = target_fields.get('description', '')
-                            # Use catalog_data's description as the default
-                            description = target_fields.get('description', catalog_data.get("description", ''))
-                            importance = target_fields.get('importance', str(9.99))
-                            cadence = target_fields.get('cadence', str(1.0))
-                            targetType = target_fields.get('type', Target.SIDEREAL)
-                            classification = target_fields.get('classification', '')
-                            target_fields = {
-                                "name": gaia_alerts_name, "ra": ra, "dec": dec, "epoch": 2000.0,
-                                "discovery_date": disc, "importance": importance, "cadence": cadence,
-                                "description": description, "type": targetType, 'classification': classification, 
-                            }
-                            logger.info(f"Import: Gaia Alerts harvester used to fill the target info as {gaia_alerts_name}")
+                    target_fields = _fill_target_fields_from_gaia_alerts(target_fields, target_names, resolved)
 
                 check_target_value(target_fields)
-                target = Target.objects.create(**target_fields)
-
-                for name in target_names.items():
-                    if name:
-                        source_name = name[0].upper().replace('_NAME', '')
-                        TargetName.objects.create(target=target, source_name=source_name, name=name[1])
-                        logger.debug(f"Target {name} added to names for {source_name}")
-
-                for extra in target_extra_fields:
-                    TargetExtra.objects.create(target=target, key=extra[0], value=extra[1])
-
-                if 'type' not in target_fields:
-                    target.type = Target.SIDEREAL
-                    logger.debug(f"Target {row} set by default to SIDEREAL.")
-
-                target.save()
-
-
+                target = _create_target(target_fields, target_names, target_extra_fields)
 
                 try:
                     if group:
@@ -196,8 +249,144 @@ def import_targets(targets, group_name=None, user=None):
     return {'targets': targets_list, 'errors': errors}
 
 
+def _prepare_target_extra(extra):
+    """
+    Fills the typed value columns that TargetExtra.save() derives from the value, since bulk_create does not
+    call save(). The model has no separate conversion to call, so this is its conversion step for step
+    (dateutil's parse for the time, as in TargetExtra.save), keeping bulk imported extras equal to saved ones.
+    """
+    try:
+        extra.float_value = float(extra.value)
+    except (TypeError, ValueError, OverflowError):
+        extra.float_value = None
+    try:
+        extra.bool_value = bool(extra.value)
+    except (TypeError, ValueError, OverflowError):
+        extra.bool_value = None
+    try:
+        if isinstance(extra.value, datetime):
+            extra.time_value = extra.value
+        else:
+            extra.time_value = parse(extra.value)
+    except (TypeError, ValueError, OverflowError):
+        extra.time_value = None
+    return extra
+
+
+def bulk_import_targets(targets, group_name=None, user=None, harvester=None, batch_size=1000):
+    """
+    Batch variant of import_targets for large files.
+
+    The whole file is parsed and validated first: coordinates are checked against the catalogue and
+    against the earlier rows of the same file with one in-memory sky index, and names against the
+    existing targets. The accepted rows are then written with bulk_create (targets, names, extras)
+    in one transaction and target_post_save hooks run after the commit.
+    Errors are reported per row, in the same form as import_targets.
+
+    :param targets: String buffer of targets
+    :type targets: StringIO
+    :param group_name: Optional name of the group to add targets to
+    :type group_name: str or None
+    :param harvester: Optional HarvesterClient used to resolve Gaia Alerts names
+    :type harvester: HarvesterClient or None
+    :returns: dictionary of successfully imported targets and errors
+    :rtype: dict
+    """
+    logger.debug("Beginning the bulk IMPORT from a file.")
+    targetreader = csv.DictReader(targets, dialect=csv.excel)
+    errors = []
+    base_target_fields = [field.name for field in Target._meta.get_fields()]
+
+    group = None
+    if group_name:
+        try:
+            group = _get_import_group(group_name)
+        except Exception as e:
+            errors.append(str(e))
+            return {'targets': [], 'errors': errors}
+
+    parsed_rows = []
+    rows = _parse_import_rows(targetreader, base_target_fields, errors)
+    resolved = _resolve_gaia_alerts(rows, harvester)
+    for index, target_fields, target_names, target_extra_fields in rows:
+        try:
+            if "GAIA_ALERTS" in target_names:
+                target_fields = _fill_target_fields_from_gaia_alerts(target_fields, target_names, resolved)
+            target_fields.setdefault('type', Target.SIDEREAL)
+            parsed_rows.append((index, target_fields, target_names, target_extra_fields))
+        except Exception as e:
+            errors.append(f"Error importing row {index}: {str(e)}")
+
+    existing_names = set(Target.objects.filter(name__in=[fields.get('name') for _, fields, _, _ in parsed_rows])
+                         .values_list('name', flat=True))
+    sky_index = InMemorySkyIndex.from_queryset(Target.objects.all())
+
+    accepted_rows = []
+    for index, target_fields, target_names, target_extra_fields in parsed_rows:
+        try:
+            check_target_value(target_fields, sky_index=sky_index)
+            if target_fields.get('name') in existing_names:
+                raise ValueError(f"Target with name {target_fields.get('name')} already exists")
+            existing_names.add(target_fields.get('name'))
+            sky_index.add(target_fields['name'], target_fields['ra'], target_fields['dec'])
+            accepted_rows.append((index, target_fields, target_names, target_extra_fields))
+        except Exception as e:
+            errors.append(f"Error importing row {index}: {str(e)}")
+
+    created_targets = []
+    try:
+        with transaction.atomic():
+            new_targets = Target.objects.bulk_create([Target(**fields) for _, fields, _, _ in accepted_rows],
+                                                     batch_size=batch_size)
+            names = []
+            extras = []
+            for target, (_, _, target_names, target_extra_fields) in zip(new_targets, accepted_rows):
+                for source_name, name in target_names.items():
+                    names.append(TargetName(target=target, source_name=source_name.upper().replace('_NAME', ''),
+                                            name=name))
+                for key, value in target_extra_fields:
+                    extras.append(_prepare_target_extra(TargetExtra(target=target, key=key, value=value)))
+            TargetName.objects.bulk_create(names, batch_size=batch_size)
+            TargetExtra.objects.bulk_create(extras, batch_size=batch_size)
+
+            created_targets = list(Target.objects.filter(pk__in=[target.pk for target in new_targets]).order_by('pk'))
+            bulk_update_sky_positions(created_targets)
+            bulk_index_target_names(created_targets)
+            if group:
+                group.targets.add(*created_targets)
+                logger.info(f"Successfully added {len(created_targets)} targets to group {group.name}")
+    except Exception as e:
+        # fall back to one transaction per row, so that the failing rows are reported individually
+        logger.error(f"Bulk import failed, importing row by row: {e}")
+        created_targets = []
+        for index, target_fields, target_names, target_extra_fields in accepted_rows:
+            try:
+                with transaction.atomic():
+                    target = _create_target(target_fields, target_names, target_extra_fields)
+                    if group:
+                        group.targets.add(target)
+                created_targets.append(target)
+            except Exception as row_error:
+                error = f"Error importing row {index}: {str(row_error)}"
+                logger.error(error)
+                errors.append(error)
+
+    for target in created_targets:
+        try:
+            run_hook('target_post_save', target=target, created=True, user=user)
+        except Exception as e:
+            logger.error(f"Error in import hook: {e}")
+            errors.append(f"Error in import hook: {e}")
 
-def check_target_value(target_fields):
+    logger.info(f"Bulk import: {len(created_targets)} targets created, {len(errors)} errors")
+    return {'targets': created_targets, 'errors': errors}
+
+
+def check_target_value(target_fields, sky_index=None):
+    """
+    Validates the description and coordinates of an imported target and checks that no other target
+    lies within 3 arcsec. The neighbours are looked up in the given InMemorySkyIndex, or in the database.
+    """
     ra = float(target_fields['ra'])
     dec = float(target_fields['dec'])
     desc = target_fields['description']
@@ -209,8 +398,11 @@ def check_target_value(target_fields):
     if ra < 0 or ra > 360 or dec < -90 or dec > 90:
         logger.error("Coordinates beyond range")
         raise ValueError("Coordinates beyond range")
-    stored = Target.objects.all()
-    coords_names = check_for_existing_coords(ra, dec, 3. / 3600., stored)
+    if sky_index is not None:
+        coords_names = sky_index.query(ra, dec, 3. / 3600.)
+    else:
+        stored = Target.objects.all()
+        coords_names = check_for_existing_coords(ra, dec, 3. / 3600., stored)
 
     if len(coords_names) != 0:
         ccnames = ' '.join(coords_names)
@@ -326,33 +518,25 @@ def coords_to_degrees(value, c_type):
             raise Exception('Invalid format. Please use sexigesimal or degrees')
 
 
-def update_targetList_cache():
-    cachePath = os.path.join(settings.BASE_DIR, "/data//cache/targetList")
-
-    for file in os.listdir(cachePath):
-        f = os.path.join(cachePath, file)
-        if file.endswith('.djcache') and os.path.isfile(f):
-            try:
-                os.remove(f)
-            except OSError as e:
-                logger.error('Failed to remove + ' + str(e))
-                continue
-
-    context = {}
-    target = Target.objects.all()
-    context['object_list'] = target
-    request = HttpRequest()
-    render(request, 'bhtom_targets/partials/target_table.html', context)
-
-
-def update_targetDetails_cache():
-    cachePath = os.path.join(settings.BASE_DIR, "/data/cache/targetDetails")
+def update_targetList_cache(target=None):
+    """
+    Invalidates the cached target list tables showing the given target, or all of them if no target is given.
+    Nothing is removed or rendered here, the tables are rebuilt on the next request, see bhtom2.utils.target_cache.
+    """
+    if target is not None:
+        bump_target_version(target.pk)
+    else:
+        bump_cache_generation(TARGET_LIST_CACHE)
 
-    for file in os.listdir(cachePath):
-        f = os.path.join(cachePath, file)
-        if file.endswith('.djcache') and os.path.isfile(f):
-            os.remove(f)
 
+def update_targetDetails_cache(target=None):
+    """
+    Invalidates the cached fragments of the given target's details page, or of all targets if no target is given.
+    """
+    if target is not None:
+        bump_target_version(target.pk)
+    else:
+        bump_cache_generation(TARGET_DETAILS_CACHE)
 
 
 def get_brokers():
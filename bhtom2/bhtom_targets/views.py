@@ -1,4 +1,5 @@
 import csv
+import os
 from datetime import datetime
 from io import StringIO
 
@@ -6,17 +7,21 @@ from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.models import Group
-from django.http import HttpResponseRedirect
+from django.http import FileResponse, HttpResponseRedirect, JsonResponse
 from django.shortcuts import redirect
 from django.views.generic.edit import CreateView, UpdateView
 from django.http import Http404
 
-import os
-from django.http import FileResponse
 
 from bhtom2.bhtom_targets.forms import NonSiderealTargetCreateForm, SiderealTargetCreateForm, TargetLatexDescriptionForm
 from bhtom2.bhtom_targets.hooks import update_force_reducedDatum
-from bhtom2.bhtom_targets.utils import import_targets
+from bhtom2.bhtom_targets.utils import bulk_import_targets
+from bhtom2.utils.name_resolver import exact_target_ids, similar_names
+from bhtom2.utils.photometry_summary import get_photometry_summary
+from bhtom2.utils.microlensing_jobs import get_fit_state
+from bhtom2.utils.plot_cache import get_plot
+from bhtom2.utils.plot_downsampling import plot_window
+from bhtom2.utils.plot_thumbnails import CONTENT_TYPES, thumbnail_format, thumbnail_path
 from bhtom2.external_service.data_source_information import get_pretty_survey_name
 from bhtom2.utils.bhtom_logger import BHTOMLogger
 from bhtom2.utils.openai_utils import latex_target_title_prompt, latex_text_target_prompt, \
@@ -44,11 +49,11 @@ from django.views.generic.detail import DetailView
 from guardian.mixins import PermissionListMixin
 from bhtom2.bhtom_targets.filters import TargetFilter
 
-from bhtom2.utils.reduced_data_utils import save_high_energy_data_for_target_to_csv_file, save_photometry_data_for_target_to_csv_file, \
-    save_radio_data_for_target_to_csv_file
+from bhtom2.utils.reduced_data_utils import stream_high_energy_data_for_target, stream_photometry_data_for_target, \
+    stream_radio_data_for_target, streaming_file_response
 
 from bhtom_base.bhtom_targets.models import Target, TargetList
-from bhtom_base.bhtom_dataproducts.models import ReducedDatum, BrokerCadence
+from bhtom_base.bhtom_dataproducts.models import BrokerCadence
 
 logger: BHTOMLogger = BHTOMLogger(__name__, 'Bhtom: bhtom_targets.views')
 
@@ -240,6 +245,10 @@ class TargetListView(SingleTableMixin, PermissionListMixin, FilterView):
     permission_required = 'bhtom_targets.view_target'
     table_pagination = False
 
+    def get_queryset(self, *args, **kwargs):
+        # the rows read the point counts from the photometry summary
+        return super().get_queryset(*args, **kwargs).select_related('photometry_summary')
+
     def get_context_data(self, *args, **kwargs):
         """
         Adds the number of targets visible, the available ``TargetList`` objects if the user is authenticated, and
@@ -467,9 +476,13 @@ class TargetGenerateTargetDescriptionLatexView(LoginRequiredMixin, UpdateView):
 
 class TargetDownloadDataView(ABC, PermissionRequiredMixin, View):
     permission_required = 'bhtom_dataproducts.add_dataproduct'
+    content_type = 'text/csv'
 
     @abstractmethod
     def generate_data_method(self, target_id):
+        """
+        Returns the file content as an iterator of strings and the file name.
+        """
         pass
 
     def get(self, request, *args, **kwargs):
@@ -482,23 +495,16 @@ class TargetDownloadDataView(ABC, PermissionRequiredMixin, View):
             target_id = kwargs['name']
         logger.info(f'Generating file for target with id={str(target_id)}...')
 
-        tmp = None
         try:
-            tmp, filename = self.generate_data_method(target_id)
-            return FileResponse(open(tmp.name, 'rb'),
-                                as_attachment=True,
-                                filename=filename)
+            stream, filename = self.generate_data_method(target_id)
+            return streaming_file_response(stream, filename, content_type=self.content_type)
         except Exception as e:
             logger.error(f'Error while generating file for target with id={target_id}: {e}')
-        finally:
-            if tmp:
-                try:
-                    os.remove(tmp.name)
-                except Exception as e:
-                    logger.error("Error in delete tmp: " + str(e))
 
 
 class TargetDownloadPhotometryStatsLatexTableView(TargetDownloadDataView):
+    content_type = 'application/x-tex'
+
     def generate_data_method(self, target_id):
         return get_photometry_stats_latex(target_id)
 
@@ -512,7 +518,7 @@ class TargetImportView(LoginRequiredMixin, TemplateView):
 
     def post(self, request):
         """
-        Handles the POST requests to this view. Creates a StringIO object and passes it to ``import_targets``.
+        Handles the POST requests to this view. Creates a StringIO object and passes it to ``bulk_import_targets``.
 
         :param request: the request object passed to this view
         :type request: HTTPRequest
@@ -530,7 +536,7 @@ class TargetImportView(LoginRequiredMixin, TemplateView):
             return redirect(reverse('bhtom_targets:list'))
 
         group_name = request.POST.get('group_name', None)
-        result = import_targets(csv_stream, group_name, user)
+        result = bulk_import_targets(csv_stream, group_name, user)
         messages.success(
             request,
             'Targets created: {}'.format(len(result['targets']))
@@ -540,36 +546,6 @@ class TargetImportView(LoginRequiredMixin, TemplateView):
         return redirect(reverse('bhtom_targets:list'))
 
 
-class TargetDownloadDataView(ABC, PermissionRequiredMixin, View):
-    permission_required = 'bhtom_dataproducts.add_dataproduct'
-
-    @abstractmethod
-    def generate_data_method(self, target_id):
-        pass
-
-    def get(self, request, *args, **kwargs):
-        import os
-        from django.http import FileResponse
-
-        if 'pk' in kwargs:
-            target_id = kwargs['pk']
-        elif 'name' in kwargs:
-            target_id = kwargs['name']
-        logger.info(f'Generating photometry CSV file for target with id={target_id}...')
-
-        tmp = None
-        try:
-            tmp, filename = self.generate_data_method(target_id)
-            return FileResponse(open(tmp.name, 'rb'),
-                                as_attachment=True,
-                                filename=filename)
-        except Exception as e:
-            logger.error(f'Error while generating photometry CSV file for target with id={target_id}: {e}')
-        finally:
-            if tmp:
-                os.remove(tmp.name)
-
-
 class TargetDownloadPhotometryDataView(TargetDownloadDataView):
     def generate_data_method(self, target_id):
         ip_address = get_client_ip(self.request)
@@ -579,7 +555,7 @@ class TargetDownloadPhotometryDataView(TargetDownloadDataView):
                 download_type='P',
                 ip_address=ip_address
             )
-        return save_photometry_data_for_target_to_csv_file(target_id)
+        return stream_photometry_data_for_target(target_id)
 
 
 class TargetDownloadRadioDataView(TargetDownloadDataView):
@@ -591,7 +567,7 @@ class TargetDownloadRadioDataView(TargetDownloadDataView):
                 download_type='R',
                 ip_address=ip_address
             )
-        return save_radio_data_for_target_to_csv_file(target_id)
+        return stream_radio_data_for_target(target_id)
 
 class TargetDownloadHEDataView(TargetDownloadDataView):
     def generate_data_method(self, target_id):
@@ -602,7 +578,7 @@ class TargetDownloadHEDataView(TargetDownloadDataView):
                 download_type='H',
                 ip_address=ip_address
             )
-        return save_high_energy_data_for_target_to_csv_file(target_id)
+        return stream_high_energy_data_for_target(target_id)
 
 
 # Table list view with light curves only
@@ -648,35 +624,13 @@ class TargetMicrolensingView(PermissionRequiredMixin, DetailView):
         else:
             target: Target = Target.objects.get(name=target_id)
 
-        datums = ReducedDatum.objects.filter(target=target,
-                                             data_type=settings.DATA_PRODUCT_TYPES['photometry'][0]
-                                             ).filter(error__gt=0, active_flg=True)
-
-        allobs = []
-        allobs_nowise = []
-        for datum in datums:
-            ff = str(datum.filter)
-            if "LAT" in ff:
-                continue
-
-            allobs.append(ff)
-
-            if "WISE" not in ff:
-                allobs_nowise.append(ff)
-
         # counting the number of entires per filter in order to remove the very short ones
-        filter_counts = {}
-        for obs in allobs:
-            if obs in filter_counts:
-                filter_counts[obs] += 1
-            else:
-                filter_counts[obs] = 1
+        summary = get_photometry_summary(target.pk)
+        filter_counts = {ff: count for ff, count in summary.measured_filter_counts.items() if "LAT" not in ff}
+        allobs = list(filter_counts)
 
         # Create a new list that only includes filters with at least three occurrences
-        allobs_filtered = []
-        for obs in allobs_nowise:
-            if filter_counts[obs] > 2:
-                allobs_filtered.append(obs)
+        allobs_filtered = [obs for obs, count in filter_counts.items() if "WISE" not in obs and count > 2]
 
         # extracting uniq list and sort it alphabetically
         all_filters = sorted(set(allobs))
@@ -700,6 +654,7 @@ class TargetMicrolensingView(PermissionRequiredMixin, DetailView):
             logu0 = request.GET.get('logu0', '')
             fixblending = request.GET.get('fixblending', 'on')
             auto_init = request.GET.get('auto_init', '')
+            multistart = request.GET.get('multistart', '')
             selected_filters = request.GET.getlist('selected_filters')
         else:
             selected_filters = all_filters_nowise  # by default, selecting all filters but wise
@@ -727,11 +682,65 @@ class TargetMicrolensingView(PermissionRequiredMixin, DetailView):
             'logu0': logu0,
             'fixblending': fixblending,
             'auto_init': auto_init,
+            'multistart': multistart,
             'filter_counts': filter_counts
         })
         return self.render_to_response(context)
 
 
+class TargetPhotometryPlotWindowView(View):
+    """
+    Full-resolution points of the photometry plot between start and end (dates or numbers, as the plot's x axis),
+    loaded by the target page when the downsampled plot is zoomed in.
+    """
+
+    def get(self, request, *args, **kwargs):
+        start = request.GET.get('start')
+        end = request.GET.get('end')
+        if not start or not end:
+            return JsonResponse({'Error': 'start and end are required'}, status=400)
+        try:
+            target = Target.objects.get(pk=kwargs['pk'])
+        except Target.DoesNotExist:
+            raise Http404
+        if not target.photometry_plot:
+            raise Http404
+        try:
+            traces = plot_window(get_plot(target.photometry_plot).figure, start, end)
+        except FileNotFoundError:
+            raise Http404
+        return JsonResponse({'traces': traces})
+
+
+class TargetThumbnailView(View):
+    """
+    Light-curve icon thumbnail of a target. The file name carries the version of the icon plot,
+    so the response can be cached for a year.
+    """
+
+    def get(self, request, *args, **kwargs):
+        if not kwargs['version'].isalnum():
+            raise Http404
+        path = thumbnail_path(kwargs['pk'], kwargs['version'])
+        if not os.path.exists(path):
+            raise Http404
+        response = FileResponse(open(path, 'rb'), content_type=CONTENT_TYPES.get(thumbnail_format()))
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
+
+
+class TargetMicrolensingFitStatusView(PermissionRequiredMixin, View):
+    """
+    Status of a background microlensing fit, polled by the microlensing pages until the fit is done.
+    """
+    permission_required = 'bhtom_targets.view_target'
+
+    def get(self, request, *args, **kwargs):
+        if not kwargs['key'].isalnum():
+            raise Http404
+        return JsonResponse({'status': get_fit_state(kwargs['key'])['status']})
+
+
 class UpdateReducedDatum(LoginRequiredMixin, RedirectView):
 
         """
@@ -762,12 +771,16 @@ class TargetNotFoundView(View):
     def get(self, request, *args, **kwargs):
         # Get the target_name from the query parameters
         target_name = request.GET.get('target_name', 'Unknown Target')
+        context = {'target_name': target_name, 'alias': None, 'target_alias': None, 'similar_names': []}
         try:
-            alias = TargetName.objects.get(name=target_name)
-            context = {'target_name': target_name, 'alias': alias.name, 'target_alias': alias.target}
+            target_ids = exact_target_ids(target_name)
+            if target_ids:
+                target = Target.objects.get(pk=target_ids[0])
+                context.update({'alias': target_name, 'target_alias': target})
+            else:
+                context['similar_names'] = similar_names(target_name)
         except Exception as e:
-            alias = None
-            context = {'target_name': target_name, 'alias': None, 'target_alias': None}
+            logger.error(f"Error while resolving target name {target_name}: {e}")
         return render(request, self.template_name, context)
     
 
@@ -0,0 +1,56 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bhtom_base.bhtom_targets.models import Target
+from bhtom_base.bhtom_targets.utils import cone_search_filter as trig_cone_search_filter
+from bhtom2.utils.sky_index import cone_search_filter
+
+
+class Command(BaseCommand):
+    help = 'Compares the sky index cone search with the trigonometric cone search on the current catalogue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cones', type=int, default=200)
+        parser.add_argument('--radii', type=float, nargs='+', default=[3. / 3600., 1. / 60., 0.25, 2.0])
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        targets = list(Target.objects.filter(ra__isnull=False, dec__isnull=False).values_list('ra', 'dec'))
+        if not targets:
+            raise CommandError('No targets with coordinates')
+
+        mismatches = 0
+        for radius in options['radii']:
+            trig_time = index_time = 0.
+            for _ in range(options['cones']):
+                # half of the cones are centered on existing targets, half are random
+                if rng.random() < 0.5:
+                    ra, dec = rng.choice(targets)
+                else:
+                    ra, dec = rng.uniform(0, 360), rng.uniform(-90, 90)
+                queryset = Target.objects.all()
+
+                start = time.perf_counter()
+                expected = set(trig_cone_search_filter(queryset, ra, dec, radius).values_list('id', flat=True))
+                trig_time += time.perf_counter() - start
+
+                start = time.perf_counter()
+                found = set(cone_search_filter(queryset, ra, dec, radius).values_list('id', flat=True))
+                index_time += time.perf_counter() - start
+
+                if found != expected:
+                    mismatches += 1
+                    self.stdout.write(self.style.WARNING(
+                        f'Mismatch at ra={ra}, dec={dec}, radius={radius}: '
+                        f'only trig {sorted(expected - found)}, only index {sorted(found - expected)}'))
+
+            self.stdout.write(f'radius={radius:.6f} deg, {options["cones"]} cones: '
+                              f'trig {1000 * trig_time / options["cones"]:.2f} ms/query, '
+                              f'sky index {1000 * index_time / options["cones"]:.2f} ms/query')
+
+        if mismatches:
+            raise CommandError(f'{mismatches} cone searches returned different targets')
+        self.stdout.write(self.style.SUCCESS('Sky index results identical to the trigonometric cone search'))
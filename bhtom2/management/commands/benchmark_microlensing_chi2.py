@@ -0,0 +1,77 @@
+import time
+
+import MulensModel as mm
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from bhtom2.utils.microlensing_chi2 import MAG_ZEROPOINT, PointLensChi2, point_lens_magnification
+from bhtom2.utils.microlensing_data import load_microlensing_photometry
+from bhtom2.utils.microlensing_multistart import chi2_fun
+
+PARAMETERS = ['t_0', 'u_0', 't_E']
+
+
+class Command(BaseCommand):
+    help = 'Compares the per-evaluation time and the value of the NumPy and MulensModel point-lens chi2'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-id', type=int, action='append', dest='target_ids',
+                            help='Target id, can be given several times (default: a simulated light curve)')
+        parser.add_argument('--points', type=int, default=2000, help='Points of the simulated light curve')
+        parser.add_argument('--evaluations', type=int, default=500)
+        parser.add_argument('--fixblending', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['target_ids']:
+            light_curves = []
+            for target_id in options['target_ids']:
+                photometry = load_microlensing_photometry(target_id)
+                datasets = [(p.time, p.mag, p.error) for p in photometry.values() if len(p.time) > 2]
+                if datasets:
+                    light_curves.append((f'target {target_id}', datasets))
+            if not light_curves:
+                raise CommandError('No photometry for the given targets')
+        else:
+            light_curves = [('simulated', self.simulated(options['points']))]
+
+        for name, datasets in light_curves:
+            self.benchmark(name, datasets, options['evaluations'], options['fixblending'])
+
+    def simulated(self, points):
+        rng = np.random.default_rng(0)
+        datasets = []
+        for n, mag0, source_fraction in ((points // 2, 16., 0.8), (points // 3, 17., 0.5), (points // 6, 15.5, 1.)):
+            times = np.sort(rng.uniform(2459500., 2460500., n))
+            flux = np.power(10., 0.4 * (MAG_ZEROPOINT - mag0)) * \
+                (source_fraction * point_lens_magnification(times, 2460000., 0.1, 40.) + 1 - source_fraction)
+            datasets.append((times, MAG_ZEROPOINT - 2.5 * np.log10(flux) + rng.normal(0, 0.01, n),
+                             np.full(n, 0.01)))
+        return datasets
+
+    def benchmark(self, name, datasets, evaluations, fixblending):
+        times = np.concatenate([dataset[0] for dataset in datasets])
+        t_0 = float(times[np.argmin(np.concatenate([dataset[1] for dataset in datasets]))])
+        rng = np.random.default_rng(1)
+        thetas = np.column_stack([t_0 + rng.normal(0, 5, evaluations), rng.uniform(0.05, 1., evaluations),
+                                  rng.uniform(10., 100., evaluations)])
+
+        datas = [mm.MulensData(data_list=dataset, phot_fmt='mag', add_2450000=False) for dataset in datasets]
+        model = mm.Model(dict(zip(PARAMETERS, thetas[0])))
+        if fixblending:
+            event = mm.Event(datasets=datas, model=model, fix_blend_flux={data: 0 for data in datas})
+        else:
+            event = mm.Event(datasets=datas, model=model)
+        engine = PointLensChi2(datasets, fixblending)
+
+        start = time.perf_counter()
+        expected = [chi2_fun(theta, PARAMETERS, event, False) for theta in thetas]
+        mulens_time = (time.perf_counter() - start) / evaluations
+        start = time.perf_counter()
+        values = [engine(theta) for theta in thetas]
+        numpy_time = (time.perf_counter() - start) / evaluations
+
+        difference = np.max(np.abs(np.array(values) / np.array(expected) - 1.))
+        self.stdout.write(self.style.SUCCESS(
+            f'{name}, {len(times)} points in {len(datasets)} datasets: MulensModel {1e6 * mulens_time:.0f} us, '
+            f'NumPy {1e6 * numpy_time:.0f} us per chi2 ({mulens_time / numpy_time:.1f}x), '
+            f'largest relative difference {difference:.1e}'))
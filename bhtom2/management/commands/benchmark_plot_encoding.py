@@ -0,0 +1,58 @@
+import gzip
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bhtom_base.bhtom_targets.models import Target
+from bhtom2.utils.plot_cache import get_plot
+from bhtom2.utils.plot_encoding import encode_typed_arrays
+
+
+class Command(BaseCommand):
+    help = 'Compares payload size and encode time of the plot API as JSON and as base64 typed arrays'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-id', type=int, action='append', dest='target_ids',
+                            help='Target id, can be given several times (default: the targets with the largest plots)')
+        parser.add_argument('--targets', type=int, default=20, help='Number of largest plots used by default')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        targets = Target.objects.exclude(photometry_plot__isnull=True).exclude(photometry_plot='')
+        if options['target_ids']:
+            targets = targets.filter(pk__in=options['target_ids'])
+
+        plots = []
+        for target in targets.iterator():
+            try:
+                plot = get_plot(target.photometry_plot)
+            except OSError:
+                continue
+            plots.append((plot.size, target.name, plot.figure))
+        if not plots:
+            raise CommandError('No targets with a photometry plot')
+        if not options['target_ids']:
+            plots = sorted(plots, key=lambda plot: plot[0], reverse=True)[:options['targets']]
+
+        totals = {'json': [0, 0, 0.], 'typed': [0, 0, 0.]}
+        for _, name, figure in plots:
+            row = []
+            for encoding, encode in (('json', lambda data: data), ('typed', encode_typed_arrays)):
+                start = time.perf_counter()
+                for _ in range(options['repeat']):
+                    payload = json.dumps(encode({'Plots': {name: figure}})).encode()
+                elapsed = (time.perf_counter() - start) / options['repeat']
+                compressed = len(gzip.compress(payload))
+                totals[encoding][0] += len(payload)
+                totals[encoding][1] += compressed
+                totals[encoding][2] += elapsed
+                row.append(f'{encoding} {len(payload) / 1024:.1f} kB (gzip {compressed / 1024:.1f} kB) '
+                           f'{1000 * elapsed:.1f} ms')
+            self.stdout.write(f'{name}: ' + ', '.join(row))
+
+        json_size, json_gzip, json_time = totals['json']
+        typed_size, typed_gzip, typed_time = totals['typed']
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(plots)} plots: typed arrays {typed_size / json_size:.2f}x the JSON size '
+            f'({typed_gzip / json_gzip:.2f}x gzipped), {typed_time / json_time:.2f}x the encode time'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from bhtom_base.bhtom_targets.models import Target
+from bhtom2.utils.plot_thumbnails import render_thumbnail
+
+
+class Command(BaseCommand):
+    help = 'Renders the light-curve icon thumbnails of the targets shown in the target list with images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-id', type=int, action='append', dest='target_ids',
+                            help='Target id, can be given several times (default: all targets with an icon plot)')
+        parser.add_argument('--rebuild', action='store_true', help='Render the thumbnails again even if up to date')
+
+    def handle(self, *args, **options):
+        targets = Target.objects.exclude(photometry_icon_plot__isnull=True).exclude(photometry_icon_plot='')
+        if options['target_ids']:
+            targets = targets.filter(pk__in=options['target_ids'])
+
+        count = 0
+        for target in targets.order_by('pk').iterator():
+            try:
+                if render_thumbnail(target, rebuild=options['rebuild']):
+                    count += 1
+            except Exception as e:
+                self.stderr.write(f'Error while rendering thumbnail of target {target.pk}: {e}')
+
+        self.stdout.write(self.style.SUCCESS(f'Rendered thumbnails of {count} targets'))
@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bhtom2.utils.microlensing_screening import run_screening, targets_to_screen
+
+
+class Command(BaseCommand):
+    help = 'Screens the photometry of the targets for microlensing events (the targets changed since the last run)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-id', type=int, action='append', dest='target_ids',
+                            help='Target id, can be given several times (default: the targets changed since their '
+                                 'last screening)')
+        parser.add_argument('--rebuild', action='store_true', help='Screen all targets with optical photometry')
+        parser.add_argument('--workers', type=int, default=settings.MICROLENSING_SCREENING_WORKERS,
+                            help='Number of worker processes')
+        parser.add_argument('--every', type=int, default=0,
+                            help='Keep running, screening the changed targets every given number of seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            start = time.time()
+            target_ids = options['target_ids'] or targets_to_screen(rebuild=options['rebuild'])
+            screened, failed = run_screening(target_ids, workers=options['workers'])
+            style = self.style.SUCCESS if not failed else self.style.WARNING
+            self.stdout.write(style(f'Screened {screened} targets for microlensing in {time.time() - start:.1f} s, '
+                                    f'{failed} failed'))
+            if options['every'] <= 0:
+                break
+            options['rebuild'] = False
+            time.sleep(max(options['every'] - (time.time() - start), 0))
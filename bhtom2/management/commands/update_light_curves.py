@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bhtom_base.bhtom_dataproducts.models import ReducedDatum
+from bhtom2.utils.light_curve_store import rebuild_light_curve, update_light_curve
+
+
+class Command(BaseCommand):
+    help = 'Builds or updates the columnar light-curve cache of the targets with photometry'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-id', type=int, action='append', dest='target_ids',
+                            help='Target id, can be given several times (default: all targets with photometry)')
+        parser.add_argument('--rebuild', action='store_true', help='Rebuild the light curves from scratch')
+
+    def handle(self, *args, **options):
+        target_ids = options['target_ids']
+        if not target_ids:
+            target_ids = (ReducedDatum.objects.filter(data_type=settings.DATA_PRODUCT_TYPES['photometry'][0])
+                          .values_list('target_id', flat=True).distinct().order_by('target_id'))
+
+        count = 0
+        for target_id in target_ids:
+            if options['rebuild']:
+                rebuild_light_curve(target_id)
+            else:
+                update_light_curve(target_id)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Updated light curves of {count} targets'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from bhtom_base.bhtom_targets.models import Target
+from bhtom2.utils.name_resolver import bulk_index_target_names
+
+
+class Command(BaseCommand):
+    help = 'Fills the name lookup table (TargetNameKey) used by the name resolver for all targets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        targets = Target.objects.only('id', 'name').order_by('id')
+
+        stored = 0
+        chunk = []
+        for target in targets.iterator(chunk_size=chunk_size):
+            chunk.append(target)
+            if len(chunk) == chunk_size:
+                stored += bulk_index_target_names(chunk)
+                chunk = []
+        if chunk:
+            stored += bulk_index_target_names(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f'Stored {stored} name keys'))
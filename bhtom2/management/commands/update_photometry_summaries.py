@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bhtom_base.bhtom_dataproducts.models import ReducedDatum
+from bhtom2.utils.photometry_summary import check_photometry_summary, rebuild_photometry_summary, \
+    stale_photometry_summaries, update_photometry_summary
+
+
+class Command(BaseCommand):
+    help = 'Builds, updates or checks the photometry summaries of the targets with photometry'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-id', type=int, action='append', dest='target_ids',
+                            help='Target id, can be given several times (default: all targets with photometry, '
+                                 'without --rebuild and --check only those whose summary is behind their photometry)')
+        parser.add_argument('--rebuild', action='store_true', help='Rebuild the summaries from scratch')
+        parser.add_argument('--check', action='store_true',
+                            help='Compare the summaries with the database and report the differences')
+        parser.add_argument('--fix', action='store_true', help='With --check, rebuild the inconsistent summaries')
+
+    def handle(self, *args, **options):
+        target_ids = options['target_ids']
+        if not target_ids and not options['check'] and not options['rebuild']:
+            target_ids = stale_photometry_summaries()
+        elif not target_ids:
+            target_ids = (ReducedDatum.objects.filter(data_type=settings.DATA_PRODUCT_TYPES['photometry'][0])
+                          .values_list('target_id', flat=True).distinct().order_by('target_id'))
+
+        count = 0
+        inconsistent = 0
+        for target_id in target_ids:
+            count += 1
+            if options['check']:
+                fields = check_photometry_summary(target_id)
+                if fields:
+                    inconsistent += 1
+                    self.stdout.write(f'Target {target_id}: {", ".join(fields)}')
+                    if options['fix']:
+                        rebuild_photometry_summary(target_id)
+            elif options['rebuild']:
+                rebuild_photometry_summary(target_id)
+            else:
+                update_photometry_summary(target_id)
+
+        if options['check']:
+            style = self.style.SUCCESS if not inconsistent else self.style.WARNING
+            self.stdout.write(style(f'Checked photometry summaries of {count} targets, {inconsistent} inconsistent'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Updated photometry summaries of {count} targets'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from bhtom_base.bhtom_targets.models import Target
+from bhtom2.utils.sky_index import bulk_update_sky_positions
+
+
+class Command(BaseCommand):
+    help = 'Fills the sky position index (TargetSkyPosition) used by cone searches for all targets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        targets = Target.objects.filter(ra__isnull=False, dec__isnull=False).only('id', 'ra', 'dec').order_by('id')
+
+        stored = 0
+        chunk = []
+        for target in targets.iterator(chunk_size=chunk_size):
+            chunk.append(target)
+            if len(chunk) == chunk_size:
+                stored += bulk_update_sky_positions(chunk)
+                chunk = []
+        if chunk:
+            stored += bulk_update_sky_positions(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f'Stored sky positions of {stored} targets'))
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Composite indexes backing the cursor (keyset) mode of StandardResultsSetPagination:
+    getTargetList walks (created, id), api/data walks (created, id) descending
+    and api/reducedDatum walks (mjd, id) within one target.
+    """
+
+    dependencies = [
+        ('bhtom_targets', '__first__'),
+        ('bhtom_dataproducts', '__first__'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS bhtom2_target_created_id_idx '
+                'ON bhtom_targets_target (created, id);',
+            reverse_sql='DROP INDEX IF EXISTS bhtom2_target_created_id_idx;',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS bhtom2_dataproduct_created_id_idx '
+                'ON bhtom_dataproducts_dataproduct (created, id);',
+            reverse_sql='DROP INDEX IF EXISTS bhtom2_dataproduct_created_id_idx;',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS bhtom2_reduceddatum_target_mjd_id_idx '
+                'ON bhtom_dataproducts_reduceddatum (target_id, mjd, id);',
+            reverse_sql='DROP INDEX IF EXISTS bhtom2_reduceddatum_target_mjd_id_idx;',
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bhtom_targets', '__first__'),
+        ('bhtom2', '0001_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TargetSkyPosition',
+            fields=[
+                ('target', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True,
+                                                related_name='sky_position', serialize=False,
+                                                to='bhtom_targets.target')),
+                ('x', models.FloatField()),
+                ('y', models.FloatField()),
+                ('z', models.FloatField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'target sky position',
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bhtom_targets', '__first__'),
+        ('bhtom2', '0002_targetskyposition'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='TargetNameKey',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(db_index=True, max_length=255)),
+                ('name', models.CharField(max_length=255)),
+                ('source_name', models.CharField(blank=True, default='', max_length=100)),
+                ('target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='name_keys',
+                                             to='bhtom_targets.target')),
+            ],
+            options={
+                'verbose_name': 'target name key',
+                'unique_together': {('target', 'key')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='targetnamekey',
+            index=GinIndex(fields=['key'], name='bhtom2_targetnamekey_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bhtom_targets', '__first__'),
+        ('bhtom2', '0003_targetnamekey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TargetPhotometrySummary',
+            fields=[
+                ('target', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True,
+                                                related_name='photometry_summary', serialize=False,
+                                                to='bhtom_targets.target')),
+                ('datum_count', models.IntegerField(default=0)),
+                ('first_mjd', models.FloatField(blank=True, null=True)),
+                ('last_mjd', models.FloatField(blank=True, null=True)),
+                ('last_magnitude', models.FloatField(blank=True, null=True)),
+                ('last_magnitude_error', models.FloatField(blank=True, null=True)),
+                ('last_magnitude_filter', models.CharField(blank=True, max_length=100, null=True)),
+                ('last_magnitude_facility', models.CharField(blank=True, max_length=100, null=True)),
+                ('last_magnitude_mjd', models.FloatField(blank=True, null=True)),
+                ('last_magnitude_id', models.IntegerField(blank=True, null=True)),
+                ('filter_counts', models.JSONField(default=dict)),
+                ('measured_filter_counts', models.JSONField(default=dict)),
+                ('facility_counts', models.JSONField(default=dict)),
+                ('unit_counts', models.JSONField(default=dict)),
+                ('has_optical', models.BooleanField(db_index=True, default=False)),
+                ('has_radio', models.BooleanField(db_index=True, default=False)),
+                ('has_xray', models.BooleanField(db_index=True, default=False)),
+                ('last_datum_id', models.IntegerField(default=0)),
+                ('modified', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'target photometry summary',
+                'verbose_name_plural': 'target photometry summaries',
+            },
+        ),
+    ]
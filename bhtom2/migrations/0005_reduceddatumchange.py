@@ -0,0 +1,33 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bhtom_targets', '__first__'),
+        ('bhtom2', '0004_targetphotometrysummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReducedDatumChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('datum_id', models.IntegerField(unique=True)),
+                ('created', models.DateTimeField()),
+                ('modified', models.DateTimeField()),
+                ('active', models.BooleanField(default=True)),
+                ('deleted', models.BooleanField(default=False)),
+                ('target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='datum_changes',
+                                             to='bhtom_targets.target')),
+            ],
+            options={
+                'verbose_name': 'reduced datum change',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reduceddatumchange',
+            index=models.Index(fields=['target', 'modified'], name='bhtom2_datumchange_tgt_mod'),
+        ),
+    ]
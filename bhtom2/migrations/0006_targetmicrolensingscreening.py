@@ -0,0 +1,34 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bhtom_targets', '__first__'),
+        ('bhtom2', '0005_reduceddatumchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TargetMicrolensingScreening',
+            fields=[
+                ('target', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True,
+                                                related_name='microlensing_screening', serialize=False,
+                                                to='bhtom_targets.target')),
+                ('score', models.FloatField(blank=True, db_index=True, null=True)),
+                ('t0', models.FloatField(blank=True, null=True)),
+                ('te', models.FloatField(blank=True, db_index=True, null=True)),
+                ('u0', models.FloatField(blank=True, null=True)),
+                ('chi2', models.FloatField(blank=True, null=True)),
+                ('chi2_flat', models.FloatField(blank=True, null=True)),
+                ('point_count', models.IntegerField(default=0)),
+                ('filter_count', models.IntegerField(default=0)),
+                ('summary_modified', models.DateTimeField(blank=True, null=True)),
+                ('screened', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'target microlensing screening',
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+from math import cos, radians, sin
+
+from django.db import migrations
+
+BATCH_SIZE = 5000
+
+
+def backfill_sky_positions(apps, schema_editor):
+    # the same unit vectors as bhtom2.utils.sky_index, with the historical models
+    Target = apps.get_model('bhtom_targets', 'Target')
+    TargetSkyPosition = apps.get_model('bhtom2', 'TargetSkyPosition')
+
+    targets = Target.objects.filter(ra__isnull=False, dec__isnull=False, sky_position__isnull=True) \
+        .order_by('id').values_list('id', 'ra', 'dec')
+    positions = []
+    for target_id, ra, dec in targets.iterator(chunk_size=BATCH_SIZE):
+        ra_rad, dec_rad = radians(float(ra)), radians(float(dec))
+        positions.append(TargetSkyPosition(target_id=target_id, x=cos(dec_rad) * cos(ra_rad),
+                                           y=cos(dec_rad) * sin(ra_rad), z=sin(dec_rad)))
+        if len(positions) == BATCH_SIZE:
+            TargetSkyPosition.objects.bulk_create(positions, ignore_conflicts=True)
+            positions = []
+    TargetSkyPosition.objects.bulk_create(positions, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bhtom_targets', '__first__'),
+        ('bhtom2', '0006_targetmicrolensingscreening'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_sky_positions, migrations.RunPython.noop),
+    ]
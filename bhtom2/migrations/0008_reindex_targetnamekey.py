@@ -0,0 +1,64 @@
+import re
+import unicodedata
+
+from django.db import migrations
+
+BATCH_SIZE = 5000
+
+# the keys of bhtom2.utils.name_resolver at the time of this migration
+NAME_PREFIXES = {'at': 'tns', 'sn': 'tns'}
+SEPARATORS = re.compile(r'[\s_\-]+')
+
+
+def name_keys(name):
+    key = SEPARATORS.sub('', unicodedata.normalize('NFKC', str(name)).casefold())
+    if not key:
+        return []
+    keys = [key]
+    for prefix, survey in NAME_PREFIXES.items():
+        stem = key[len(prefix):]
+        if key.startswith(prefix) and stem[:1].isdigit():
+            keys.append(f'{survey}:{stem}')
+            break
+    return keys
+
+
+def reindex_target_names(apps, schema_editor):
+    # the keys without the survey prefix (e.g. '19abc' for Gaia19abc and ASASSN-19abc) matched other objects
+    Target = apps.get_model('bhtom_targets', 'Target')
+    TargetName = apps.get_model('bhtom_targets', 'TargetName')
+    TargetNameKey = apps.get_model('bhtom2', 'TargetNameKey')
+
+    TargetNameKey.objects.all().delete()
+    target_ids = list(Target.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(target_ids), BATCH_SIZE):
+        chunk = target_ids[start:start + BATCH_SIZE]
+        names = {target_id: [('', name)] for target_id, name in
+                 Target.objects.filter(id__in=chunk).values_list('id', 'name')}
+        for target_id, source_name, name in TargetName.objects.filter(target_id__in=chunk) \
+                .values_list('target_id', 'source_name', 'name'):
+            names[target_id].append((source_name, name))
+
+        keys = []
+        for target_id, target_names in names.items():
+            target_keys = {}
+            for source_name, name in target_names:
+                for key in name_keys(name):
+                    # the target's own name wins over an alias with the same key
+                    if key not in target_keys or not source_name:
+                        target_keys[key] = TargetNameKey(target_id=target_id, key=key, name=name,
+                                                         source_name=source_name)
+            keys.extend(target_keys.values())
+        TargetNameKey.objects.bulk_create(keys, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bhtom_targets', '__first__'),
+        ('bhtom2', '0007_backfill_targetskyposition'),
+    ]
+
+    operations = [
+        migrations.RunPython(reindex_target_names, migrations.RunPython.noop),
+    ]
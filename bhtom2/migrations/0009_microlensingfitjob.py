@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bhtom2', '0008_reindex_targetnamekey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MicrolensingFitJob',
+            fields=[
+                ('key', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('started', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'microlensing fit job',
+            },
+        ),
+    ]
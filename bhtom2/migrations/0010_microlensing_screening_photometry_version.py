@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bhtom2', '0009_microlensingfitjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='targetmicrolensingscreening',
+            name='photometry_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='targetmicrolensingscreening',
+            name='photometry_last_id',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,95 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+# statement-level triggers: one INSERT ... SELECT over the changed rows per UPDATE or DELETE statement
+RECORD_CHANGES_SQL = '''
+CREATE OR REPLACE FUNCTION bhtom2_record_datum_changes() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO bhtom2_reduceddatumchange (datum_id, target_id, modified, active, deleted)
+        SELECT id, target_id, clock_timestamp(), active_flg, true FROM old_rows
+        ON CONFLICT (datum_id) DO UPDATE SET target_id = EXCLUDED.target_id, modified = EXCLUDED.modified,
+                                             active = EXCLUDED.active, deleted = EXCLUDED.deleted;
+    ELSE
+        INSERT INTO bhtom2_reduceddatumchange (datum_id, target_id, modified, active, deleted)
+        SELECT id, target_id, clock_timestamp(), active_flg, false FROM new_rows
+        ON CONFLICT (datum_id) DO UPDATE SET target_id = EXCLUDED.target_id, modified = EXCLUDED.modified,
+                                             active = EXCLUDED.active, deleted = EXCLUDED.deleted;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER bhtom2_reduceddatum_update_changes AFTER UPDATE ON bhtom_dataproducts_reduceddatum
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE PROCEDURE bhtom2_record_datum_changes();
+CREATE TRIGGER bhtom2_reduceddatum_delete_changes AFTER DELETE ON bhtom_dataproducts_reduceddatum
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE PROCEDURE bhtom2_record_datum_changes();
+
+CREATE OR REPLACE FUNCTION bhtom2_delete_target_datum_changes() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM bhtom2_reduceddatumchange WHERE target_id IN (SELECT id FROM old_rows);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER bhtom2_target_delete_datum_changes AFTER DELETE ON bhtom_targets_target
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE PROCEDURE bhtom2_delete_target_datum_changes();
+'''
+
+DROP_CHANGES_SQL = '''
+DROP TRIGGER IF EXISTS bhtom2_target_delete_datum_changes ON bhtom_targets_target;
+DROP FUNCTION IF EXISTS bhtom2_delete_target_datum_changes();
+DROP TRIGGER IF EXISTS bhtom2_reduceddatum_delete_changes ON bhtom_dataproducts_reduceddatum;
+DROP TRIGGER IF EXISTS bhtom2_reduceddatum_update_changes ON bhtom_dataproducts_reduceddatum;
+DROP FUNCTION IF EXISTS bhtom2_record_datum_changes();
+'''
+
+
+class Migration(migrations.Migration):
+    """
+    The datum changes are recorded by triggers instead of the ReducedDatum signals, and only updates,
+    deactivations and deletions; target_id becomes a plain column (same column, without the foreign key).
+    """
+
+    dependencies = [
+        ('bhtom_targets', '__first__'),
+        ('bhtom_dataproducts', '__first__'),
+        ('bhtom2', '0010_microlensing_screening_photometry_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reduceddatumchange',
+            name='target',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE,
+                                    related_name='datum_changes', to='bhtom_targets.target'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveIndex(model_name='reduceddatumchange', name='bhtom2_datumchange_tgt_mod'),
+                migrations.RemoveField(model_name='reduceddatumchange', name='target'),
+                migrations.AddField(model_name='reduceddatumchange', name='target_id',
+                                    field=models.IntegerField(db_index=True)),
+                migrations.AddIndex(
+                    model_name='reduceddatumchange',
+                    index=models.Index(fields=['target_id', 'modified'], name='bhtom2_datumchange_tgt_mod'),
+                ),
+            ],
+        ),
+        # the (target_id, modified) index covers the single column index of the former foreign key
+        migrations.AlterField(
+            model_name='reduceddatumchange',
+            name='target_id',
+            field=models.IntegerField(),
+        ),
+        # inserted datums are found by id: the rows of datums never changed after their insert are not needed
+        migrations.RunSQL(
+            sql='DELETE FROM bhtom2_reduceddatumchange WHERE modified = created AND NOT deleted;',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RemoveField(
+            model_name='reduceddatumchange',
+            name='created',
+        ),
+        migrations.RunSQL(sql=RECORD_CHANGES_SQL, reverse_sql=DROP_CHANGES_SQL),
+    ]
@@ -0,0 +1,93 @@
+from django.db import migrations, models
+
+# statement-level triggers: one upsert per target per statement, in target order
+BUMP_VERSIONS_SQL = '''
+CREATE OR REPLACE FUNCTION bhtom2_bump_datum_versions() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO bhtom2_targetdataversion (target_id, version, photometry_version)
+        SELECT target_id, 1, max((data_type = 'photometry')::int) FROM new_rows
+        GROUP BY target_id ORDER BY target_id
+        ON CONFLICT (target_id) DO UPDATE SET
+            version = bhtom2_targetdataversion.version + 1,
+            photometry_version = bhtom2_targetdataversion.photometry_version + EXCLUDED.photometry_version;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO bhtom2_targetdataversion (target_id, version, photometry_version)
+        SELECT target_id, 1, max((data_type = 'photometry')::int)
+        FROM (SELECT target_id, data_type FROM new_rows UNION ALL SELECT target_id, data_type FROM old_rows) changed_rows
+        GROUP BY target_id ORDER BY target_id
+        ON CONFLICT (target_id) DO UPDATE SET
+            version = bhtom2_targetdataversion.version + 1,
+            photometry_version = bhtom2_targetdataversion.photometry_version + EXCLUDED.photometry_version;
+    ELSE
+        INSERT INTO bhtom2_targetdataversion (target_id, version, photometry_version)
+        SELECT target_id, 1, max((data_type = 'photometry')::int) FROM old_rows
+        GROUP BY target_id ORDER BY target_id
+        ON CONFLICT (target_id) DO UPDATE SET
+            version = bhtom2_targetdataversion.version + 1,
+            photometry_version = bhtom2_targetdataversion.photometry_version + EXCLUDED.photometry_version;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER bhtom2_reduceddatum_insert_versions AFTER INSERT ON bhtom_dataproducts_reduceddatum
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE PROCEDURE bhtom2_bump_datum_versions();
+CREATE TRIGGER bhtom2_reduceddatum_update_versions AFTER UPDATE ON bhtom_dataproducts_reduceddatum
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE bhtom2_bump_datum_versions();
+CREATE TRIGGER bhtom2_reduceddatum_delete_versions AFTER DELETE ON bhtom_dataproducts_reduceddatum
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE PROCEDURE bhtom2_bump_datum_versions();
+
+CREATE OR REPLACE FUNCTION bhtom2_bump_target_versions() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        INSERT INTO bhtom2_targetdataversion (target_id, version, photometry_version)
+        SELECT id, 1, 0 FROM new_rows ORDER BY id
+        ON CONFLICT (target_id) DO UPDATE SET version = bhtom2_targetdataversion.version + 1;
+    ELSE
+        DELETE FROM bhtom2_targetdataversion WHERE target_id IN (SELECT id FROM old_rows);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER bhtom2_target_update_versions AFTER UPDATE ON bhtom_targets_target
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE PROCEDURE bhtom2_bump_target_versions();
+CREATE TRIGGER bhtom2_target_delete_versions AFTER DELETE ON bhtom_targets_target
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE PROCEDURE bhtom2_bump_target_versions();
+'''
+
+DROP_VERSIONS_SQL = '''
+DROP TRIGGER IF EXISTS bhtom2_target_delete_versions ON bhtom_targets_target;
+DROP TRIGGER IF EXISTS bhtom2_target_update_versions ON bhtom_targets_target;
+DROP FUNCTION IF EXISTS bhtom2_bump_target_versions();
+DROP TRIGGER IF EXISTS bhtom2_reduceddatum_delete_versions ON bhtom_dataproducts_reduceddatum;
+DROP TRIGGER IF EXISTS bhtom2_reduceddatum_update_versions ON bhtom_dataproducts_reduceddatum;
+DROP TRIGGER IF EXISTS bhtom2_reduceddatum_insert_versions ON bhtom_dataproducts_reduceddatum;
+DROP FUNCTION IF EXISTS bhtom2_bump_datum_versions();
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bhtom_targets', '__first__'),
+        ('bhtom_dataproducts', '__first__'),
+        ('bhtom2', '0011_reduceddatumchange_triggers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TargetDataVersion',
+            fields=[
+                ('target_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+                ('photometry_version', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'target data version',
+            },
+        ),
+        migrations.RunSQL(sql=BUMP_VERSIONS_SQL, reverse_sql=DROP_VERSIONS_SQL),
+    ]
@@ -0,0 +1,122 @@
+from django.db import migrations, models
+
+# the functions of migration 0012 with photometry_rewrites, which counts the statements updating or deleting
+# photometry datums: the photometry summary is rebuilt after them, inserted datums are only added to it
+BUMP_VERSIONS_SQL = '''
+CREATE OR REPLACE FUNCTION bhtom2_bump_datum_versions() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO bhtom2_targetdataversion (target_id, version, photometry_version, photometry_rewrites)
+        SELECT target_id, 1, max((data_type = 'photometry')::int), 0 FROM new_rows
+        GROUP BY target_id ORDER BY target_id
+        ON CONFLICT (target_id) DO UPDATE SET
+            version = bhtom2_targetdataversion.version + 1,
+            photometry_version = bhtom2_targetdataversion.photometry_version + EXCLUDED.photometry_version;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO bhtom2_targetdataversion (target_id, version, photometry_version, photometry_rewrites)
+        SELECT target_id, 1, max((data_type = 'photometry')::int), max((data_type = 'photometry')::int)
+        FROM (SELECT target_id, data_type FROM new_rows UNION ALL SELECT target_id, data_type FROM old_rows) changed_rows
+        GROUP BY target_id ORDER BY target_id
+        ON CONFLICT (target_id) DO UPDATE SET
+            version = bhtom2_targetdataversion.version + 1,
+            photometry_version = bhtom2_targetdataversion.photometry_version + EXCLUDED.photometry_version,
+            photometry_rewrites = bhtom2_targetdataversion.photometry_rewrites + EXCLUDED.photometry_rewrites;
+    ELSE
+        INSERT INTO bhtom2_targetdataversion (target_id, version, photometry_version, photometry_rewrites)
+        SELECT target_id, 1, max((data_type = 'photometry')::int), max((data_type = 'photometry')::int)
+        FROM old_rows
+        GROUP BY target_id ORDER BY target_id
+        ON CONFLICT (target_id) DO UPDATE SET
+            version = bhtom2_targetdataversion.version + 1,
+            photometry_version = bhtom2_targetdataversion.photometry_version + EXCLUDED.photometry_version,
+            photometry_rewrites = bhtom2_targetdataversion.photometry_rewrites + EXCLUDED.photometry_rewrites;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION bhtom2_bump_target_versions() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        INSERT INTO bhtom2_targetdataversion (target_id, version, photometry_version, photometry_rewrites)
+        SELECT id, 1, 0, 0 FROM new_rows ORDER BY id
+        ON CONFLICT (target_id) DO UPDATE SET version = bhtom2_targetdataversion.version + 1;
+    ELSE
+        DELETE FROM bhtom2_targetdataversion WHERE target_id IN (SELECT id FROM old_rows);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+'''
+
+# the functions as created by migration 0012
+RESTORE_VERSIONS_SQL = '''
+CREATE OR REPLACE FUNCTION bhtom2_bump_datum_versions() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO bhtom2_targetdataversion (target_id, version, photometry_version)
+        SELECT target_id, 1, max((data_type = 'photometry')::int) FROM new_rows
+        GROUP BY target_id ORDER BY target_id
+        ON CONFLICT (target_id) DO UPDATE SET
+            version = bhtom2_targetdataversion.version + 1,
+            photometry_version = bhtom2_targetdataversion.photometry_version + EXCLUDED.photometry_version;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO bhtom2_targetdataversion (target_id, version, photometry_version)
+        SELECT target_id, 1, max((data_type = 'photometry')::int)
+        FROM (SELECT target_id, data_type FROM new_rows UNION ALL SELECT target_id, data_type FROM old_rows) changed_rows
+        GROUP BY target_id ORDER BY target_id
+        ON CONFLICT (target_id) DO UPDATE SET
+            version = bhtom2_targetdataversion.version + 1,
+            photometry_version = bhtom2_targetdataversion.photometry_version + EXCLUDED.photometry_version;
+    ELSE
+        INSERT INTO bhtom2_targetdataversion (target_id, version, photometry_version)
+        SELECT target_id, 1, max((data_type = 'photometry')::int) FROM old_rows
+        GROUP BY target_id ORDER BY target_id
+        ON CONFLICT (target_id) DO UPDATE SET
+            version = bhtom2_targetdataversion.version + 1,
+            photometry_version = bhtom2_targetdataversion.photometry_version + EXCLUDED.photometry_version;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION bhtom2_bump_target_versions() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        INSERT INTO bhtom2_targetdataversion (target_id, version, photometry_version)
+        SELECT id, 1, 0 FROM new_rows ORDER BY id
+        ON CONFLICT (target_id) DO UPDATE SET version = bhtom2_targetdataversion.version + 1;
+    ELSE
+        DELETE FROM bhtom2_targetdataversion WHERE target_id IN (SELECT id FROM old_rows);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bhtom_dataproducts', '__first__'),
+        ('bhtom2', '0012_targetdataversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='targetdataversion',
+            name='photometry_rewrites',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='targetphotometrysummary',
+            name='photometry_version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='targetphotometrysummary',
+            name='photometry_rewrites',
+            field=models.BigIntegerField(default=-1),
+        ),
+        migrations.RunSQL(sql=BUMP_VERSIONS_SQL, reverse_sql=RESTORE_VERSIONS_SQL),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations
+
+# a written calibration (e.g. a new scatter from CPCS) bumps the version of the target of its data product,
+# one upsert per target per statement, in target order
+BUMP_CALIBRATION_VERSIONS_SQL = '''
+CREATE OR REPLACE FUNCTION bhtom2_bump_calibration_versions() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO bhtom2_targetdataversion (target_id, version, photometry_version, photometry_rewrites)
+        SELECT DISTINCT dp.target_id, 1, 0, 0 FROM new_rows JOIN bhtom_dataproducts_dataproduct dp
+            ON dp.id = new_rows.dataproduct_id ORDER BY dp.target_id
+        ON CONFLICT (target_id) DO UPDATE SET version = bhtom2_targetdataversion.version + 1;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO bhtom2_targetdataversion (target_id, version, photometry_version, photometry_rewrites)
+        SELECT DISTINCT dp.target_id, 1, 0, 0
+        FROM (SELECT dataproduct_id FROM new_rows UNION SELECT dataproduct_id FROM old_rows) changed_rows
+            JOIN bhtom_dataproducts_dataproduct dp ON dp.id = changed_rows.dataproduct_id ORDER BY dp.target_id
+        ON CONFLICT (target_id) DO UPDATE SET version = bhtom2_targetdataversion.version + 1;
+    ELSE
+        INSERT INTO bhtom2_targetdataversion (target_id, version, photometry_version, photometry_rewrites)
+        SELECT DISTINCT dp.target_id, 1, 0, 0 FROM old_rows JOIN bhtom_dataproducts_dataproduct dp
+            ON dp.id = old_rows.dataproduct_id ORDER BY dp.target_id
+        ON CONFLICT (target_id) DO UPDATE SET version = bhtom2_targetdataversion.version + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER bhtom2_calibration_insert_versions AFTER INSERT ON bhtom_calibration_calibration_data
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE PROCEDURE bhtom2_bump_calibration_versions();
+CREATE TRIGGER bhtom2_calibration_update_versions AFTER UPDATE ON bhtom_calibration_calibration_data
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE bhtom2_bump_calibration_versions();
+CREATE TRIGGER bhtom2_calibration_delete_versions AFTER DELETE ON bhtom_calibration_calibration_data
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE PROCEDURE bhtom2_bump_calibration_versions();
+'''
+
+DROP_CALIBRATION_VERSIONS_SQL = '''
+DROP TRIGGER IF EXISTS bhtom2_calibration_delete_versions ON bhtom_calibration_calibration_data;
+DROP TRIGGER IF EXISTS bhtom2_calibration_update_versions ON bhtom_calibration_calibration_data;
+DROP TRIGGER IF EXISTS bhtom2_calibration_insert_versions ON bhtom_calibration_calibration_data;
+DROP FUNCTION IF EXISTS bhtom2_bump_calibration_versions();
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bhtom_dataproducts', '__first__'),
+        ('bhtom_calibration', '0002_calibration_data_calibration_log_and_more'),
+        ('bhtom2', '0013_photometry_rewrites'),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql=BUMP_CALIBRATION_VERSIONS_SQL, reverse_sql=DROP_CALIBRATION_VERSIONS_SQL),
+    ]
@@ -0,0 +1,7 @@
+from bhtom2.models.target_sky_position import TargetSkyPosition
+from bhtom2.models.target_name_key import TargetNameKey
+from bhtom2.models.target_photometry_summary import TargetPhotometrySummary
+from bhtom2.models.reduced_datum_change import ReducedDatumChange
+from bhtom2.models.target_microlensing_screening import TargetMicrolensingScreening
+from bhtom2.models.microlensing_fit_job import MicrolensingFitJob
+from bhtom2.models.target_data_version import TargetDataVersion
@@ -0,0 +1,14 @@
+from django.db import models
+
+
+class MicrolensingFitJob(models.Model):
+    """
+    A running microlensing fit (see bhtom2.utils.microlensing_jobs). The row is created by the process which starts
+    the fit, so a fit is started once also when several processes get the same request, and deleted when the
+    fit's result is stored. key is the fit key, started the start time of the fit.
+    """
+    key = models.CharField(max_length=40, primary_key=True)
+    started = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'microlensing fit job'
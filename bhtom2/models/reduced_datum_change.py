@@ -0,0 +1,24 @@
+from django.db import models
+
+
+class ReducedDatumChange(models.Model):
+    """
+    Last update, deactivation or deletion of a ReducedDatum, for the incremental sync API (see
+    bhtom2.utils.reduced_datum_sync). The rows are written by database triggers on the ReducedDatum table
+    (migration 0011), so changes made without the ORM (upload service, CPCS) are recorded too; inserted datums
+    are not recorded, the sync finds them by id. One row per datum.
+
+    Neither id is a foreign key: the rows outlive a deleted datum, and the triggers write them while a target is
+    being deleted; the rows of a deleted target are removed by a trigger on the Target table.
+    """
+    datum_id = models.IntegerField(unique=True)
+    target_id = models.IntegerField()
+    modified = models.DateTimeField()
+    active = models.BooleanField(default=True)
+    deleted = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = 'reduced datum change'
+        indexes = [
+            models.Index(name='bhtom2_datumchange_tgt_mod', fields=['target_id', 'modified']),
+        ]
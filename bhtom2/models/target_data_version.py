@@ -0,0 +1,22 @@
+from django.db import models
+
+
+class TargetDataVersion(models.Model):
+    """
+    Versions of a target and of its data, maintained by database triggers on the Target and ReducedDatum tables
+    (migration 0012), so every writer bumps them, the ORM as well as the upload service and CPCS. They key the
+    cached values of the target (see bhtom2.utils.target_cache); a target without a row has version 0.
+
+    version is bumped by every statement which updates the target or writes its datums or the calibrations of
+    its data products (migration 0014), photometry_version by
+    every statement which inserts, updates or deletes its photometry datums, photometry_rewrites only by those
+    which update or delete them (migration 0013). target_id is not a foreign key:
+    the triggers write the row while the target is being deleted; it is removed with the target.
+    """
+    target_id = models.IntegerField(primary_key=True)
+    version = models.BigIntegerField(default=0)
+    photometry_version = models.BigIntegerField(default=0)
+    photometry_rewrites = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'target data version'
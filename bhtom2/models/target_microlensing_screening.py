@@ -0,0 +1,32 @@
+from django.db import models
+
+from bhtom_base.bhtom_targets.models import Target
+
+
+class TargetMicrolensingScreening(models.Model):
+    """
+    Result of the point-lens screening fit of the target's photometry (see bhtom2.utils.microlensing_screening),
+    for filtering and sorting the target list by how much the light curve looks like a microlensing event.
+
+    score is 1 - chi2 / chi2_flat: the fraction of the chi2 of a constant light curve explained by the point-lens
+    model (None when the target has too little photometry). t0 is a JD. photometry_count and photometry_last_id are
+    the count and the last id of the target's photometry datums when it was screened, summary_modified the
+    modification time of its photometry summary; a target is screened again when one of them differs.
+    """
+    target = models.OneToOneField(Target, on_delete=models.CASCADE, primary_key=True,
+                                  related_name='microlensing_screening')
+    score = models.FloatField(null=True, blank=True, db_index=True)
+    t0 = models.FloatField(null=True, blank=True)
+    te = models.FloatField(null=True, blank=True, db_index=True)
+    u0 = models.FloatField(null=True, blank=True)
+    chi2 = models.FloatField(null=True, blank=True)
+    chi2_flat = models.FloatField(null=True, blank=True)
+    point_count = models.IntegerField(default=0)
+    filter_count = models.IntegerField(default=0)
+    photometry_count = models.IntegerField(default=0)
+    photometry_last_id = models.IntegerField(default=0)
+    summary_modified = models.DateTimeField(null=True, blank=True)
+    screened = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'target microlensing screening'
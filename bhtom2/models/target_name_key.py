@@ -0,0 +1,25 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.db import models
+
+from bhtom_base.bhtom_targets.models import Target
+
+
+class TargetNameKey(models.Model):
+    """
+    Normalized lookup key of a target name or alias, kept in sync with Target.name and TargetName.
+
+    Each name is stored under its normalized form and, for names whose survey has several prefixes (AT/SN), also
+    under the survey and the form without the prefix (see bhtom2.utils.name_resolver). Exact lookups use the b-tree index on key,
+    substring and fuzzy lookups the trigram index.
+    """
+    target = models.ForeignKey(Target, on_delete=models.CASCADE, related_name='name_keys')
+    key = models.CharField(max_length=255, db_index=True)
+    name = models.CharField(max_length=255)
+    source_name = models.CharField(max_length=100, blank=True, default='')
+
+    class Meta:
+        verbose_name = 'target name key'
+        unique_together = ('target', 'key')
+        indexes = [
+            GinIndex(name='bhtom2_targetnamekey_trgm', fields=['key'], opclasses=['gin_trgm_ops']),
+        ]
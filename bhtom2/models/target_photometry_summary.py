@@ -0,0 +1,41 @@
+from django.db import models
+
+from bhtom_base.bhtom_targets.models import Target
+
+
+class TargetPhotometrySummary(models.Model):
+    """
+    Per-target facts about the active photometry (see bhtom2.utils.photometry_summary), so pages read one row
+    instead of scanning the datums.
+
+    photometry_version and photometry_rewrites are the TargetDataVersion counters the summary is up to date with:
+    when only the version moved, the datums above last_datum_id (the highest datum id applied) are added; when
+    datums were updated or deleted since, the summary is rebuilt. Counts are dictionaries
+    {filter, facility or unit: count}.
+    """
+    target = models.OneToOneField(Target, on_delete=models.CASCADE, primary_key=True,
+                                  related_name='photometry_summary')
+    datum_count = models.IntegerField(default=0)
+    first_mjd = models.FloatField(null=True, blank=True)
+    last_mjd = models.FloatField(null=True, blank=True)
+    last_magnitude = models.FloatField(null=True, blank=True)
+    last_magnitude_error = models.FloatField(null=True, blank=True)
+    last_magnitude_filter = models.CharField(max_length=100, null=True, blank=True)
+    last_magnitude_facility = models.CharField(max_length=100, null=True, blank=True)
+    last_magnitude_mjd = models.FloatField(null=True, blank=True)
+    last_magnitude_id = models.IntegerField(null=True, blank=True)
+    filter_counts = models.JSONField(default=dict)
+    measured_filter_counts = models.JSONField(default=dict)
+    facility_counts = models.JSONField(default=dict)
+    unit_counts = models.JSONField(default=dict)
+    has_optical = models.BooleanField(default=False, db_index=True)
+    has_radio = models.BooleanField(default=False, db_index=True)
+    has_xray = models.BooleanField(default=False, db_index=True)
+    last_datum_id = models.IntegerField(default=0)
+    photometry_version = models.BigIntegerField(default=0)
+    photometry_rewrites = models.BigIntegerField(default=-1)
+    modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'target photometry summary'
+        verbose_name_plural = 'target photometry summaries'
@@ -0,0 +1,19 @@
+from django.db import models
+
+from bhtom_base.bhtom_targets.models import Target
+
+
+class TargetSkyPosition(models.Model):
+    """
+    Unit vector of the target position on the celestial sphere, kept in sync with Target.ra/dec.
+
+    Cone searches use the indexed z (= sin(dec)) column to select a declination band and then an exact
+    dot-product test, instead of evaluating trigonometric functions for every row of the Target table.
+    """
+    target = models.OneToOneField(Target, on_delete=models.CASCADE, primary_key=True, related_name='sky_position')
+    x = models.FloatField()
+    y = models.FloatField()
+    z = models.FloatField(db_index=True)
+
+    class Meta:
+        verbose_name = 'target sky position'
@@ -1,13 +1,20 @@
 from django.contrib.auth.models import User
-from django.db.models.signals import pre_save
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.contrib.auth.signals import user_logged_in
 from django.dispatch import receiver
 from django.core.mail import send_mail
 
 from django.conf import settings
 from bhtom2.utils.bhtom_logger import BHTOMLogger
-from bhtom_base.bhtom_targets.models import Target
+from bhtom_base.bhtom_targets.models import Target, TargetName
+from bhtom_base.bhtom_dataproducts.models import ReducedDatum
 from bhtom2.bhtom_observatory.models import Camera
+from bhtom2.utils.light_curve_store import remove_light_curve
+from bhtom2.utils.name_resolver import index_target_names
+from bhtom2.utils.plot_thumbnails import schedule_thumbnail
+from bhtom2.utils.photometry_summary import schedule_photometry_summary_update
+from bhtom2.utils.sky_index import update_sky_position
+from bhtom2.utils.target_deletion import is_target_deleted, mark_target_deleted, unmark_target_deleted
 from bhtom2.prometheus_metrics import USER_LOGIN_COUNT, USER_REGISTRATION_COUNT, LAST_USER_LOGIN_TIME, CAMERA_REGISTRATION_COUNT
 
 logger: BHTOMLogger = BHTOMLogger(__name__, 'Bhtom: Signals')
@@ -18,6 +25,84 @@ def target_pre_save(sender, instance, *args, **kwargs):
     pass
 
 
+@receiver(pre_delete, sender=Target)
+def target_pre_delete(sender, instance, **kwargs):
+    # the receivers of the cascaded deletes must not write rows pointing at the deleted target
+    mark_target_deleted(instance.pk)
+
+
+@receiver(post_delete, sender=Target)
+def target_post_delete(sender, instance, **kwargs):
+    unmark_target_deleted(instance.pk)
+    remove_light_curve(instance.pk)
+
+
+@receiver(post_save, sender=Target)
+def target_sky_position_post_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    try:
+        update_sky_position(instance)
+    except Exception as e:
+        logger.error("Error while updating sky position of target " + str(instance.pk) + ": " + str(e))
+
+
+@receiver(post_save, sender=Target)
+def target_name_keys_post_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    try:
+        index_target_names(instance)
+    except Exception as e:
+        logger.error("Error while indexing names of target " + str(instance.pk) + ": " + str(e))
+
+
+@receiver(post_save, sender=Target)
+def target_thumbnail_post_save(sender, instance, raw=False, **kwargs):
+    # renders the thumbnail of a new or rewritten icon plot, an up to date one is left as is
+    if raw or not instance.photometry_icon_plot:
+        return
+    try:
+        schedule_thumbnail(instance)
+    except Exception as e:
+        logger.error("Error while scheduling thumbnail of target " + str(instance.pk) + ": " + str(e))
+
+
+def _index_names_of_target(target_id):
+    try:
+        target = Target.objects.filter(pk=target_id).first()
+        if target is not None:
+            index_target_names(target)
+    except Exception as e:
+        logger.error("Error while indexing names of target " + str(target_id) + ": " + str(e))
+
+
+@receiver(post_save, sender=TargetName)
+def target_name_post_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _index_names_of_target(instance.target_id)
+
+
+@receiver(post_delete, sender=TargetName)
+def target_name_post_delete(sender, instance, **kwargs):
+    # the name keys of a deleted target are deleted with it
+    if is_target_deleted(instance.target_id):
+        return
+    _index_names_of_target(instance.target_id)
+
+
+@receiver(post_save, sender=ReducedDatum)
+def reduced_datum_summary_post_save(sender, instance, raw=False, **kwargs):
+    # one update per target when the transaction commits; deletes have no receivers, so they stay fast deletes
+    if raw or instance.data_type != settings.DATA_PRODUCT_TYPES['photometry'][0]:
+        return
+    try:
+        schedule_photometry_summary_update(instance.target_id)
+    except Exception as e:
+        logger.error("Error while scheduling photometry summary of target " + str(instance.target_id) + ": " + str(e))
+
+
 @receiver(pre_save, sender=User)
 def send_activation_email(sender, instance, **kwargs):
     try:
@@ -3,6 +3,11 @@ from astropy.coordinates import Angle
 from astropy import units as u
 
 import numpy as np
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+
+from bhtom2.utils.photometry_summary import get_photometry_summary
+from bhtom2.utils.target_cache import render_target_table, target_details_version
 
 register = template.Library()
 
@@ -42,13 +47,42 @@ def get_item(dictionary, key):
     return dictionary.get(key)
 
 
-@register.inclusion_tag('bhtom_targets/partials/target_table.html')
+@register.simple_tag
 def target_table(targets, query_string=''):
     """
     Returns a partial for a table of targets, used in the target_list.html template
-    by default
+    by default. The table is cached per filter query, see bhtom2.utils.target_cache.
+    """
+    return render_target_table(targets, query_string)
+
+
+@register.filter
+def photometry_count(target):
+    """
+    Returns the number of active photometry points of the target from its photometry summary, selected with the
+    target in the target list. Targets without a summary yet are counted.
+    """
+    try:
+        return target.photometry_summary.datum_count
+    except ObjectDoesNotExist:
+        return target.reduceddatum_set.filter(data_type=settings.DATA_PRODUCT_TYPES['photometry'][0],
+                                              active_flg=True).count()
+
+
+@register.simple_tag
+def target_photometry_summary(target):
+    """
+    Returns the up to date photometry summary of the target, for the details page.
+    """
+    return get_photometry_summary(target.pk)
+
+
+@register.filter
+def target_cache_version(target):
+    """
+    Returns the version of the target's cached fragments, to vary the {% cache %} tags of the details page on.
     """
-    return {'object_list': targets, 'query_string': query_string}
+    return target_details_version(target.pk)
 
 @register.filter
 def substring(value, arg):
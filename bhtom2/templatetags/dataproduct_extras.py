@@ -1,10 +1,7 @@
 from urllib.parse import urlencode
 
-import plotly
-
 import plotly.graph_objs as go
 from django import template
-from django.conf import settings
 
 from django.core.paginator import Paginator
 from django.shortcuts import reverse
@@ -21,9 +18,10 @@ from bhtom_base.bhtom_targets.models import Target, TargetGaiaDr3, TargetGaiaDr2
 from django.contrib.auth.models import User
 from numpy import around
 
-import numpy as np
-
 from bhtom2.utils.photometry_and_spectroscopy_data_utils import get_photometry_stats
+from bhtom2.utils.plot_cache import get_plot
+from bhtom2.utils.plot_downsampling import MAX_POINTS_PER_TRACE
+from bhtom2.utils.plot_thumbnails import THUMBNAIL_SIZE, get_thumbnail_version
 
 register = template.Library()
 logger: BHTOMLogger = BHTOMLogger(__name__, 'Bhtom: bhtom_dataproducts: extras')
@@ -90,27 +88,20 @@ def recent_photometry(target, limit=1):
 
 @register.inclusion_tag('bhtom_dataproducts/partials/photometry_stats.html')
 def photometry_stats(target):
-    import pandas as pd
-
     """
     Displays a table of the the photometric data stats for a target.
     """
 
     stats, columns = get_photometry_stats(target)
-    sort_by = 'facility'
-    sort_by_asc = True
-    df: pd.DataFrame = pd.DataFrame(data=stats,
-                                    columns=columns).sort_values(by=sort_by, ascending=sort_by_asc)
 
-    data_list = []
-    for index, row in df.iterrows():
-        data_dict = {'Facility': row['facility'],
-                     'Observers': row['observer'],
-                     'Filters': row['filter'],
-                     'Data_points': row['Data_points'],
-                     'Min_MJD': row['Earliest_time'],
-                     'Max_MJD': row['Latest_time']}
-        data_list.append(data_dict)
+    data_list = [{'Facility': facility,
+                  'Observers': observers,
+                  'Filters': filters,
+                  'Data_points': data_points,
+                  'Min_MJD': earliest_time,
+                  'Max_MJD': latest_time}
+                 for facility, observers, filters, data_points, earliest_time, latest_time
+                 in sorted(stats, key=lambda row: row[0])]
 
     return {'data': data_list}
 
@@ -228,40 +219,45 @@ def upload_dataproduct(context, obj):
     return {'data_product_form_from_user': form}
 
 
+def add_now_line(fig, y_range):
+    """
+    Adds a vertical dashed line at the current UTC time, spanning the y range of the plot.
+    """
+    if y_range is None:
+        return
+    y_min, y_max = y_range
+    current_date = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+    line_trace = go.Scatter(
+        x=[current_date, current_date],
+        y=[y_min-2, y_max+2],  # This will make the line span the entire plot in Y
+        mode='lines',
+        name='NOW',
+        line=dict(
+            color="Grey",  # Change the color here
+            width=1,
+            dash="dash",  # This makes the line dashed.
+        ),
+        showlegend=True
+    )
+    fig.add_trace(line_trace)
+
+
 @register.inclusion_tag('bhtom_dataproducts/partials/photometry_for_target.html', takes_context=True)
 def photometry_for_target(context, target, width=1000, height=600, background=None, label_color=None, grid=True):
     fig = None
     if target.photometry_plot is not None and target.photometry_plot != '':
-        base_path = settings.DATA_PLOTS_PATH
         try:
-            fig = plotly.io.read_json(base_path + str(target.photometry_plot))
-
-            # Get the current UTC time
-            current_date = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
-
-            # Calculate the y-range from your data traces
-            y_values = [trace['y'] for trace in fig['data'] if 'y' in trace]
-            y_min = np.min([np.min(values) for values in y_values])
-            y_max = np.max([np.max(values) for values in y_values])
-
-            # Add a vertical dashed line at the current date
-            line_trace = go.Scatter(
-                x=[current_date, current_date],
-                y=[y_min-2, y_max+2],  # This will make the line span the entire plot in Y
-                mode='lines',
-                name='NOW',
-                line=dict(
-                    color="Grey",  # Change the color here
-                    width=1,
-                    dash="dash",  # This makes the line dashed.
-                ),
-                showlegend=True
-            )
-            fig.add_trace(line_trace)
+            # the default view shows the reduced traces, zooming in loads the full-resolution points of the window
+            cached = get_plot(target.photometry_plot, downsampled=True)
+            fig = go.Figure(cached.figure)
+
+            add_now_line(fig, cached.y_range)
 
             return {
                 'target': target,
-                'plot': offline.plot(fig, output_type='div', show_link=False)
+                'plot': offline.plot(fig, output_type='div', show_link=False),
+                'downsampled': cached.downsampled,
+                'max_points': MAX_POINTS_PER_TRACE,
             }
         except Exception as e:
             logger.warning("Plot(filters) does not exist" + str(e))
@@ -286,32 +282,11 @@ def photometry_for_target(context, target, width=1000, height=600, background=No
 def photometry_for_target_obs(context, target, width=1000, height=600, background=None, label_color=None, grid=True):
     fig = None
     if target.photometry_plot_obs is not None and target.photometry_plot_obs != '':
-        base_path = settings.DATA_PLOTS_PATH
         try:
-            fig = plotly.io.read_json(base_path + str(target.photometry_plot_obs))
-
-            # Get current date as a string in 'YYYY-MM-DD' format + hours+mins+seconds
-            current_date = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
-
-            # Calculate the y-range from your data traces
-            y_values = [trace['y'] for trace in fig['data'] if 'y' in trace]
-            y_min = np.min([np.min(values) for values in y_values])
-            y_max = np.max([np.max(values) for values in y_values])
-
-            # Add a vertical dashed line at the current date
-            line_trace = go.Scatter(
-                x=[current_date, current_date],
-                y=[y_min-2, y_max+2],  # This will make the line span the entire plot in Y
-                mode='lines',
-                name='NOW',
-                line=dict(
-                    color="Grey",  # Change the color here
-                    width=1,
-                    dash="dash",  # This makes the line dashed.
-                ),
-                showlegend=True
-            )
-            fig.add_trace(line_trace)
+            cached = get_plot(target.photometry_plot_obs)
+            fig = go.Figure(cached.figure)
+
+            add_now_line(fig, cached.y_range)
 
             return {
                 'target': target,
@@ -338,33 +313,12 @@ def photometry_for_target_obs(context, target, width=1000, height=600, backgroun
 @register.inclusion_tag('bhtom_dataproducts/partials/photometry_for_target_highenergy.html', takes_context=True)
 def photometry_for_target_highenergy(context, target, width=1000, height=600, background=None, label_color=None, grid=True):
     fig = None
-    if target.photometry_plot_highenergy is not None and target.photometry_plot_obs != '':
-        base_path = settings.DATA_PLOTS_PATH
+    if target.photometry_plot_highenergy is not None and target.photometry_plot_highenergy != '':
         try:
-            fig = plotly.io.read_json(base_path + str(target.photometry_plot_highenergy))
-
-            # Get current date as a string in 'YYYY-MM-DD' format + hours+mins+seconds
-            current_date = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
-
-            # Calculate the y-range from your data traces
-            y_values = [trace['y'] for trace in fig['data'] if 'y' in trace]
-            y_min = np.min([np.min(values) for values in y_values])
-            y_max = np.max([np.max(values) for values in y_values])
-
-            # Add a vertical dashed line at the current date
-            line_trace = go.Scatter(
-                x=[current_date, current_date],
-                y=[y_min-2, y_max+2],  # This will make the line span the entire plot in Y
-                mode='lines',
-                name='NOW',
-                line=dict(
-                    color="Grey",  # Change the color here
-                    width=1,
-                    dash="dash",  # This makes the line dashed.
-                ),
-                showlegend=True
-            )
-            fig.add_trace(line_trace)
+            cached = get_plot(target.photometry_plot_highenergy)
+            fig = go.Figure(cached.figure)
+
+            add_now_line(fig, cached.y_range)
 
             return {
                 'target': target,
@@ -415,9 +369,17 @@ def photometry_for_target_icon(context, target, width=800, height=400, backgroun
     """
 
     if target.photometry_icon_plot is not None and target.photometry_icon_plot != '':
-        base_path = settings.DATA_PLOTS_PATH
         try:
-            fig = plotly.io.read_json(base_path + str(target.photometry_icon_plot))
+            # the pre-rendered thumbnail when it is up to date, otherwise the live plot while it is rendered
+            version = get_thumbnail_version(target)
+            if version is not None:
+                return {
+                    'target': target,
+                    'thumbnail_url': reverse('targets:thumbnail', kwargs={'pk': target.id, 'version': version}),
+                    'width': THUMBNAIL_SIZE[0],
+                    'height': THUMBNAIL_SIZE[1],
+                }
+            fig = go.Figure(get_plot(target.photometry_icon_plot).figure)
             return {
                 'target': target,
                 'plot': offline.plot(fig, output_type='div', show_link=False)
@@ -445,9 +407,8 @@ def photometry_for_target_icon(context, target, width=800, height=400, backgroun
 def spectroscopy_for_target(context, target, dataproduct=None):
 
     if target.spectroscopy_plot is not None and target.spectroscopy_plot != '':
-        base_path = settings.DATA_PLOTS_PATH
         try:
-            fig = plotly.io.read_json(base_path + str(target.spectroscopy_plot))
+            fig = go.Figure(get_plot(target.spectroscopy_plot).figure)
             return {
                 'target': target,
                 'plot': offline.plot(fig, output_type='div', show_link=False)
@@ -0,0 +1,87 @@
+import json
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from bhtom_base.bhtom_dataproducts.models import DataProduct, ReducedDatum
+from bhtom_base.bhtom_targets.models import Target
+from bhtom2.bhtom_calibration.models import Calibration_data
+from bhtom2.bhtom_calibration.views import parse_filters
+from bhtom2.tests.helpers import LOCMEM_CACHES, TemporaryDataCacheMixin
+
+ALERT_LC_URL = '/calibration/get_alert_lc_data/'
+ALERTS_LC_URL = '/calibration/get_alerts_lc_data/'
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TestGetAlertLCData(TemporaryDataCacheMixin, TestCase):
+    def setUp(self):
+        caches['targetList'].clear()
+        self.client = APIClient()
+        self.target = Target.objects.create(name='Gaia24abc', type=Target.SIDEREAL, ra=10.0, dec=12.0)
+        self.add_datum(60000.0, 15.0, 'g(GaiaSP)')
+        self.add_datum(60001.0, 15.5, 'GaiaSP/G')
+
+    def add_datum(self, mjd, value, filter):
+        return ReducedDatum.objects.create(target=self.target, data_type='photometry', mjd=mjd, value=value,
+                                           error=0.01, filter=filter, value_unit='MAG', source_location='alerts')
+
+    def test_parse_filters(self):
+        filters, catalogs = parse_filters(['g(GaiaSP)', 'GaiaSP/G', 'g(GaiaSP)', None])
+        self.assertEqual(filters, ['g', 'GaiaSP/G', 'g', None])
+        self.assertEqual(catalogs, ['GaiaSP', None, 'GaiaSP', None])
+
+    def test_light_curve_with_etag(self):
+        response = self.client.get(ALERT_LC_URL, {'alert_name': 'Gaia24abc'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.data['mag']), [15.0, 15.5])
+        self.assertEqual(response.data['caliberr'], [None, None])
+        self.assertTrue(response['ETag'].startswith('W/"'))
+
+        etag = response['ETag']
+        response = self.client.get(ALERT_LC_URL, {'alert_name': 'Gaia24abc'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.add_datum(60002.0, 16.0, 'g(GaiaSP)')
+        response = self.client.get(ALERT_LC_URL, {'alert_name': 'Gaia24abc'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_changes_with_calibration_scatter(self):
+        data_product = DataProduct.objects.create(target=self.target, product_id='Gaia24abc_cpcs',
+                                                  data_product_type='photometry')
+        ReducedDatum.objects.create(target=self.target, data_product=data_product, data_type='photometry',
+                                    mjd=60002.0, value=16.0, error=0.01, filter='g(GaiaSP)', value_unit='MAG',
+                                    source_location='cpcs')
+        calibration = Calibration_data.objects.create(dataproduct=data_product, mjd=60002.0, scatter=0.05)
+        response = self.client.get(ALERT_LC_URL, {'alert_name': 'Gaia24abc'})
+        self.assertIn(0.05, response.data['caliberr'])
+        etag = response['ETag']
+
+        # written without the ORM signals, as CPCS does
+        Calibration_data.objects.filter(pk=calibration.pk).update(scatter=0.08)
+        response = self.client.get(ALERT_LC_URL, {'alert_name': 'Gaia24abc'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn(0.08, response.data['caliberr'])
+
+    def test_batch_light_curves(self):
+        other = Target.objects.create(name='Gaia24xyz', type=Target.SIDEREAL, ra=20.0, dec=12.0)
+        response = self.client.post(ALERTS_LC_URL, {'alert_names': ['Gaia24abc', 'Gaia99zzz'],
+                                                    'target_ids': [other.pk]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        content = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(content['not_found'], ['Gaia99zzz'])
+        light_curves = {lc['alert_name']: lc for lc in content['light_curves']}
+        self.assertEqual(light_curves['Gaia24abc']['mjd'], [60000.0, 60001.0])
+        self.assertEqual(light_curves['Gaia24abc']['filter'], ['g', 'GaiaSP/G'])
+        self.assertEqual(light_curves['Gaia24xyz']['mjd'], [])
+
+    def test_batch_light_curves_ndjson(self):
+        response = self.client.post(ALERTS_LC_URL, {'alert_names': ['Gaia24abc'], 'format': 'ndjson'},
+                                    format='json')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['catalog'], ['GaiaSP', None])
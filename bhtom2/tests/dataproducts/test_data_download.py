@@ -0,0 +1,66 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from bhtom_base.bhtom_dataproducts.models import ReducedDatum, ReducedDatumUnit
+from bhtom_base.bhtom_targets.models import Target
+from bhtom2.tests.helpers import TemporaryDataCacheMixin
+from bhtom2.utils import reduced_data_utils
+from bhtom2.utils.photometry_and_spectroscopy_data_utils import ACKNOWLEDGEMENT, get_photometry_data_stats
+from bhtom2.utils.reduced_data_utils import stream_csv, stream_high_energy_data_for_target, \
+    stream_photometry_data_for_target, streaming_file_response
+
+
+class TestDataDownload(TemporaryDataCacheMixin, TestCase):
+    def setUp(self):
+        self.target = Target.objects.create(name='download_target', type=Target.SIDEREAL, ra=10.0, dec=12.0)
+
+    def add_datum(self, mjd, value, unit=ReducedDatumUnit.MAGNITUDE, filter='GaiaSP/G', active=True):
+        return ReducedDatum.objects.create(target=self.target, data_type='photometry', mjd=mjd, value=value,
+                                           error=0.01, filter=filter, facility='Gaia', observer='Gaia',
+                                           value_unit=unit, active_flg=active)
+
+    def test_stream_csv(self):
+        content = ''.join(stream_csv([(1.5, None, 'a;b')], ['x', 'y', 'z'], header_lines=('#note',)))
+        self.assertEqual(content, '#note\nx;y;z\n1.5;;"a;b"\n')
+
+    def test_stream_csv_chunks(self):
+        with mock.patch.object(reduced_data_utils, 'STREAM_CHUNK_SIZE', 10):
+            chunks = list(stream_csv([(i, i) for i in range(10)], ['a', 'b']))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks).count('\n'), 11)
+
+    def test_photometry_sorted_by_mjd(self):
+        self.add_datum(60003.0, 17.0)
+        self.add_datum(60001.0, 15.0)
+        self.add_datum(60002.0, 16.0)
+        self.add_datum(60004.0, 1.0, unit=ReducedDatumUnit.MILLIJANSKY)
+        self.add_datum(60005.0, 18.0, active=False)
+
+        stream, filename = stream_photometry_data_for_target(self.target.pk)
+        lines = ''.join(stream).splitlines()
+        self.assertEqual(filename, 'target_download_target_photometry.csv')
+        self.assertEqual(lines[0], 'MJD;Magnitude;Error;Facility;Filter;Observer')
+        self.assertEqual([line.split(';')[0] for line in lines[1:]], ['60001.0', '60002.0', '60003.0'])
+
+    def test_high_energy_rows_merged(self):
+        self.add_datum(60001.0, 10.0, unit=ReducedDatumUnit.COUNTS, filter='XRT')
+        self.add_datum(60001.0, 2e-12, unit=ReducedDatumUnit.FLUX, filter='XRT')
+        self.add_datum(60002.0, 3e-12, unit=ReducedDatumUnit.FLUX, filter='XRT')
+
+        stream, filename = stream_high_energy_data_for_target(self.target.name)
+        lines = ''.join(stream).splitlines()
+        self.assertEqual(lines[1:], ['60001.0;10.0;0.01;2e-12;0.01;Gaia;XRT;Gaia',
+                                     '60002.0;;;3e-12;0.01;Gaia;XRT;Gaia'])
+
+    def test_stats_with_acknowledgement(self):
+        self.add_datum(60001.0, 15.0)
+        stream, filename = get_photometry_data_stats(self.target)
+        lines = ''.join(stream).splitlines()
+        self.assertEqual(tuple(lines[:len(ACKNOWLEDGEMENT)]), ACKNOWLEDGEMENT)
+        self.assertTrue(lines[len(ACKNOWLEDGEMENT)].startswith('facility;observer;filter;Data_points'))
+
+    def test_streaming_file_response(self):
+        response = streaming_file_response(iter(['a\n']), 'target "x".csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="target \\"x\\".csv"')
+        self.assertEqual(b''.join(response.streaming_content), b'a\n')
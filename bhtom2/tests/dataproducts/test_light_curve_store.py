@@ -0,0 +1,82 @@
+import os
+
+from django.db import connection
+from django.test import TestCase
+
+from bhtom_base.bhtom_dataproducts.models import ReducedDatum, ReducedDatumUnit
+from bhtom_base.bhtom_targets.models import Target
+from bhtom2.tests.helpers import TemporaryDataCacheMixin
+from bhtom2.utils.light_curve_store import get_light_curve, light_curve_dir, read_light_curve
+
+
+class TestLightCurveStore(TemporaryDataCacheMixin, TestCase):
+    def setUp(self):
+        self.target = Target.objects.create(name='light_curve_target', type=Target.SIDEREAL, ra=10.0, dec=12.0)
+        for i in range(5):
+            self.add_datum(mjd=60000.0 + 5 - i, value=15.0 + i)
+        self.add_datum(mjd=60010.0, value=1.5, unit=ReducedDatumUnit.MILLIJANSKY)
+
+    def add_datum(self, mjd, value, unit=ReducedDatumUnit.MAGNITUDE):
+        return ReducedDatum.objects.create(target=self.target, data_type='photometry', mjd=mjd, value=value,
+                                           error=0.01, filter='GaiaSP/G', facility='Gaia', observer='Gaia',
+                                           value_unit=unit)
+
+    def segment_files(self):
+        return sorted(name for name in os.listdir(light_curve_dir(self.target.pk)) if name.endswith('.arrow'))
+
+    def test_read_builds_light_curve(self):
+        table = read_light_curve(self.target.pk)
+        self.assertEqual(table.num_rows, 6)
+        self.assertEqual(table.column_names,
+                         ['id', 'mjd', 'value', 'error', 'filter', 'facility', 'observer', 'unit', 'active',
+                          'data_product_id', 'source_location'])
+        self.assertEqual(len(self.segment_files()), 1)
+
+        magnitudes = get_light_curve(self.target.pk, units=[ReducedDatumUnit.MAGNITUDE])
+        self.assertEqual(magnitudes.column('mjd').to_pylist(), [60001.0, 60002.0, 60003.0, 60004.0, 60005.0])
+        self.assertEqual(magnitudes.column('value').to_pylist(), [19.0, 18.0, 17.0, 16.0, 15.0])
+
+    def test_current_light_curve_read_with_one_query(self):
+        read_light_curve(self.target.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(read_light_curve(self.target.pk).num_rows, 6)
+
+    def test_new_datums_are_appended(self):
+        read_light_curve(self.target.pk)
+        self.add_datum(mjd=60020.0, value=14.0)
+        ReducedDatum.objects.bulk_create([
+            ReducedDatum(target=self.target, data_type='photometry', mjd=60021.0, value=13.0, error=0.01,
+                         filter='GaiaSP/G', facility='Gaia', observer='Gaia', value_unit=ReducedDatumUnit.MAGNITUDE)
+        ])
+
+        table = read_light_curve(self.target.pk)
+        self.assertEqual(table.num_rows, 8)
+        self.assertEqual(len(self.segment_files()), 2)
+        self.assertEqual(table.column('id').to_pylist(), sorted(table.column('id').to_pylist()))
+
+    def test_deactivated_datum_rebuilds_light_curve(self):
+        read_light_curve(self.target.pk)
+        self.add_datum(mjd=60020.0, value=14.0)
+        read_light_curve(self.target.pk)
+
+        # written without signals, as by the upload service
+        datum = ReducedDatum.objects.filter(target=self.target).order_by('mjd').first()
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE bhtom_dataproducts_reduceddatum SET active_flg = FALSE WHERE id = %s', [datum.pk])
+
+        table = get_light_curve(self.target.pk, units=[ReducedDatumUnit.MAGNITUDE])
+        self.assertEqual(table.num_rows, 5)
+        self.assertNotIn(datum.mjd, table.column('mjd').to_pylist())
+        self.assertEqual(read_light_curve(self.target.pk).num_rows, 7)
+        self.assertEqual(len(self.segment_files()), 1)
+
+    def test_deleted_datum(self):
+        read_light_curve(self.target.pk)
+        ReducedDatum.objects.filter(target=self.target, value_unit=ReducedDatumUnit.MILLIJANSKY).delete()
+        self.assertEqual(read_light_curve(self.target.pk).num_rows, 5)
+
+    def test_deleted_target_removes_light_curve(self):
+        read_light_curve(self.target.pk)
+        directory = light_curve_dir(self.target.pk)
+        self.target.delete()
+        self.assertFalse(os.path.exists(directory))
@@ -0,0 +1,50 @@
+import numpy as np
+from django.test import TestCase
+
+from bhtom_base.bhtom_dataproducts.models import ReducedDatum, ReducedDatumUnit
+from bhtom_base.bhtom_targets.models import Target
+from bhtom2.tests.helpers import TemporaryDataCacheMixin
+from bhtom2.utils.microlensing_data import MJD_TO_JD, largest_median_error, load_microlensing_photometry, \
+    magnitude_range, split_photometry
+
+
+class TestMicrolensingData(TemporaryDataCacheMixin, TestCase):
+    def setUp(self):
+        self.target = Target.objects.create(name='microlensing_target', type=Target.SIDEREAL, ra=10.0, dec=12.0)
+        for i, error in enumerate([0.01, 0.03, 0.02]):
+            self.add_datum(60003.0 - i, 15.0 + i, error, 'G(GAIA)')
+        for i, error in enumerate([0.1, 0.2]):
+            self.add_datum(60000.0 + i, 16.0 - i, error, 'r(ZTF)')
+        self.add_datum(60010.0, 14.0, 0.0, 'G(GAIA)')
+        self.add_datum(60011.0, 14.0, 0.01, 'G(GAIA)', active=False)
+
+    def add_datum(self, mjd, value, error, filter, active=True):
+        return ReducedDatum.objects.create(target=self.target, data_type='photometry', mjd=mjd, value=value,
+                                           error=error, filter=filter, facility='Gaia', observer='Gaia',
+                                           value_unit=ReducedDatumUnit.MAGNITUDE, active_flg=active)
+
+    def test_per_filter_arrays(self):
+        load_microlensing_photometry(self.target.pk)
+        # read from the light-curve store, which is current
+        with self.assertNumQueries(1):
+            photometry = load_microlensing_photometry(self.target.pk)
+        self.assertEqual(set(photometry), {'G(GAIA)', 'r(ZTF)'})
+        gaia = photometry['G(GAIA)']
+        np.testing.assert_allclose(gaia.time, np.array([60001.0, 60002.0, 60003.0]) + MJD_TO_JD)
+        np.testing.assert_allclose(gaia.mag, [17.0, 16.0, 15.0])
+        np.testing.assert_allclose(gaia.error, [0.02, 0.03, 0.01])
+        self.assertAlmostEqual(gaia.median_error, 0.02)
+
+    def test_split_and_ranges(self):
+        photometry = load_microlensing_photometry(self.target.pk)
+        times, mags, errors = split_photometry(photometry, ['G(GAIA)', 'I(OGLE)'])
+        self.assertEqual(len(times['G(GAIA)']), 3)
+        self.assertEqual(len(times['I(OGLE)']), 0)
+        self.assertAlmostEqual(largest_median_error(photometry, ['G(GAIA)', 'r(ZTF)']), 0.15)
+        self.assertAlmostEqual(largest_median_error(photometry, []), 0.)
+        non_times, non_mags, non_errors = split_photometry(photometry, ['r(ZTF)'])
+        self.assertEqual(magnitude_range(mags, non_mags), (15.0, 17.0))
+
+    def test_no_photometry(self):
+        self.assertEqual(load_microlensing_photometry(Target.objects.create(name='empty', type=Target.SIDEREAL,
+                                                                            ra=1.0, dec=1.0).pk), {})
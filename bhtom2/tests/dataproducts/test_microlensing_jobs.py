@@ -0,0 +1,99 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from bhtom_base.bhtom_dataproducts.models import ReducedDatum, ReducedDatumUnit
+from bhtom_base.bhtom_targets.models import Target
+from bhtom2.models import MicrolensingFitJob
+from bhtom2.tests.helpers import LOCMEM_CACHES
+from bhtom2.utils import microlensing_jobs
+from bhtom2.utils.microlensing_jobs import fit_context, fit_key, get_fit_state, get_or_start_fit
+
+
+class ImmediateExecutor:
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TestMicrolensingJobs(TestCase):
+    def setUp(self):
+        for name in LOCMEM_CACHES:
+            caches[name].clear()
+        self.target = Target.objects.create(name='fit_target', type=Target.SIDEREAL, ra=10.0, dec=12.0)
+        self.add_datum(60000.0)
+        self.fit_args = {'sel': {'G(GAIA)': True, 'r(ZTF)': False}, 'init_t0': '', 'init_te': '', 'init_u0': '',
+                         'logu0': '', 'fixblending': 'on', 'auto_init': '', 'filter_counts': {'G(GAIA)': 1}}
+        self.fit = mock.Mock(return_value={'target': self.target, 'fit_msg': 't0=2460000.5', 'image': 'png'})
+        patch_functions = mock.patch.dict(microlensing_jobs.FIT_FUNCTIONS, {'point_lens': self.fit})
+        patch_functions.start()
+        self.addCleanup(patch_functions.stop)
+
+    def add_datum(self, mjd):
+        return ReducedDatum.objects.create(target=self.target, data_type='photometry', mjd=mjd, value=15.0,
+                                           error=0.01, filter='G(GAIA)', facility='Gaia', observer='Gaia',
+                                           value_unit=ReducedDatumUnit.MAGNITUDE)
+
+    def test_key_changes_with_parameters_and_photometry(self):
+        key = fit_key(self.target.pk, 'point_lens', self.fit_args)
+        self.assertEqual(key, fit_key(self.target.pk, 'point_lens', dict(self.fit_args, filter_counts={})))
+        self.assertNotEqual(key, fit_key(self.target.pk, 'parallax', self.fit_args))
+        self.assertNotEqual(key, fit_key(self.target.pk, 'point_lens', dict(self.fit_args, init_te='30')))
+        self.assertNotEqual(key, fit_key(self.target.pk, 'point_lens',
+                                         dict(self.fit_args, sel={'G(GAIA)': True, 'r(ZTF)': True})))
+        self.add_datum(60001.0)
+        self.assertNotEqual(key, fit_key(self.target.pk, 'point_lens', self.fit_args))
+
+    def test_pending_fit_not_started_twice(self):
+        with mock.patch.object(microlensing_jobs, '_executor') as executor:
+            key, state = get_or_start_fit(self.target, 'point_lens', self.fit_args)
+            self.assertEqual(state['status'], 'running')
+            self.assertEqual(get_or_start_fit(self.target, 'point_lens', self.fit_args), (key, state))
+        self.assertEqual(executor.submit.call_count, 1)
+
+        context = fit_context(self.target, self.fit_args, key, state, '/status')
+        self.assertTrue(context['fit_pending'])
+        self.assertEqual(context['selected_filters'], ['G(GAIA)'])
+
+    def test_fit_running_in_other_process_not_started(self):
+        key = fit_key(self.target.pk, 'point_lens', self.fit_args)
+        MicrolensingFitJob.objects.create(key=key, started=timezone.now())
+        with mock.patch.object(microlensing_jobs, '_executor') as executor:
+            self.assertEqual(get_or_start_fit(self.target, 'point_lens', self.fit_args), (key, {'status': 'running'}))
+        executor.submit.assert_not_called()
+
+    def test_stale_fit_started_again(self):
+        key = fit_key(self.target.pk, 'point_lens', self.fit_args)
+        MicrolensingFitJob.objects.create(key=key, started=timezone.now() - timedelta(hours=1))
+        with mock.patch.object(microlensing_jobs, '_executor', ImmediateExecutor()):
+            key, state = get_or_start_fit(self.target, 'point_lens', self.fit_args)
+        self.assertEqual(state['status'], 'done')
+        self.assertFalse(MicrolensingFitJob.objects.exists())
+
+    def test_identical_request_served_from_cache(self):
+        with mock.patch.object(microlensing_jobs, '_executor', ImmediateExecutor()):
+            key, state = get_or_start_fit(self.target, 'point_lens', self.fit_args)
+            self.assertEqual(state['status'], 'done')
+            self.assertEqual(get_or_start_fit(self.target, 'point_lens', self.fit_args), (key, state))
+        self.assertEqual(self.fit.call_count, 1)
+        self.assertNotIn('target', get_fit_state(key)['result'])
+
+        context = fit_context(self.target, self.fit_args, key, state)
+        self.assertEqual(context['fit_msg'], 't0=2460000.5')
+        self.assertEqual(context['target'], self.target)
+        self.assertNotIn('fit_pending', context)
+
+    def test_status_view(self):
+        self.client.force_login(User.objects.create_superuser(username='fit_user', password='fit_password',
+                                                              email='fit@example.com'))
+        with mock.patch.object(microlensing_jobs, '_executor', ImmediateExecutor()):
+            key, _ = get_or_start_fit(self.target, 'point_lens', self.fit_args)
+        response = self.client.get(f'/targets/{self.target.pk}/microlensing/status/{key}')
+        self.assertEqual(response.json(), {'status': 'done'})
+        response = self.client.get(f'/targets/{self.target.pk}/microlensing/status/{"0" * 40}')
+        self.assertEqual(response.json(), {'status': None})
+
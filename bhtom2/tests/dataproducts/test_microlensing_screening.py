@@ -0,0 +1,106 @@
+import numpy as np
+from django.test import TestCase
+
+from bhtom_base.bhtom_dataproducts.models import ReducedDatum, ReducedDatumUnit
+from bhtom_base.bhtom_targets.models import Target
+from bhtom2.bhtom_targets.filters import TargetFilter
+from bhtom2.models import TargetMicrolensingScreening
+from bhtom2.tests.helpers import TemporaryDataCacheMixin
+from bhtom2.utils.microlensing_chi2 import point_lens_magnification
+from bhtom2.utils.microlensing_data import MJD_TO_JD
+from bhtom2.utils.microlensing_screening import run_screening, screen_target, targets_to_screen
+from bhtom2.utils.photometry_summary import rebuild_photometry_summary
+
+
+class TestMicrolensingScreening(TemporaryDataCacheMixin, TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        mjd = np.sort(rng.uniform(58000., 60500., 120))
+        magnification = point_lens_magnification(mjd + MJD_TO_JD, 59300. + MJD_TO_JD, 0.15, 30.)
+        self.event = self.create_target('screening_event', mjd,
+                                        17. - 2.5 * np.log10(0.6 * magnification + 0.4) + rng.normal(0, 0.02, 120))
+        self.flat = self.create_target('screening_flat', mjd, 17. + rng.normal(0, 0.02, 120))
+
+    def create_target(self, name, mjd, mags, summary=True):
+        target = Target.objects.create(name=name, type=Target.SIDEREAL, ra=10.0, dec=12.0)
+        self.create_photometry(target, mjd, mags)
+        if summary:
+            rebuild_photometry_summary(target.pk)
+        return target
+
+    def create_photometry(self, target, mjd, mags):
+        ReducedDatum.objects.bulk_create([
+            ReducedDatum(target=target, data_type='photometry', mjd=float(t), value=float(mag), error=0.02,
+                         filter='G(GAIA)', facility='Gaia', observer='Gaia', value_unit=ReducedDatumUnit.MAGNITUDE)
+            for t, mag in zip(mjd, mags)])
+
+    def test_event_scored_and_sorted_first(self):
+        self.assertEqual(targets_to_screen(), [self.event.pk, self.flat.pk])
+        self.assertEqual(run_screening(targets_to_screen()), (2, 0))
+
+        event = TargetMicrolensingScreening.objects.get(target=self.event)
+        self.assertGreater(event.score, 0.8)
+        self.assertAlmostEqual(event.t0, 59300. + MJD_TO_JD, delta=1.)
+        self.assertAlmostEqual(event.te, 30., delta=3.)
+        self.assertEqual(event.point_count, 120)
+        self.assertLess(TargetMicrolensingScreening.objects.get(target=self.flat).score, 0.2)
+
+        ordered = TargetFilter({'order': '-microlensing_score'}, queryset=Target.objects.all()).qs
+        self.assertEqual(list(ordered.values_list('pk', flat=True)), [self.event.pk, self.flat.pk])
+        selected = TargetFilter({'microlensing_score_min': 0.5}, queryset=Target.objects.all()).qs
+        self.assertEqual(list(selected.values_list('pk', flat=True)), [self.event.pk])
+
+    def test_rerun_only_changed_targets(self):
+        run_screening(targets_to_screen())
+        self.assertEqual(targets_to_screen(), [])
+        self.assertEqual(len(targets_to_screen(rebuild=True)), 2)
+
+        ReducedDatum.objects.create(target=self.flat, data_type='photometry', mjd=60600., value=17.0, error=0.02,
+                                    filter='G(GAIA)', facility='Gaia', observer='Gaia',
+                                    value_unit=ReducedDatumUnit.MAGNITUDE)
+        rebuild_photometry_summary(self.flat.pk)
+        self.assertEqual(targets_to_screen(), [self.flat.pk])
+        run_screening(targets_to_screen())
+        self.assertEqual(TargetMicrolensingScreening.objects.get(target=self.flat).point_count, 121)
+
+    def test_rerun_targets_changed_without_signals(self):
+        run_screening(targets_to_screen())
+        # written without signals, as by the upload service: the summaries are not updated
+        self.create_photometry(self.flat, [60600.], [17.0])
+        unsummarized = self.create_target('screening_unsummarized', np.arange(58000., 58030.), np.full(30, 16.),
+                                          summary=False)
+        self.assertEqual(targets_to_screen(), [self.flat.pk, unsummarized.pk])
+        self.assertEqual(run_screening(targets_to_screen()), (2, 0))
+        self.assertEqual(TargetMicrolensingScreening.objects.get(target=self.flat).point_count, 121)
+        self.assertEqual(targets_to_screen(), [])
+
+    def test_only_optical_magnitudes_screened(self):
+        mixed = self.create_target('screening_mixed', np.arange(58000., 58030.), np.full(30, 16.))
+        ReducedDatum.objects.bulk_create(
+            [ReducedDatum(target=mixed, data_type='photometry', mjd=58000. + day, value=flux, error=0.5,
+                          filter='VLA', facility='VLA', observer='VLA', value_unit=ReducedDatumUnit.MILLIJANSKY)
+             for day, flux in enumerate(np.linspace(1., 40., 10))] +
+            [ReducedDatum(target=mixed, data_type='photometry', mjd=58000. + day, value=1e-9, error=1e-10,
+                          filter='LAT(Fermi)', facility='Fermi', observer='Fermi',
+                          value_unit=ReducedDatumUnit.MAGNITUDE)
+             for day in range(10)])
+        screening = screen_target(mixed.pk)
+        self.assertEqual(screening.point_count, 30)
+        self.assertEqual(screening.filter_count, 1)
+
+    def test_unscored_target_sorted_last(self):
+        short = self.create_target('screening_short', np.arange(58000., 58010.), np.full(10, 16.))
+        run_screening(targets_to_screen())
+        self.assertIsNone(TargetMicrolensingScreening.objects.get(target=short).score)
+
+        for order, expected in (('-microlensing_score', [self.event.pk, self.flat.pk, short.pk]),
+                                ('microlensing_score', [self.flat.pk, self.event.pk, short.pk])):
+            ordered = TargetFilter({'order': order}, queryset=Target.objects.all()).qs
+            self.assertEqual(list(ordered.values_list('pk', flat=True)), expected)
+
+    def test_deleted_target_skipped(self):
+        target_id = self.flat.pk
+        self.flat.delete()
+        self.assertIsNone(screen_target(target_id))
+        self.assertEqual(run_screening([target_id]), (0, 0))
+        self.assertFalse(TargetMicrolensingScreening.objects.filter(target_id=target_id).exists())
@@ -0,0 +1,58 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from bhtom_base.bhtom_dataproducts.models import ReducedDatum, ReducedDatumUnit
+from bhtom_base.bhtom_targets.models import Target
+from bhtom2.tests.helpers import LOCMEM_CACHES, TemporaryDataCacheMixin
+from bhtom2.utils import photometry_and_spectroscopy_data_utils
+from bhtom2.utils.photometry_and_spectroscopy_data_utils import get_photometry_stats
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TestPhotometryStats(TemporaryDataCacheMixin, TestCase):
+    def setUp(self):
+        for name in LOCMEM_CACHES:
+            caches[name].clear()
+        self.target = Target.objects.create(name='stats_target', type=Target.SIDEREAL, ra=10.0, dec=12.0)
+        self.add_datum(60000.123, 'Gaia, Gaia Alerts', 'G', 'Gaia')
+        self.add_datum(60002.555, 'Gaia', 'G', 'Gaia')
+        self.add_datum(60001.0, 'ZTF', 'g', 'ZTF')
+        self.add_datum(60003.0, 'ZTF', 'r', 'ZTF')
+        self.add_datum(60004.0, None, 'V', 'Observer')
+        self.add_datum(60005.0, 'ZTF', 'i', 'ZTF', active=False)
+
+    def add_datum(self, mjd, facility, filter, observer, active=True):
+        return ReducedDatum.objects.create(target=self.target, data_type='photometry', mjd=mjd, value=15.0,
+                                           error=0.01, filter=filter, facility=facility, observer=observer,
+                                           value_unit=ReducedDatumUnit.MAGNITUDE, active_flg=active)
+
+    def compute(self):
+        with mock.patch.object(photometry_and_spectroscopy_data_utils, 'compute_photometry_stats',
+                               wraps=photometry_and_spectroscopy_data_utils.compute_photometry_stats) as compute:
+            stats, columns = get_photometry_stats(self.target)
+        return {row[0]: row for row in stats}, compute.call_count
+
+    def test_stats_per_facility(self):
+        stats, calls = self.compute()
+        self.assertEqual(set(stats), {'Gaia', 'ZTF', 'Observer'})
+        self.assertEqual(stats['Gaia'], ['Gaia', 'Gaia', 'G', 2, 60000.12, 60002.56])
+        self.assertEqual(stats['ZTF'], ['ZTF', 'ZTF', 'g, r', 2, 60001.0, 60003.0])
+        self.assertEqual(stats['Observer'][3], 1)
+
+    def test_stats_cached_until_photometry_changes(self):
+        self.compute()
+        stats, calls = self.compute()
+        self.assertEqual(calls, 0)
+
+        self.add_datum(60010.0, 'ZTF', 'r', 'ZTF')
+        stats, calls = self.compute()
+        self.assertEqual(calls, 1)
+        self.assertEqual(stats['ZTF'][3], 3)
+        self.assertEqual(stats['ZTF'][5], 60010.0)
+
+    def test_no_photometry(self):
+        ReducedDatum.objects.filter(target=self.target).delete()
+        stats, calls = self.compute()
+        self.assertEqual(stats, {})
@@ -0,0 +1,131 @@
+from unittest import mock
+
+from django.db import connection, transaction
+from django.db.models.deletion import Collector
+from django.test import TestCase, TransactionTestCase
+
+from bhtom_base.bhtom_dataproducts.models import ReducedDatum, ReducedDatumUnit
+from bhtom_base.bhtom_targets.models import Target
+from bhtom2.models import TargetPhotometrySummary
+from bhtom2.templatetags.bhtom_targets_extras import photometry_count
+from bhtom2.utils import photometry_summary
+from bhtom2.utils.photometry_summary import check_photometry_summary, get_photometry_summary, \
+    refresh_photometry_summaries
+
+
+class TestPhotometrySummary(TestCase):
+    def setUp(self):
+        self.target = Target.objects.create(name='summary_target', type=Target.SIDEREAL, ra=10.0, dec=12.0)
+        self.first = self.add_datum(60000.0, 15.0, 'GaiaSP/G')
+        self.middle = self.add_datum(60001.0, 16.0, 'ZTF(zg)')
+        self.last = self.add_datum(60002.0, 17.0, 'GaiaSP/G')
+
+    def add_datum(self, mjd, value, filter, unit=ReducedDatumUnit.MAGNITUDE, error=0.01):
+        # the summary is updated when the transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            return ReducedDatum.objects.create(target=self.target, data_type='photometry', mjd=mjd, value=value,
+                                               error=error, filter=filter, facility='Gaia', observer='Gaia',
+                                               value_unit=unit)
+
+    def summary(self):
+        return TargetPhotometrySummary.objects.get(target=self.target)
+
+    def test_inserts_are_added(self):
+        summary = self.summary()
+        self.assertEqual(summary.datum_count, 3)
+        self.assertEqual((summary.first_mjd, summary.last_mjd), (60000.0, 60002.0))
+        self.assertEqual(summary.filter_counts, {'GaiaSP/G': 2, 'ZTF(zg)': 1})
+        self.assertEqual(summary.last_magnitude, 17.0)
+        self.assertTrue(summary.has_optical)
+        self.assertFalse(summary.has_radio)
+
+        self.add_datum(60003.0, 1.5, 'VLA', unit=ReducedDatumUnit.MILLIJANSKY, error=None)
+        summary = self.summary()
+        self.assertEqual(summary.datum_count, 4)
+        self.assertTrue(summary.has_radio)
+        self.assertEqual(summary.measured_filter_counts, {'GaiaSP/G': 2, 'ZTF(zg)': 1})
+        self.assertEqual(summary.last_magnitude, 17.0)
+        self.assertEqual(check_photometry_summary(self.target.pk), [])
+
+    def test_deactivation_is_subtracted(self):
+        self.middle.active_flg = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.middle.save()
+        summary = self.summary()
+        self.assertEqual(summary.datum_count, 2)
+        self.assertEqual(summary.filter_counts, {'GaiaSP/G': 2})
+        self.assertEqual(check_photometry_summary(self.target.pk), [])
+
+    def test_removing_last_point_rebuilds(self):
+        self.last.delete()
+        summary = get_photometry_summary(self.target.pk)
+        self.assertEqual(summary.last_mjd, 60001.0)
+        self.assertEqual(summary.last_magnitude, 16.0)
+        self.assertEqual(check_photometry_summary(self.target.pk), [])
+
+    def test_bulk_created_datums_are_picked_up(self):
+        ReducedDatum.objects.bulk_create([
+            ReducedDatum(target=self.target, data_type='photometry', mjd=60010.0, value=18.0, error=0.02,
+                         filter='ZTF(zg)', facility='ZTF', observer='ZTF', value_unit=ReducedDatumUnit.MAGNITUDE)
+        ])
+        fields = check_photometry_summary(self.target.pk)
+        self.assertIn('datum_count', fields)
+        self.assertIn('last_magnitude', fields)
+        summary = get_photometry_summary(self.target.pk)
+        self.assertEqual(summary.datum_count, 4)
+        self.assertEqual(summary.last_magnitude, 18.0)
+        self.assertEqual(check_photometry_summary(self.target.pk), [])
+
+    def test_saves_in_one_transaction_update_once(self):
+        with mock.patch.object(photometry_summary, 'update_photometry_summary',
+                               wraps=photometry_summary.update_photometry_summary) as update:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with transaction.atomic():
+                    for mjd in (60003.0, 60004.0, 60005.0):
+                        ReducedDatum.objects.create(target=self.target, data_type='photometry', mjd=mjd,
+                                                    value=18.0, error=0.01, filter='GaiaSP/G', facility='Gaia',
+                                                    observer='Gaia', value_unit=ReducedDatumUnit.MAGNITUDE)
+                    self.middle.active_flg = False
+                    self.middle.save()
+        self.assertEqual(len(callbacks), 1)
+        update.assert_called_once_with(self.target.pk)
+        summary = self.summary()
+        self.assertEqual(summary.datum_count, 5)
+        self.assertEqual(summary.last_magnitude_mjd, 60005.0)
+        self.assertEqual(check_photometry_summary(self.target.pk), [])
+
+    def test_queryset_delete_is_fast_and_picked_up(self):
+        datums = ReducedDatum.objects.filter(target=self.target, filter='GaiaSP/G')
+        self.assertTrue(Collector(using='default').can_fast_delete(datums))
+        datums.delete()
+        self.assertEqual(self.summary().datum_count, 3)
+        summaries = refresh_photometry_summaries([self.target.pk])
+        self.assertEqual(summaries[self.target.pk].datum_count, 1)
+        self.assertEqual(summaries[self.target.pk].first_mjd, 60001.0)
+        self.assertEqual(check_photometry_summary(self.target.pk), [])
+        self.assertEqual(refresh_photometry_summaries([self.target.pk]), {})
+
+    def test_datums_updated_without_orm_are_picked_up(self):
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE bhtom_dataproducts_reduceddatum SET value = 19.0 WHERE id = %s', [self.last.pk])
+        self.assertEqual(self.summary().last_magnitude, 17.0)
+        self.assertEqual(get_photometry_summary(self.target.pk).last_magnitude, 19.0)
+        self.assertEqual(check_photometry_summary(self.target.pk), [])
+
+    def test_list_count_read_from_summary(self):
+        target = Target.objects.select_related('photometry_summary').get(pk=self.target.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(photometry_count(target), 3)
+
+
+class TestPhotometrySummaryOfDeletedTarget(TransactionTestCase):
+    def test_delete_target_with_photometry(self):
+        target = Target.objects.create(name='deleted_summary_target', type=Target.SIDEREAL, ra=10.0, dec=12.0)
+        for mjd in (60000.0, 60001.0):
+            ReducedDatum.objects.create(target=target, data_type='photometry', mjd=mjd, value=15.0, error=0.01,
+                                        filter='GaiaSP/G', facility='Gaia', observer='Gaia',
+                                        value_unit=ReducedDatumUnit.MAGNITUDE)
+
+        target.delete()
+        self.assertFalse(Target.objects.filter(name='deleted_summary_target').exists())
+        self.assertFalse(TargetPhotometrySummary.objects.exists())
@@ -0,0 +1,128 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from bhtom_base.bhtom_dataproducts.models import ReducedDatum, ReducedDatumUnit
+from bhtom_base.bhtom_targets.models import Target
+from bhtom2.models import ReducedDatumChange
+from bhtom2.utils.reduced_datum_sync import changes_since
+
+SYNC_URL = '/common/api/reducedDatumChanges/'
+
+
+class TestReducedDatumSync(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='sync_user')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.target = Target.objects.create(name='sync_target', type=Target.SIDEREAL, ra=10.0, dec=12.0)
+        self.datums = [self.add_datum(60000.0 + i) for i in range(3)]
+
+    def add_datum(self, mjd):
+        return ReducedDatum.objects.create(target=self.target, data_type='photometry', mjd=mjd, value=15.0,
+                                           error=0.01, filter='GaiaSP/G', facility='Gaia', observer='Gaia',
+                                           value_unit=ReducedDatumUnit.MAGNITUDE)
+
+    def sync(self, watermark=None):
+        response = self.client.post(SYNC_URL, {'target_names': ['sync_target'], 'watermark': watermark or {}},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_full_sync(self):
+        data = self.sync()
+        self.assertEqual([row['id'] for row in data['inserted']], [datum.id for datum in self.datums])
+        self.assertEqual(data['watermark']['last_id'], self.datums[-1].id)
+        self.assertFalse(data['has_more'])
+
+    def test_changes_since_watermark(self):
+        watermark = self.sync()['watermark']
+        new_datum = self.add_datum(60010.0)
+        self.datums[0].value = 14.0
+        self.datums[0].save()
+        self.datums[1].active_flg = False
+        self.datums[1].save()
+        deleted_id = self.datums[2].id
+        self.datums[2].delete()
+
+        data = self.sync({'last_id': watermark['last_id'], 'modified': watermark['modified'].isoformat()})
+        self.assertEqual([row['id'] for row in data['inserted']], [new_datum.id])
+        self.assertEqual([row['id'] for row in data['updated']], [self.datums[0].id])
+        self.assertEqual(data['updated'][0]['value'], 14.0)
+        self.assertEqual(data['deactivated'], [self.datums[1].id])
+        self.assertEqual(data['deleted'], [deleted_id])
+        self.assertEqual(data['watermark']['last_id'], new_datum.id)
+
+    def test_bulk_created_datums_found_by_id(self):
+        watermark = self.sync()['watermark']
+        ReducedDatum.objects.bulk_create([
+            ReducedDatum(target=self.target, data_type='photometry', mjd=60020.0, value=16.0, error=0.01,
+                         filter='GaiaSP/G', value_unit=ReducedDatumUnit.MAGNITUDE)
+        ])
+        data = self.sync({'last_id': watermark['last_id']})
+        self.assertEqual(len(data['inserted']), 1)
+        self.assertEqual(data['inserted'][0]['mjd'], 60020.0)
+
+    def test_inserts_are_not_recorded(self):
+        self.assertFalse(ReducedDatumChange.objects.exists())
+
+    def test_changes_without_orm_recorded(self):
+        watermark = self.sync()['watermark']
+        # as the upload service and CPCS write: no model signals
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE bhtom_dataproducts_reduceddatum SET value = 13.0 WHERE id = %s',
+                           [self.datums[0].id])
+            cursor.execute('UPDATE bhtom_dataproducts_reduceddatum SET active_flg = false WHERE id = %s',
+                           [self.datums[1].id])
+        ReducedDatum.objects.filter(id=self.datums[2].id).delete()
+
+        data = self.sync({'last_id': watermark['last_id'], 'modified': watermark['modified'].isoformat()})
+        self.assertEqual(data['inserted'], [])
+        self.assertEqual([(row['id'], row['value']) for row in data['updated']], [(self.datums[0].id, 13.0)])
+        self.assertEqual(data['deactivated'], [self.datums[1].id])
+        self.assertEqual(data['deleted'], [self.datums[2].id])
+
+    def test_watermark_needs_last_id(self):
+        response = self.client.post(SYNC_URL, {'target_names': ['sync_target'],
+                                               'watermark': {'modified': timezone.now().isoformat()}},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_pages_through_changes_with_the_same_time(self):
+        datums = self.datums + [self.add_datum(60003.0 + i) for i in range(4)]
+        watermark = self.sync()['watermark']
+        for datum in datums:
+            datum.value = 14.0
+            datum.save()
+        ReducedDatumChange.objects.filter(datum_id__in=[datum.id for datum in datums]).update(modified=timezone.now())
+
+        updated = []
+        for _ in range(len(datums)):
+            cursor = watermark.get('cursor')
+            result = changes_since([self.target.pk], last_id=watermark['last_id'], modified=watermark['modified'],
+                                   cursor=cursor and (cursor['modified'], cursor['datum_id']), limit=2)
+            updated += [datum.id for datum in result['updated']]
+            watermark = result['watermark']
+            if not result['has_more']:
+                break
+        self.assertFalse(result['has_more'])
+        self.assertEqual(sorted(updated), sorted(datum.id for datum in datums))
+
+    def test_unknown_target(self):
+        response = self.client.post(SYNC_URL, {'target_names': ['no_such_target']}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class TestReducedDatumSyncOfDeletedTarget(TransactionTestCase):
+    def test_delete_target_with_photometry(self):
+        target = Target.objects.create(name='deleted_sync_target', type=Target.SIDEREAL, ra=10.0, dec=12.0)
+        for mjd in (60000.0, 60001.0):
+            ReducedDatum.objects.create(target=target, data_type='photometry', mjd=mjd, value=15.0, error=0.01,
+                                        filter='GaiaSP/G', facility='Gaia', observer='Gaia',
+                                        value_unit=ReducedDatumUnit.MAGNITUDE)
+
+        target.delete()
+        self.assertFalse(Target.objects.filter(name='deleted_sync_target').exists())
+        self.assertFalse(ReducedDatumChange.objects.exists())
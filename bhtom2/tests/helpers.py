@@ -0,0 +1,26 @@
+import tempfile
+
+from django.test import override_settings
+
+# in-memory caches for @override_settings(CACHES=...), so the tests do not read or clear the file caches
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+    'targetList': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'targetList'},
+    'targetDetails': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'targetDetails'},
+}
+
+
+class TemporaryDataCacheMixin:
+    """
+    Points DATA_CACHE_PATH (the light-curve store) at a temporary directory for the tests of the class,
+    so no files of earlier runs are read for reused target ids.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        data_cache_dir = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(data_cache_dir.cleanup)
+        data_cache_settings = override_settings(DATA_CACHE_PATH=data_cache_dir.name)
+        data_cache_settings.enable()
+        cls.addClassCleanup(data_cache_settings.disable)
+        super().setUpClass()
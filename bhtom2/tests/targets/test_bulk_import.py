@@ -0,0 +1,93 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from bhtom_base.bhtom_targets.models import Target, TargetExtra, TargetList, TargetName
+from bhtom2.bhtom_targets.utils import bulk_import_targets, import_targets
+from bhtom2.models import TargetSkyPosition
+from bhtom2.utils.harvester_client import StubHarvesterClient
+
+
+class TestBulkTargetImport(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='testuser')
+
+    def test_bulk_import_csv(self):
+        csv = [
+            'name,ra,dec,description,gaia_name,redshift',
+            'm13,250.421,36.459,globular cluster in Hercules,gaia1,5',
+            'm27,299.901,22.721,planetary nebula in Vulpecula,,5'
+        ]
+        result = bulk_import_targets(csv, 'bulk group', self.user)
+        self.assertEqual(result['errors'], [])
+        self.assertEqual(len(result['targets']), 2)
+
+        m13 = Target.objects.get(name='m13')
+        self.assertEqual(m13.type, Target.SIDEREAL)
+        self.assertTrue(TargetName.objects.filter(target=m13, source_name='GAIA', name='gaia1').exists())
+        self.assertEqual(TargetExtra.objects.get(target=m13, key='redshift').float_value, 5.0)
+        self.assertTrue(TargetSkyPosition.objects.filter(target=m13).exists())
+        self.assertEqual(TargetList.objects.get(name='bulk group').targets.count(), 2)
+
+    def test_bulk_import_extras_typed_like_saved_extras(self):
+        csv = [
+            'name,ra,dec,discovery,redshift,note',
+            'm13,250.421,36.459,May 3 2021 10:00,5,text',
+        ]
+        self.assertEqual(bulk_import_targets(csv)['errors'], [])
+        saved = Target.objects.create(name='saved', type=Target.SIDEREAL, ra=10.0, dec=12.0)
+        for key, value in (('discovery', 'May 3 2021 10:00'), ('redshift', '5'), ('note', 'text')):
+            TargetExtra.objects.create(target=saved, key=key, value=value)
+
+        fields = ('key', 'float_value', 'bool_value', 'time_value')
+        self.assertEqual(list(TargetExtra.objects.filter(target__name='m13').order_by('key').values_list(*fields)),
+                         list(TargetExtra.objects.filter(target=saved).order_by('key').values_list(*fields)))
+
+    def test_bulk_import_reports_duplicated_coordinates(self):
+        Target.objects.create(name='existing', type=Target.SIDEREAL, ra=10.0, dec=12.0)
+        csv = [
+            'name,ra,dec,description',
+            'near_existing,10.0002,12.0,too close to a stored target',
+            'first,100.0,-5.0,first of two close rows',
+            'second,100.0,-5.0005,second of two close rows',
+            'missing_dec,100.0,,row without declination',
+        ]
+        result = bulk_import_targets(csv)
+        self.assertEqual([target.name for target in result['targets']], ['first'])
+        self.assertEqual(len(result['errors']), 3)
+        self.assertTrue(result['errors'][0].startswith("Error importing row 3: Error: 'dec' not found"))
+        self.assertIn('Error importing row 0: Source found already at these coordinates (rad 3 arcsec): existing',
+                      result['errors'])
+        self.assertIn('Error importing row 2: Source found already at these coordinates (rad 3 arcsec): first',
+                      result['errors'])
+        self.assertFalse(Target.objects.filter(name__in=['near_existing', 'second']).exists())
+
+
+class TestGaiaAlertsImport(TestCase):
+    def setUp(self):
+        self.harvester = StubHarvesterClient({
+            'Gaia19dke': {'ra': 287.13, 'dec': 8.13, 'discovery_date': '2019-08-09T00:00:00',
+                          'description': 'microlensing event candidate'},
+            'Gaia19axp': {'ra': 168.83, 'dec': -61.62, 'discovery_date': '2019-02-17T00:00:00',
+                          'description': 'candidate quasar brightening'},
+        })
+        self.csv = [
+            'name,GAIA_ALERTS_name,redshift',
+            'mytarget,Gaia19dke,5',
+            'myquasar,gaia19axp,5',
+            'unknown,Gaia99zzz,5',
+        ]
+
+    def check_result(self, result):
+        self.assertEqual(sorted(self.harvester.requested), ['Gaia19axp', 'Gaia19dke', 'Gaia99zzz'])
+        self.assertEqual(sorted(target.name for target in result['targets']), ['Gaia19axp', 'Gaia19dke'])
+        self.assertEqual(result['errors'], ['Error importing row 2: Error fetching Gaia Alerts data'])
+        target = Target.objects.get(name='Gaia19dke')
+        self.assertEqual(target.type, Target.SIDEREAL)
+        self.assertEqual(target.description, 'microlensing event candidate')
+        self.assertTrue(TargetName.objects.filter(target=target, source_name='GAIA_ALERTS', name='Gaia19dke').exists())
+
+    def test_import_resolves_gaia_alerts_names(self):
+        self.check_result(import_targets(self.csv, harvester=self.harvester))
+
+    def test_bulk_import_resolves_gaia_alerts_names(self):
+        self.check_result(bulk_import_targets(self.csv, harvester=self.harvester))
@@ -0,0 +1,64 @@
+import json
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from bhtom_base.bhtom_targets.models import Target
+from bhtom2.utils.plot_encoding import decode_typed_arrays, encode_typed_arrays
+
+GET_PLOTS_URL = '/targets/get-plots/'
+TYPED_JSON = 'application/vnd.bhtom.typed+json'
+
+
+class TestPlotEncoding(TestCase):
+    def test_numeric_lists_round_trip(self):
+        data = {'x': [60000.0 + i / 3 for i in range(10)], 'y': [15.0] * 9 + [None], 'ids': list(range(10)),
+                'text': ['a'] * 10, 'visible': [True] * 10, 'short': [1.0, 2.0]}
+        encoded = encode_typed_arrays(data)
+        self.assertEqual(encoded['x']['dtype'], 'f8')
+        self.assertEqual(encoded['ids']['dtype'], 'i4')
+        self.assertEqual(encoded['text'], data['text'])
+        self.assertEqual(encoded['visible'], data['visible'])
+        self.assertEqual(encoded['short'], data['short'])
+        self.assertEqual(decode_typed_arrays(encoded), data)
+
+
+class TestGetPlotsApi(TestCase):
+    def setUp(self):
+        self.plots_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(DATA_PLOTS_PATH=self.plots_dir.name + '/')
+        self.settings_override.enable()
+        self.figure = {'data': [{'type': 'scatter', 'name': 'GSA(G)',
+                                 'x': ['2020-01-%02d' % (i + 1) for i in range(20)],
+                                 'y': [15.0 + i / 100 for i in range(20)]}],
+                       'layout': {}}
+        with open(os.path.join(self.plots_dir.name, 'plot.json'), 'w') as f:
+            json.dump(self.figure, f)
+        self.target = Target.objects.create(name='plots_api_target', type=Target.SIDEREAL, ra=10.0, dec=12.0)
+        Target.objects.filter(pk=self.target.pk).update(photometry_plot='plot.json')
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create(username='testuser'))
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.plots_dir.cleanup()
+
+    def test_json_by_default(self):
+        response = self.client.post(GET_PLOTS_URL, {'targetNames': [self.target.name]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content)['Plots'][self.target.name], self.figure)
+
+    def test_typed_arrays_on_request(self):
+        response = self.client.post(GET_PLOTS_URL, {'targetNames': [self.target.name]}, format='json',
+                                    HTTP_ACCEPT=TYPED_JSON)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], TYPED_JSON)
+        plot = json.loads(response.content)['Plots'][self.target.name]
+        self.assertEqual(plot['data'][0]['y']['dtype'], 'f8')
+        self.assertEqual(plot['data'][0]['x'], self.figure['data'][0]['x'])
+        self.assertEqual(decode_typed_arrays(plot), self.figure)
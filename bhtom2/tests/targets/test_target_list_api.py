@@ -0,0 +1,87 @@
+import csv
+import io
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+from bhtom_base.bhtom_targets.tests.factories import SiderealTargetFactory, TargetGroupingFactory
+
+from bhtom_base.bhtom_targets.models import TargetName
+
+TARGET_LIST_URL = '/targets/getTargetList/'
+
+# COUNT(*) for the paginator, the page itself, and one prefetch each for aliases and groups
+TARGET_LIST_PAGE_QUERIES = 4
+
+
+class TestGetTargetListApi(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='testuser')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.grouping = TargetGroupingFactory.create()
+
+    def _create_targets(self, count):
+        targets = SiderealTargetFactory.create_batch(count)
+        for target in targets:
+            TargetName.objects.create(target=target, source_name='GAIA', name=f'Gaia{target.id}')
+            TargetName.objects.create(target=target, source_name='ZTF', name=f'ZTF{target.id}')
+            self.grouping.targets.add(target)
+        return targets
+
+    def test_aliases_and_groups_in_response(self):
+        target = self._create_targets(1)[0]
+        response = self.client.post(TARGET_LIST_URL, {}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        row = response.data['data'][0]
+        self.assertEqual(row['name'], target.name)
+        self.assertNotIn('id', row)
+        self.assertCountEqual(row['aliases'], [['GAIA', f'Gaia{target.id}'], ['ZTF', f'ZTF{target.id}']])
+        self.assertEqual(row['groups'], [[self.grouping.name, self.grouping.id]])
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        self._create_targets(3)
+        with self.assertNumQueries(TARGET_LIST_PAGE_QUERIES):
+            response = self.client.post(TARGET_LIST_URL, {}, format='json')
+        self.assertEqual(len(response.data['data']), 3)
+
+        self._create_targets(30)
+        with self.assertNumQueries(TARGET_LIST_PAGE_QUERIES):
+            response = self.client.post(TARGET_LIST_URL, {}, format='json')
+        self.assertEqual(len(response.data['data']), 33)
+
+
+class TestTargetListExportApi(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='testuser')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.grouping = TargetGroupingFactory.create()
+        self.targets = SiderealTargetFactory.create_batch(5)
+        for target in self.targets:
+            TargetName.objects.create(target=target, source_name='GAIA', name=f'Gaia{target.id}')
+            self.grouping.targets.add(target)
+
+    def test_export_ndjson_matches_target_list(self):
+        listed = self.client.post(TARGET_LIST_URL, {}, format='json').data['data']
+        response = self.client.post('/targets/exportTargetList/', {}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        exported = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(exported, json.loads(json.dumps(listed)))
+
+    def test_export_csv(self):
+        response = self.client.post('/targets/exportTargetList/', {'format': 'csv'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['aliases'], f'GAIA:Gaia{self.targets[0].id}')
+        self.assertEqual(rows[0]['groups'], self.grouping.name)
+
+    def test_export_unknown_format(self):
+        response = self.client.post('/targets/exportTargetList/', {'format': 'xml'}, format='json')
+        self.assertEqual(response.status_code, 400)
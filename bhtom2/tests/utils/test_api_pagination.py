@@ -0,0 +1,32 @@
+from datetime import datetime, timezone
+
+from django.db.models import Q
+from django.test import TestCase
+from rest_framework.exceptions import ValidationError
+
+from bhtom2.utils.api_pagination import StandardResultsSetPagination
+
+
+class TestCursorEncoding(TestCase):
+    def test_cursor_round_trip(self):
+        created = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+        cursor = StandardResultsSetPagination.encode_cursor([created, 42])
+        position = StandardResultsSetPagination.decode_cursor(cursor, 2)
+        self.assertEqual(position, [created.isoformat(), 42])
+
+    def test_float_cursor_round_trip(self):
+        cursor = StandardResultsSetPagination.encode_cursor([59000.123456789, 7])
+        self.assertEqual(StandardResultsSetPagination.decode_cursor(cursor, 2), [59000.123456789, 7])
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValidationError):
+            StandardResultsSetPagination.decode_cursor('not a cursor', 2)
+        with self.assertRaises(ValidationError):
+            StandardResultsSetPagination.decode_cursor(StandardResultsSetPagination.encode_cursor([1]), 2)
+
+    def test_keyset_condition(self):
+        ascending = StandardResultsSetPagination._after_position(['mjd', 'id'], [59000.5, 10], False)
+        self.assertEqual(ascending, Q(mjd__gt=59000.5) | Q(mjd=59000.5, id__gt=10))
+
+        descending = StandardResultsSetPagination._after_position(['created', 'id'], ['2024-01-01', 10], True)
+        self.assertEqual(descending, Q(created__lt='2024-01-01') | Q(created='2024-01-01', id__lt=10))
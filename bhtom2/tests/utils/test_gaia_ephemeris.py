@@ -0,0 +1,37 @@
+import os
+from unittest import mock
+
+import MulensModel as mm
+import numpy as np
+from django.test import SimpleTestCase
+
+import bhtom2
+from bhtom2.utils import gaia_ephemeris
+from bhtom2.utils.gaia_ephemeris import GaiaMulensData, get_gaia_ephemeris
+
+EPHEMERIS_PATH = os.path.join(os.path.dirname(bhtom2.__file__), 'static', 'Gaia_ephemeris.txt')
+
+
+class TestGaiaEphemeris(SimpleTestCase):
+    def setUp(self):
+        self.times = np.linspace(2457000.3, 2459500.7, 50)
+
+    def test_same_positions_as_mulens_model(self):
+        expected = mm.SatelliteSkyCoord(ephemerides_file=EPHEMERIS_PATH).get_satellite_coords(self.times)
+        positions = get_gaia_ephemeris(EPHEMERIS_PATH).satellite_skycoord(self.times)
+        np.testing.assert_allclose(positions.cartesian.xyz.value, expected.cartesian.xyz.value, rtol=1e-10)
+
+    def test_file_parsed_once(self):
+        gaia_ephemeris._ephemerides.clear()
+        with mock.patch.object(gaia_ephemeris, 'Horizons', wraps=gaia_ephemeris.Horizons) as horizons:
+            ephemeris = get_gaia_ephemeris(EPHEMERIS_PATH)
+            for _ in range(3):
+                data = GaiaMulensData(data_list=(self.times, np.full(50, 15.), np.full(50, 0.01)), phot_fmt='mag',
+                                      add_2450000=False, ephemeris=get_gaia_ephemeris(EPHEMERIS_PATH))
+                self.assertEqual(len(data.satellite_skycoord), 50)
+        self.assertEqual(horizons.call_count, 1)
+        self.assertIs(get_gaia_ephemeris(EPHEMERIS_PATH), ephemeris)
+
+    def test_dates_outside_ephemeris(self):
+        with self.assertRaises(ValueError):
+            get_gaia_ephemeris(EPHEMERIS_PATH).positions(np.array([2450000.]))
@@ -0,0 +1,40 @@
+import threading
+import time
+
+from django.test import TestCase
+
+from bhtom2.utils.harvester_client import HarvesterError, StubHarvesterClient
+
+
+class SlowStubHarvesterClient(StubHarvesterClient):
+    def __init__(self, targets, delay, max_workers):
+        super().__init__(targets, max_workers=max_workers)
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def find_target(self, term, harvester, correlation_id=None):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay)
+        with self.lock:
+            self.running -= 1
+        return super().find_target(term, harvester, correlation_id)
+
+
+class TestHarvesterClient(TestCase):
+    def test_find_targets_runs_concurrently_in_bounded_pool(self):
+        targets = {f'Gaia{i}': {'ra': i, 'dec': 0.0} for i in range(8)}
+        client = SlowStubHarvesterClient(targets, delay=0.2, max_workers=4)
+
+        start = time.monotonic()
+        results = client.find_targets(list(targets) + ['Gaia0', 'missing'], 'Gaia Alerts')
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(client.max_running, 4)
+        self.assertLess(elapsed, 9 * 0.2)
+        self.assertEqual(results['Gaia3'], {'ra': 3, 'dec': 0.0})
+        self.assertIsInstance(results['missing'], HarvesterError)
+        self.assertEqual(len(client.requested), 9)
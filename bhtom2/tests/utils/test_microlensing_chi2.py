@@ -0,0 +1,59 @@
+import MulensModel as mm
+import numpy as np
+from django.test import SimpleTestCase
+
+from bhtom2.utils.microlensing_chi2 import MAG_ZEROPOINT, PointLensChi2, point_lens_magnification
+from bhtom2.utils.microlensing_multistart import chi2_fun
+
+PARAMETERS = ['t_0', 'u_0', 't_E']
+
+
+def light_curve(rng, n, mag0, source_fraction, error=0.01):
+    times = np.sort(rng.uniform(2459800., 2460200., n))
+    magnification = point_lens_magnification(times, 2460000., 0.1, 30.)
+    flux = np.power(10., 0.4 * (MAG_ZEROPOINT - mag0)) * (source_fraction * magnification + 1 - source_fraction)
+    mags = MAG_ZEROPOINT - 2.5 * np.log10(flux) + rng.normal(0, error, n)
+    return times, mags, np.full(n, error)
+
+
+class TestPointLensChi2(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.datasets = [light_curve(rng, 300, 16., 0.7), light_curve(rng, 60, 17.5, 0.4),
+                         light_curve(rng, 20, 15., 1.)]
+
+    def mulens_event(self, fixblending):
+        datas = [mm.MulensData(data_list=dataset, phot_fmt='mag', add_2450000=False) for dataset in self.datasets]
+        model = mm.Model({'t_0': 2460000., 'u_0': 0.1, 't_E': 30.})
+        if fixblending:
+            return mm.Event(datasets=datas, model=model, fix_blend_flux={data: 0 for data in datas}), datas
+        return mm.Event(datasets=datas, model=model), datas
+
+    def test_same_chi2_and_fluxes_as_mulens_model(self):
+        for fixblending in (False, True):
+            engine = PointLensChi2(self.datasets, fixblending)
+            event, datas = self.mulens_event(fixblending)
+            for theta, logu0 in (([2460001., 0.12, 28.], False), ([2459995., 0.3, -45.], False),
+                                 ([2460000., -1., 30.], True)):
+                expected = chi2_fun(theta, PARAMETERS, event, logu0)
+                chi2, source, blend = engine.chi2_and_fluxes(theta, logu0)
+                self.assertAlmostEqual(chi2 / expected, 1., places=6)
+                for i, data in enumerate(datas):
+                    mulens_source, mulens_blend = event.get_flux_for_dataset(data)
+                    self.assertAlmostEqual(source[i] / mulens_source[0], 1., places=6)
+                    self.assertAlmostEqual(blend[i], mulens_blend, delta=1e-6 * mulens_source[0])
+
+    def test_same_chi2_as_least_squares(self):
+        theta = [2460001., 0.12, 28.]
+        expected = 0.
+        for times, mags, errors in self.datasets:
+            flux = np.power(10., 0.4 * (MAG_ZEROPOINT - mags))
+            flux_errors = errors * flux * 0.4 * np.log(10.)
+            design = np.column_stack([point_lens_magnification(times, *theta), np.ones(len(times))])
+            fluxes = np.linalg.lstsq(design / flux_errors[:, None], flux / flux_errors, rcond=None)[0]
+            expected += np.sum(((flux - design @ fluxes) / flux_errors) ** 2)
+        self.assertAlmostEqual(PointLensChi2(self.datasets)(theta) / expected, 1., places=9)
+
+    def test_fixed_blending(self):
+        _, _, blend = PointLensChi2(self.datasets, fixblending=True).chi2_and_fluxes([2460000., 0.1, 30.])
+        np.testing.assert_array_equal(blend, 0.)
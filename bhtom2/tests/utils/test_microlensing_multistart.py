@@ -0,0 +1,70 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from bhtom2.utils.microlensing_multistart import GRID, FitSolution, build_event, chi2_fun, distinct_solutions, \
+    latin_hypercube, multi_start_fit, start_points, unit_grid
+
+PARAMETERS = ['t_0', 'u_0', 't_E']
+
+
+def point_lens_mags(times, t0, u0, te, mag0=16.):
+    u = np.sqrt(((times - t0) / te) ** 2 + u0 ** 2)
+    return mag0 - 2.5 * np.log10((u * u + 2) / (u * np.sqrt(u * u + 4)))
+
+
+class TestMicrolensingMultiStart(SimpleTestCase):
+    def test_latin_hypercube_one_point_per_slice(self):
+        points = latin_hypercube(10, 3, np.random.default_rng(1))
+        self.assertEqual(points.shape, (10, 3))
+        for dimension in range(3):
+            self.assertEqual(sorted(np.floor(points[:, dimension] * 10).astype(int)), list(range(10)))
+
+    def test_starts_within_bounds(self):
+        starts = start_points(PARAMETERS, [2460000., 0.3, 40.], 33)
+        self.assertEqual(starts.shape, (33, 3))
+        np.testing.assert_allclose(starts[0], [2460000., 0.3, 40.])
+        self.assertTrue(((starts[1:, 0] >= 2459960.) & (starts[1:, 0] <= 2460040.)).all())
+        self.assertTrue(((starts[1:, 2] >= 5.) & (starts[1:, 2] <= 500.)).all())
+        np.testing.assert_allclose(start_points(PARAMETERS, [2460000., 0.3, 40.], 33), starts)
+
+        self.assertEqual(unit_grid(27, 3).shape, (27, 3))
+        self.assertEqual(start_points(PARAMETERS, [2460000., 0.3, 40.], 28, method=GRID).shape, (28, 3))
+
+    def test_distinct_solutions(self):
+        solutions = [FitSolution({'t_0': 10., 'u_0': 0.1, 't_E': 30.}, 50., {}),
+                     FitSolution({'t_0': 10., 'u_0': 0.1, 't_E': 30.000001}, 50.1, {}),
+                     FitSolution({'t_0': 12., 'u_0': 0.5, 't_E': 20.}, 80., {}),
+                     FitSolution({'t_0': 11., 'u_0': 0.2, 't_E': 25.}, float('inf'), {}),
+                     FitSolution({'t_0': 9., 'u_0': 0.3, 't_E': 60.}, 90., {})]
+        best = distinct_solutions(solutions, PARAMETERS, 2)
+        self.assertEqual([s.chi2 for s in best], [50., 80.])
+
+    def test_recovers_event_from_poor_start(self):
+        times = np.linspace(2459800., 2460200., 200)
+        errors = np.full(len(times), 0.01)
+        mags = point_lens_mags(times, 2460000., 0.1, 30.)
+        datasets = {'G(GAIA)': (times, mags, errors, False)}
+        params = {'t_0': 2460060., 'u_0': 1.2, 't_E': 300.}
+        solutions = multi_start_fit(datasets, params, PARAMETERS, None, fixblending=True, logu0=False,
+                                    ephemeris=None, n_starts=16, workers=1, top_k=3)
+        self.assertLessEqual(len(solutions), 3)
+        best = solutions[0]
+        self.assertAlmostEqual(best.parameters['t_0'], 2460000., delta=0.5)
+        self.assertAlmostEqual(abs(best.parameters['u_0']), 0.1, delta=0.01)
+        self.assertAlmostEqual(best.parameters['t_E'], 30., delta=1.)
+
+    def test_parallax_fit_after_point_lens_fit(self):
+        times = np.linspace(2459800., 2460200., 100)
+        errors = np.full(len(times), 0.01)
+        datasets = {'G(GAIA)': (times, point_lens_mags(times, 2460000., 0.1, 30.), errors, False)}
+        multi_start_fit(datasets, {'t_0': 2460000., 'u_0': 0.1, 't_E': 30.}, PARAMETERS, None, fixblending=True,
+                        logu0=False, ephemeris=None, n_starts=2, workers=1, top_k=1)
+
+        parameters = PARAMETERS + ['pi_E_N', 'pi_E_E']
+        params = {'t_0': 2460000., 'u_0': 0.1, 't_E': 30., 'pi_E_N': 0.2, 'pi_E_E': -0.1, 't_0_par': 2460000.}
+        coords = '18:00:00 -30:00:00'
+        best = multi_start_fit(datasets, params, parameters, coords, fixblending=True, logu0=False,
+                               ephemeris=None, n_starts=2, workers=1, top_k=1)[0]
+        event = build_event(datasets, params, coords, True, None)
+        self.assertAlmostEqual(best.chi2, chi2_fun([best.parameters[p] for p in parameters], parameters, event,
+                                                   False), delta=1e-6 * best.chi2 + 1e-9)
@@ -0,0 +1,92 @@
+from django.test import TestCase, TransactionTestCase
+
+from bhtom_base.bhtom_targets.models import Target, TargetName
+from bhtom2.bhtom_targets.filters import TargetFilter
+from bhtom2.models import TargetNameKey
+from bhtom2.utils.name_resolver import bulk_index_target_names, exact_target_ids, filter_by_name, name_keys, \
+    normalize_name, resolve_target, similar_names
+
+
+class TestNameNormalization(TestCase):
+    def test_normalize_name(self):
+        for name in ['Gaia19dke', 'GAIA 19dke', 'gaia_19dke', ' Gaia-19DKE ']:
+            self.assertEqual(normalize_name(name), 'gaia19dke')
+
+    def test_name_keys(self):
+        self.assertEqual(name_keys('Gaia19dke'), ['gaia19dke'])
+        self.assertEqual(name_keys('AT 2019abc'), ['at2019abc', 'tns:2019abc'])
+        self.assertEqual(name_keys('SN2019abc'), ['sn2019abc', 'tns:2019abc'])
+        self.assertEqual(name_keys('Atlas'), ['atlas'])
+        self.assertEqual(name_keys('  '), [])
+
+    def test_surveys_do_not_share_keys(self):
+        for first, second in (('OGLE-2019-BLG-0001', 'KMT-2019-BLG-0001'), ('OGLE-2019-BLG-0001', 'MOA-2019-BLG-0001'),
+                              ('Gaia19abc', 'ASASSN-19abc')):
+            self.assertFalse(set(name_keys(first)) & set(name_keys(second)))
+
+
+class TestNameResolver(TestCase):
+    def setUp(self):
+        self.gaia = Target.objects.create(name='Gaia19dke', type=Target.SIDEREAL, ra=287.13, dec=8.13)
+        TargetName.objects.create(target=self.gaia, source_name='ZTF', name='ZTF19abcdefg')
+        self.sn = Target.objects.create(name='SN 2019abc', type=Target.SIDEREAL, ra=10.0, dec=10.0)
+        self.gaia_other = Target.objects.create(name='Gaia19dkf', type=Target.SIDEREAL, ra=20.0, dec=20.0)
+
+    def test_keys_follow_names_and_aliases(self):
+        self.assertEqual(set(TargetNameKey.objects.filter(target=self.gaia).values_list('key', flat=True)),
+                         {'gaia19dke', 'ztf19abcdefg'})
+
+        alias = TargetName.objects.get(name='ZTF19abcdefg')
+        alias.delete()
+        self.gaia.name = 'Gaia19dke_renamed'
+        self.gaia.save()
+        self.assertEqual(set(TargetNameKey.objects.filter(target=self.gaia).values_list('key', flat=True)),
+                         {'gaia19dkerenamed'})
+
+    def test_exact_hit(self):
+        self.assertEqual(exact_target_ids('gaia 19DKE'), [self.gaia.pk])
+        self.assertEqual(exact_target_ids('ztf19abcdefg'), [self.gaia.pk])
+        self.assertEqual(exact_target_ids('AT2019abc'), [self.sn.pk])
+        self.assertEqual(exact_target_ids('Gaia19'), [])
+        self.assertEqual(exact_target_ids('19dke'), [])
+
+    def test_other_survey_not_resolved(self):
+        ogle = Target.objects.create(name='OGLE-2019-BLG-0001', type=Target.SIDEREAL, ra=270.0, dec=-30.0)
+        self.assertEqual(exact_target_ids('OGLE 2019 BLG 0001'), [ogle.pk])
+        self.assertEqual(exact_target_ids('KMT-2019-BLG-0001'), [])
+        self.assertEqual(exact_target_ids('ASASSN-19dke'), [])
+        self.assertIsNone(resolve_target('MOA-2019-BLG-0001'))
+
+    def test_filter_by_name(self):
+        self.assertEqual(list(filter_by_name(Target.objects.all(), 'Gaia19dke')), [self.gaia])
+        self.assertEqual(set(filter_by_name(Target.objects.all(), 'gaia19dk')), {self.gaia, self.gaia_other})
+        self.assertEqual(set(TargetFilter({'name': 'gaia19dk'}, queryset=Target.objects.all()).qs),
+                         {self.gaia, self.gaia_other})
+
+    def test_resolve_target(self):
+        self.assertEqual(resolve_target('ZTF19abcdefg'), self.gaia)
+        self.assertIsNone(resolve_target('gaia19dk'))
+        self.assertEqual(resolve_target('gaia19dk', unique=False), self.gaia)
+        self.assertIsNone(resolve_target('M31'))
+
+    def test_similar_names(self):
+        names = [name for name, target in similar_names('Gaia19dkx')]
+        self.assertIn('Gaia19dke', names)
+        self.assertIn('Gaia19dkf', names)
+
+    def test_bulk_index(self):
+        TargetNameKey.objects.all().delete()
+        bulk_index_target_names(Target.objects.all())
+        self.assertEqual(exact_target_ids('gaia19dke'), [self.gaia.pk])
+        self.assertEqual(exact_target_ids('AT2019abc'), [self.sn.pk])
+
+
+class TestNameKeysOfDeletedTarget(TransactionTestCase):
+    def test_delete_target_with_aliases(self):
+        target = Target.objects.create(name='Gaia19dke', type=Target.SIDEREAL, ra=287.13, dec=8.13)
+        TargetName.objects.create(target=target, source_name='ZTF', name='ZTF19abcdefg')
+        TargetName.objects.create(target=target, source_name='TNS', name='AT2019abc')
+
+        target.delete()
+        self.assertFalse(Target.objects.filter(name='Gaia19dke').exists())
+        self.assertFalse(TargetNameKey.objects.exists())
@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+
+from django.test import TestCase, override_settings
+
+from bhtom2.utils.plot_cache import PlotCache, object_size
+
+
+class TestPlotCache(TestCase):
+    def setUp(self):
+        self.plots_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(DATA_PLOTS_PATH=self.plots_dir.name + '/')
+        self.settings_override.enable()
+        self.cache = PlotCache(max_bytes=10 ** 6)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.plots_dir.cleanup()
+
+    def write_plot(self, name, y, padding=0):
+        path = os.path.join(self.plots_dir.name, name)
+        with open(path, 'w') as f:
+            json.dump({'data': [{'type': 'scatter', 'x': list(range(len(y))), 'y': y}],
+                       'layout': {'title': {'text': ' ' * padding}}}, f)
+        return path
+
+    def test_size_is_memory_of_parsed_plot(self):
+        path = self.write_plot('plot.json', [float(i) for i in range(1000)])
+        entry = self.cache.get('plot.json')
+        self.assertEqual(entry.size, object_size(entry.figure))
+        self.assertGreater(entry.size, os.path.getsize(path))
+
+    def test_hits_and_y_range(self):
+        self.write_plot('plot.json', [15.0, None, 12.5, 17.0])
+        first = self.cache.get('plot.json')
+        second = self.cache.get('plot.json')
+        self.assertIs(first, second)
+        self.assertEqual(first.y_range, (12.5, 17.0))
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_rewritten_plot_parsed_again(self):
+        path = self.write_plot('plot.json', [15.0])
+        self.cache.get('plot.json')
+        self.write_plot('plot.json', [15.0, 16.0, 17.0])
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertEqual(self.cache.get('plot.json').y_range, (15.0, 17.0))
+        self.assertEqual(self.cache.stats()['entries'], 1)
+
+    def test_size_bound(self):
+        for i in range(3):
+            self.write_plot(f'plot_{i}.json', [float(i)], padding=1000)
+        entry_size = self.cache.get('plot_0.json').size
+        self.cache.clear()
+        self.cache.max_bytes = int(2.5 * entry_size)
+        for i in range(3):
+            self.cache.get(f'plot_{i}.json')
+        stats = self.cache.stats()
+        self.assertEqual(stats['entries'], 2)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertLessEqual(stats['bytes'], self.cache.max_bytes)
+        self.cache.get('plot_2.json')
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_downsampled_keeps_full_y_range(self):
+        self.write_plot('plot.json', [float(i % 7) for i in range(3000)] + [-5.0])
+        reduced = self.cache.get('plot.json', downsampled=True)
+        self.assertTrue(reduced.downsampled)
+        self.assertEqual(reduced.y_range, (-5.0, 6.0))
+        self.assertEqual(len(self.cache.get('plot.json').figure['data'][0]['y']), 3001)
+
+    def test_missing_plot(self):
+        with self.assertRaises(FileNotFoundError):
+            self.cache.get('missing.json')
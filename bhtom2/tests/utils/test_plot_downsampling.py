@@ -0,0 +1,85 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.test import TestCase, override_settings
+
+from bhtom_base.bhtom_targets.models import Target
+from bhtom2.utils.plot_downsampling import downsample_figure, lttb_indices, plot_window
+
+
+def light_curve_trace(n, name='GSA(G)'):
+    x = [(datetime(2020, 1, 1) + timedelta(hours=i)).strftime('%Y-%m-%dT%H:%M:%S') for i in range(n)]
+    y = list(15 + np.sin(np.arange(n) / 50.0))
+    y[n // 2] = 10.0
+    return {'type': 'scatter', 'name': name, 'mode': 'markers', 'x': x, 'y': y,
+            'error_y': {'type': 'data', 'array': [i / 1000.0 for i in range(n)]},
+            'marker': {'color': 'black'}}
+
+
+class TestPlotDownsampling(TestCase):
+    def test_lttb_keeps_ends_and_peak(self):
+        x = np.arange(1000, dtype=float)
+        y = np.zeros(1000)
+        y[437] = 5.0
+        indices = lttb_indices(x, y, 50)
+        self.assertEqual(len(indices), 50)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], 999)
+        self.assertIn(437, indices)
+        self.assertTrue((np.diff(indices) > 0).all())
+
+    def test_short_traces_unchanged(self):
+        figure = {'data': [light_curve_trace(100)]}
+        self.assertFalse(downsample_figure(figure, max_points=200))
+        self.assertEqual(len(figure['data'][0]['x']), 100)
+
+    def test_points_keep_their_errors(self):
+        full = light_curve_trace(5000)
+        figure = {'data': [dict(full), {'type': 'scatter', 'name': 'ZTF(zg)', 'x': [1, 2], 'y': [1, 2]}]}
+        self.assertTrue(downsample_figure(figure, max_points=300))
+        trace = figure['data'][0]
+        self.assertEqual(len(trace['x']), 300)
+        self.assertEqual(len(trace['error_y']['array']), 300)
+        self.assertIn(10.0, trace['y'])
+        for x, y, error in zip(trace['x'], trace['y'], trace['error_y']['array']):
+            i = full['x'].index(x)
+            self.assertEqual((y, error), (full['y'][i], full['error_y']['array'][i]))
+        self.assertEqual(figure['data'][1]['x'], [1, 2])
+        self.assertEqual(len(full['x']), 5000)
+
+    def test_window(self):
+        figure = {'data': [light_curve_trace(5000)]}
+        traces = plot_window(figure, '2020-01-02 00:00:00', '2020-01-02 05:00')
+        self.assertEqual(len(traces), 1)
+        self.assertEqual(traces[0]['index'], 0)
+        self.assertEqual(traces[0]['x'][0], '2020-01-02T00:00:00')
+        self.assertEqual(len(traces[0]['x']), 6)
+        self.assertEqual(traces[0]['error_y']['array'], [0.024, 0.025, 0.026, 0.027, 0.028, 0.029])
+
+
+class TestPhotometryPlotWindowView(TestCase):
+    def setUp(self):
+        self.plots_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(DATA_PLOTS_PATH=self.plots_dir.name + '/')
+        self.settings_override.enable()
+        with open(os.path.join(self.plots_dir.name, 'plot.json'), 'w') as f:
+            json.dump({'data': [light_curve_trace(2000)], 'layout': {}}, f)
+        self.target = Target.objects.create(name='plot_window_target', type=Target.SIDEREAL, ra=10.0, dec=12.0,
+                                            photometry_plot='plot.json')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.plots_dir.cleanup()
+
+    def test_window_points(self):
+        response = self.client.get(f'/targets/{self.target.pk}/photometry-plot-window',
+                                   {'start': '2020-01-01', 'end': '2020-01-01 23:59'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['traces'][0]['x']), 24)
+
+    def test_window_requires_range(self):
+        response = self.client.get(f'/targets/{self.target.pk}/photometry-plot-window')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,66 @@
+import json
+import os
+import tempfile
+
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from bhtom_base.bhtom_targets.models import Target
+from bhtom2.utils.plot_thumbnails import render_thumbnail, render_thumbnail_image, thumbnail_version
+
+
+def icon_plot(y):
+    return {'data': [{'type': 'scatter', 'mode': 'markers', 'x': ['2020-01-01', '2020-02-01', '2020-03-01'], 'y': y,
+                      'marker': {'color': 'red'}}],
+            'layout': {'yaxis': {'autorange': 'reversed'}}}
+
+
+class TestPlotThumbnails(TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(DATA_PLOTS_PATH=self.data_dir.name + '/',
+                                                   DATA_CACHE_PATH=self.data_dir.name, THUMBNAIL_FORMAT='png')
+        self.settings_override.enable()
+        self.write_plot([15.0, 12.0, 16.0])
+        self.target = Target.objects.create(name='thumbnail_target', type=Target.SIDEREAL, ra=10.0, dec=12.0)
+        Target.objects.filter(pk=self.target.pk).update(photometry_icon_plot='icon.json')
+        self.target.refresh_from_db()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.data_dir.cleanup()
+
+    def write_plot(self, y, mtime_offset=0):
+        path = os.path.join(self.data_dir.name, 'icon.json')
+        with open(path, 'w') as f:
+            json.dump(icon_plot(y), f)
+        if mtime_offset:
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + mtime_offset))
+
+    def test_magnitudes_drawn_reversed(self):
+        image = render_thumbnail_image(icon_plot([15.0, 12.0, 16.0]), size=(108, 108))
+        # brightest point at the top, faintest at the bottom
+        self.assertEqual(image.getpixel((55, 8)), (255, 0, 0))
+        self.assertEqual(image.getpixel((100, 100)), (255, 0, 0))
+        self.assertEqual(image.getpixel((8, 8)), (255, 255, 255))
+
+    def test_rewritten_plot_gets_new_thumbnail(self):
+        first = render_thumbnail(self.target)
+        self.assertEqual(Image.open(first).size, (400, 200))
+        version = thumbnail_version(self.target)
+
+        self.write_plot([15.0, 12.0, 17.0], mtime_offset=10 ** 9)
+        self.assertNotEqual(thumbnail_version(self.target), version)
+        second = render_thumbnail(self.target)
+        self.assertNotEqual(first, second)
+        self.assertFalse(os.path.exists(first))
+
+    def test_thumbnail_view_cached(self):
+        render_thumbnail(self.target)
+        version = thumbnail_version(self.target)
+        response = self.client.get(f'/targets/{self.target.pk}/thumbnail/{version}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get(f'/targets/{self.target.pk}/thumbnail/0000').status_code, 404)
@@ -0,0 +1,58 @@
+import random
+
+from django.test import TestCase
+from bhtom_base.bhtom_targets.models import Target
+from bhtom_base.bhtom_targets.utils import cone_search_filter as trig_cone_search_filter
+
+from bhtom2.models import TargetSkyPosition
+from bhtom2.utils.sky_index import cone_search_filter, unit_vector, InMemorySkyIndex
+
+
+class TestSkyIndexConeSearch(TestCase):
+    def setUp(self):
+        rng = random.Random(42)
+        # clusters around a few centers, including the pole and the RA=0 wrap
+        centers = [(10.0, 12.0), (269.75891, -29.179583), (0.0001, 45.0), (359.9999, 45.0), (120.0, 89.99)]
+        for i in range(200):
+            ra, dec = centers[i % len(centers)]
+            Target.objects.create(name=f'sky_index_{i}', type=Target.SIDEREAL,
+                                  ra=(ra + rng.gauss(0, 0.1)) % 360, dec=max(-90, min(90, dec + rng.gauss(0, 0.1))))
+
+    def test_sky_position_filled_on_save(self):
+        target = Target.objects.get(name='sky_index_0')
+        position = TargetSkyPosition.objects.get(target=target)
+        self.assertEqual((position.x, position.y, position.z), unit_vector(target.ra, target.dec))
+
+        target.dec = -10.0
+        target.save()
+        position.refresh_from_db()
+        self.assertAlmostEqual(position.z, unit_vector(target.ra, -10.0)[2])
+
+    def test_same_results_as_trigonometric_cone_search(self):
+        for ra, dec in [(10.0, 12.0), (269.75891, -29.179583), (0.0, 45.0), (359.95, 45.0), (120.0, 90.0)]:
+            for radius in [3. / 3600., 0.05, 0.1, 0.25, 1.0]:
+                expected = set(trig_cone_search_filter(Target.objects.all(), ra, dec, radius)
+                               .values_list('id', flat=True))
+                found = set(cone_search_filter(Target.objects.all(), ra, dec, radius).values_list('id', flat=True))
+                self.assertEqual(found, expected, f'ra={ra}, dec={dec}, radius={radius}')
+
+
+class TestInMemorySkyIndex(TestCase):
+    def test_same_results_as_database_cone_search(self):
+        rng = random.Random(7)
+        for i in range(100):
+            Target.objects.create(name=f'memory_index_{i}', type=Target.SIDEREAL,
+                                  ra=rng.uniform(0, 360), dec=rng.uniform(-90, 90))
+        index = InMemorySkyIndex.from_queryset(Target.objects.all())
+        for target in Target.objects.all()[:20]:
+            for radius in [3. / 3600., 10.0, 45.0]:
+                expected = set(cone_search_filter(Target.objects.all(), target.ra, target.dec, radius)
+                               .values_list('name', flat=True))
+                self.assertEqual(set(index.query(target.ra, target.dec, radius)), expected)
+
+    def test_added_positions(self):
+        index = InMemorySkyIndex([], [], [])
+        self.assertEqual(index.query(10.0, 12.0, 1. / 3600.), [])
+        for i in range(100):
+            index.add(f'added_{i}', i, 0.0)
+        self.assertEqual(index.query(10.0, 0.0, 1. / 3600.), ['added_10'])
@@ -0,0 +1,96 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from bhtom_base.bhtom_dataproducts.models import ReducedDatum
+from bhtom_base.bhtom_targets.models import Target
+from bhtom2.tests.helpers import LOCMEM_CACHES
+from bhtom2.utils import target_cache
+from bhtom2.utils.target_cache import get_photometry_version, render_target_table, target_details_version, \
+    TARGET_LIST_CACHE, TARGET_DETAILS_CACHE
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TestTargetCache(TestCase):
+    def setUp(self):
+        for name in ('targetList', 'targetDetails'):
+            caches[name].clear()
+        self.t1 = Target.objects.create(name='cache_target_1', type=Target.SIDEREAL, ra=10.0, dec=12.0, importance=5)
+        self.t2 = Target.objects.create(name='cache_target_2', type=Target.SIDEREAL, ra=20.0, dec=-12.0, importance=5)
+        self.query_string = 'importance_min=1'
+
+    def render(self):
+        with mock.patch.object(target_cache, 'render_to_string', wraps=target_cache.render_to_string) as render:
+            html = render_target_table(Target.objects.order_by('id'), self.query_string)
+        rendered_rows = [c for c in render.call_args_list if c.args[0].endswith('target_table_row.html')]
+        return html, len(rendered_rows), render.call_count
+
+    def test_table_cached_per_query(self):
+        html, rows, calls = self.render()
+        self.assertEqual(rows, 2)
+        self.assertIn('cache_target_1', html)
+
+        cached_html, rows, calls = self.render()
+        self.assertEqual(calls, 0)
+        self.assertEqual(cached_html, html)
+
+    def test_target_save_rerenders_only_its_row(self):
+        self.render()
+        self.t1.name = 'cache_target_renamed'
+        self.t1.save()
+
+        html, rows, calls = self.render()
+        self.assertEqual(rows, 1)
+        self.assertIn('cache_target_renamed', html)
+        self.assertIn('cache_target_2', html)
+
+    def test_new_target_changes_query_result(self):
+        self.render()
+        Target.objects.create(name='cache_target_3', type=Target.SIDEREAL, ra=30.0, dec=0.0, importance=5)
+
+        html, rows, calls = self.render()
+        self.assertEqual(rows, 1)
+        self.assertIn('cache_target_3', html)
+
+    def test_generation_bump_invalidates_everything(self):
+        self.render()
+        details_version = target_details_version(self.t1.pk)
+        target_cache.bump_cache_generation(TARGET_LIST_CACHE)
+        target_cache.bump_cache_generation(TARGET_DETAILS_CACHE)
+
+        html, rows, calls = self.render()
+        self.assertEqual(rows, 2)
+        self.assertNotEqual(target_details_version(self.t1.pk), details_version)
+
+    def test_details_version_changes_on_target_save(self):
+        details_version = target_details_version(self.t1.pk)
+        self.assertEqual(target_details_version(self.t1.pk), details_version)
+        self.t1.save()
+        self.assertNotEqual(target_details_version(self.t1.pk), details_version)
+
+    def test_datum_written_without_orm_rerenders_only_its_row(self):
+        self.render()
+        # as the upload service writes: no model signals, the trigger bumps the version
+        ReducedDatum.objects.bulk_create([ReducedDatum(target=self.t1, data_type='photometry', mjd=60000.0,
+                                                       value=15.0, error=0.01, filter='GaiaSP/G')])
+        html, rows, calls = self.render()
+        self.assertEqual(rows, 1)
+        self.assertNotEqual(get_photometry_version(self.t1.pk), get_photometry_version(self.t2.pk))
+
+    def test_cached_table_read_with_two_queries(self):
+        self.render()
+        with self.assertNumQueries(2):
+            # the ids of the targets and their versions
+            html, rows, calls = self.render()
+        self.assertEqual(calls, 0)
+
+    def test_target_change_keeps_no_per_target_query_list(self):
+        for query_string in ('importance_min=1', 'importance_min=2', 'importance_min=3'):
+            self.query_string = query_string
+            self.render()
+        self.t1.save()
+        self.assertFalse([key for key in caches[TARGET_LIST_CACHE]._cache if 'target_list_queries' in key])
+
+        html, rows, calls = self.render()
+        self.assertEqual(rows, 1)
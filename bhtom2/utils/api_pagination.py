@@ -1,3 +1,9 @@
+import base64
+import datetime
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 
@@ -5,6 +11,9 @@ class StandardResultsSetPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 200
 
+    cursor_query_param = 'cursor'
+    count_query_param = 'with_count'
+
     def get_paginated_response(self, data):
         return Response({
             'count': self.page.paginator.count,
@@ -13,3 +22,75 @@ class StandardResultsSetPagination(PageNumberPagination):
             'data': data
         })
 
+    @classmethod
+    def is_cursor_request(cls, request):
+        """
+        Cursor (keyset) mode is opt-in: it is used when the request body contains the 'cursor' key.
+        An empty or null cursor means the first page.
+        """
+        return cls.cursor_query_param in request.data
+
+    @staticmethod
+    def encode_cursor(position):
+        values = [value.isoformat() if isinstance(value, (datetime.date, datetime.datetime)) else value
+                  for value in position]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor, length):
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        except (ValueError, TypeError, AttributeError):
+            raise ValidationError({'cursor': 'Invalid cursor.'})
+        if not isinstance(position, list) or len(position) != length:
+            raise ValidationError({'cursor': 'Invalid cursor.'})
+        return position
+
+    @staticmethod
+    def _after_position(fields, position, descending):
+        """
+        Builds the keyset condition (f0, f1, ...) > (v0, v1, ...) (or < for descending ordering)
+        as an OR of prefix-equal terms, so that the (f0, f1, ...) index can be used.
+        """
+        lookup = 'lt' if descending else 'gt'
+        condition = Q()
+        for i, field in enumerate(fields):
+            term = dict(zip(fields[:i], position[:i]))
+            term[f'{field}__{lookup}'] = position[i]
+            condition |= Q(**term)
+        return condition
+
+    def paginate_queryset_by_cursor(self, queryset, request, ordering, page_size=None):
+        """
+        Keyset pagination over the given ordering, e.g. ('created', 'id') or ('-created', '-id').
+        The last field must be unique. The total count is only computed when 'with_count' is requested.
+        Returns the rows of the page; next_cursor is None on the last page.
+        """
+        page_size = page_size or self.max_page_size
+        descending = ordering[0].startswith('-')
+        fields = [field.lstrip('-') for field in ordering]
+
+        self.count = None
+        if request.data.get(self.count_query_param, False) in (True, 'true', 'True', '1', 1):
+            self.count = queryset.count()
+
+        queryset = queryset.order_by(*ordering)
+        cursor = request.data.get(self.cursor_query_param)
+        if cursor:
+            position = self.decode_cursor(cursor, len(fields))
+            queryset = queryset.filter(self._after_position(fields, position, descending))
+
+        rows = list(queryset[:page_size + 1])
+        self.next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self.next_cursor = self.encode_cursor([getattr(rows[-1], field) for field in fields])
+        return rows
+
+    def get_cursor_paginated_response(self, data, **extra):
+        response_data = {'next_cursor': self.next_cursor}
+        if self.count is not None:
+            response_data['count'] = self.count
+        response_data.update(extra)
+        response_data['data'] = data
+        return Response(response_data)
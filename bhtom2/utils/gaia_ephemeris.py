@@ -0,0 +1,99 @@
+"""
+Gaia ephemeris shared by the microlensing fits.
+
+MulensModel parses the ephemerides file of a MulensData (a JPL Horizons table, with astropy) the first time the
+satellite position of the dataset is needed, so every fit and every Gaia filter parses static/Gaia_ephemeris.txt
+again. Here the file is parsed once per process (by MulensModel's Horizons, so the positions are the same) into
+float arrays with one cubic interpolator, and the Gaia datasets are GaiaMulensData, which take their satellite
+positions from it. The ephemeris is picklable, so the multi-start workers get the arrays instead of the file.
+"""
+
+import os
+import threading
+from typing import Dict, Tuple
+
+import MulensModel as mm
+import numpy as np
+from astropy.coordinates import SkyCoord
+from MulensModel.horizons import Horizons
+from scipy.interpolate import interp1d
+
+# dates outside the ephemeris by less than this (days) are still interpolated, as in MulensModel
+TIME_MARGIN: float = 0.001
+
+_ephemerides: Dict[Tuple[str, int], 'GaiaEphemeris'] = {}
+_lock = threading.Lock()
+
+
+class GaiaEphemeris:
+    """
+    Satellite positions (barycentric cartesian, au) of a Horizons ephemerides file.
+    """
+
+    def __init__(self, path: str, time: np.ndarray, xyz: np.ndarray):
+        self.path = path
+        self.time = time
+        self.xyz = xyz
+        self._interpolator = None
+
+    @classmethod
+    def from_file(cls, path: str) -> 'GaiaEphemeris':
+        horizons = Horizons(path)
+        xyz = np.vstack([np.asarray(horizons.xyz.x), np.asarray(horizons.xyz.y), np.asarray(horizons.xyz.z)])
+        return cls(path, np.asarray(horizons.time, dtype=float), xyz)
+
+    def __getstate__(self):
+        return {'path': self.path, 'time': self.time, 'xyz': self.xyz, '_interpolator': None}
+
+    def positions(self, times: np.ndarray) -> np.ndarray:
+        """
+        Cubic interpolation of the cartesian positions at the times (JD), shape (3, len(times)).
+        """
+        times = np.asarray(times, dtype=float)
+        if len(times) and (times.max() > self.time.max() + TIME_MARGIN or times.min() < self.time.min() - TIME_MARGIN):
+            raise ValueError(f'Satellite ephemeris does not cover requested dates\n Ephemerides file: '
+                             f'{self.time.min()} {self.time.max()}\n Requested dates: {times.min()} {times.max()}')
+        if self._interpolator is None:
+            self._interpolator = interp1d(self.time, self.xyz, kind='cubic', axis=1)
+        return self._interpolator(times)
+
+    def satellite_skycoord(self, times: np.ndarray) -> SkyCoord:
+        """
+        The satellite positions at the times, as MulensModel's SatelliteSkyCoord returns them.
+        """
+        x, y, z = self.positions(times)
+        skycoord = SkyCoord(x=x, y=y, z=z, representation_type='cartesian')
+        skycoord.representation_type = 'spherical'
+        return skycoord
+
+
+def get_gaia_ephemeris(path: str) -> GaiaEphemeris:
+    """
+    The ephemeris of the file, parsed once per process (again when the file changes).
+    """
+    key = (path, os.stat(path).st_mtime_ns)
+    with _lock:
+        ephemeris = _ephemerides.get(key)
+        if ephemeris is None:
+            ephemeris = GaiaEphemeris.from_file(path)
+            for old_key in [k for k in _ephemerides if k[0] == path]:
+                del _ephemerides[old_key]
+            _ephemerides[key] = ephemeris
+    return ephemeris
+
+
+class GaiaMulensData(mm.MulensData):
+    """
+    MulensData observed by Gaia, with the satellite positions interpolated by a shared GaiaEphemeris.
+    """
+
+    def __init__(self, *args, ephemeris: GaiaEphemeris, **kwargs):
+        super().__init__(*args, ephemerides_file=ephemeris.path, **kwargs)
+        self._ephemeris = ephemeris
+        self._gaia_skycoord = None
+
+    @property
+    def satellite_skycoord(self):
+        if self._gaia_skycoord is None:
+            self._gaia_skycoord = self._ephemeris.satellite_skycoord(self.time)
+        return self._gaia_skycoord
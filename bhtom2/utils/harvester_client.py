@@ -0,0 +1,100 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional
+
+import requests
+from django.conf import settings
+from django_guid import get_guid
+from requests.adapters import HTTPAdapter
+
+from bhtom2.utils.bhtom_logger import BHTOMLogger
+
+logger: BHTOMLogger = BHTOMLogger(__name__, 'Bhtom: Harvester client')
+
+
+class HarvesterError(Exception):
+    pass
+
+
+class HarvesterClient:
+    """
+    Client of the harvester service's findTargetWithHarvester endpoint.
+
+    All requests go through one requests.Session with a connection pool as large as the worker pool,
+    so find_targets() resolves many terms concurrently over kept-alive connections.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, max_workers: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        self.base_url = settings.HARVESTER_URL if base_url is None else base_url
+        self.max_workers = max_workers or getattr(settings, 'HARVESTER_MAX_WORKERS', 8)
+        self.timeout = timeout or getattr(settings, 'HARVESTER_TIMEOUT', 30)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def find_target(self, term: str, harvester: str, correlation_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Returns the harvester's data of one target.
+
+        :raises HarvesterError: if the request fails or the target is not found
+        """
+        header = {"Correlation-ID": correlation_id or get_guid()}
+        try:
+            response = self.session.post(self.base_url + '/findTargetWithHarvester/',
+                                         data={'terms': term, 'harvester': harvester},
+                                         headers=header, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.error(f"Harvester {harvester} request for {term} failed: {e}")
+            raise HarvesterError(str(e))
+
+    def find_targets(self, terms: Iterable[str], harvester: str) -> Dict[str, Any]:
+        """
+        Resolves all terms concurrently, at most max_workers requests at a time.
+        Returns a dictionary term -> harvester data, or term -> HarvesterError for failed lookups.
+        """
+        terms = list(dict.fromkeys(terms))
+        if not terms:
+            return {}
+        # the worker threads do not see the request's correlation id, so it is passed explicitly
+        correlation_id = get_guid()
+
+        def resolve(term):
+            try:
+                return self.find_target(term, harvester, correlation_id)
+            except HarvesterError as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(terms))) as executor:
+            results = dict(zip(terms, executor.map(resolve, terms)))
+        logger.info(f"Resolved {len(terms)} terms with harvester {harvester}")
+        return results
+
+
+class StubHarvesterClient(HarvesterClient):
+    """
+    Local harvester answering from a dictionary term -> target data, for tests and offline imports.
+    Unknown terms fail like a 'Target not found' response of the service.
+    """
+
+    def __init__(self, targets: Dict[str, Dict[str, Any]], max_workers: int = 4):
+        super().__init__(base_url='', max_workers=max_workers, timeout=1)
+        self.targets = targets
+        self.requested = []
+
+    def find_target(self, term: str, harvester: str, correlation_id: Optional[str] = None) -> Dict[str, Any]:
+        self.requested.append(term)
+        if term not in self.targets:
+            raise HarvesterError(f"Target not found: {term}")
+        return dict(self.targets[term])
@@ -0,0 +1,224 @@
+"""
+Columnar per-target light-curve cache (Arrow IPC files under DATA_CACHE_PATH/light_curves/<target id>/).
+
+A light curve is a list of segment files named <rewrites>_<first datum id>_<last datum id>_<rows>.arrow, holding
+the target's photometry ReducedDatums in id order, and a state file with the TargetDataVersion counters
+(photometry_rewrites, photometry_version) the segments are up to date with. The counters are bumped by database
+triggers for every writer, so a read checks them with one query: when only the version moved, the datums with
+ids above the last stored one are appended as a new segment; when datums were updated or deleted (photometry
+rewrites), the light curve is rebuilt as one segment. Files are memory mapped, the returned pyarrow Table
+references them without copying.
+
+The columns of the data products (observers, observatory, calibration) are not stored, they change without the
+datums: readers look them up for the data_product_id values of the table with get_data_products.
+"""
+
+import os
+import shutil
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from django.conf import settings
+
+from bhtom_base.bhtom_dataproducts.models import DataProduct, ReducedDatum
+from bhtom2.models import TargetDataVersion
+from bhtom2.utils.bhtom_logger import BHTOMLogger
+
+logger: BHTOMLogger = BHTOMLogger(__name__, 'Bhtom: Light curve store')
+
+SCHEMA: pa.Schema = pa.schema([
+    ('id', pa.int64()),
+    ('mjd', pa.float64()),
+    ('value', pa.float64()),
+    ('error', pa.float64()),
+    ('filter', pa.string()),
+    ('facility', pa.string()),
+    ('observer', pa.string()),
+    ('unit', pa.string()),
+    ('active', pa.bool_()),
+    ('data_product_id', pa.int64()),
+    ('source_location', pa.string()),
+])
+
+DATUM_FIELDS: Tuple[str, ...] = ('id', 'mjd', 'value', 'error', 'filter', 'facility', 'observer', 'value_unit',
+                                 'active_flg', 'data_product_id', 'source_location')
+
+# appended segments are merged into one when there are more of them
+MAX_SEGMENTS: int = 16
+
+
+def light_curve_dir(target_id) -> str:
+    return os.path.join(settings.DATA_CACHE_PATH, 'light_curves', str(target_id))
+
+
+def _photometry(target_id):
+    return ReducedDatum.objects.filter(target_id=target_id,
+                                       data_type=settings.DATA_PRODUCT_TYPES['photometry'][0])
+
+
+def _photometry_versions(target_id) -> Tuple[int, int]:
+    """
+    The (photometry_rewrites, photometry_version) counters of the target.
+    """
+    versions = TargetDataVersion.objects.filter(target_id=target_id) \
+        .values_list('photometry_rewrites', 'photometry_version').first()
+    return versions or (0, 0)
+
+
+def _read_state(directory: str) -> Optional[Tuple[int, int]]:
+    try:
+        with open(os.path.join(directory, 'state')) as f:
+            rewrites, version = f.read().split()
+        return int(rewrites), int(version)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_state(directory: str, state: Tuple[int, int]) -> None:
+    tmp_path = os.path.join(directory, f'.state.{os.getpid()}.{threading.get_ident()}.tmp')
+    with open(tmp_path, 'w') as f:
+        f.write(f'{state[0]} {state[1]}')
+    os.replace(tmp_path, os.path.join(directory, 'state'))
+
+
+def _segments(directory: str, rewrites: int) -> List[Tuple[int, int, int, str]]:
+    """
+    Returns the segments written after the given photometry rewrites as (first id, last id, rows, path),
+    in id order.
+    """
+    segments = []
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return segments
+    for name in names:
+        parts = name[:-len('.arrow')].split('_') if name.endswith('.arrow') else []
+        if len(parts) == 4 and parts[0] == str(rewrites):
+            segments.append((int(parts[1]), int(parts[2]), int(parts[3]), os.path.join(directory, name)))
+    return sorted(segments)
+
+
+def _to_table(rows: Sequence[Tuple]) -> pa.Table:
+    columns = list(zip(*rows)) if rows else [[] for _ in SCHEMA]
+    return pa.Table.from_arrays([pa.array(column, type=field.type) for column, field in zip(columns, SCHEMA)],
+                                schema=SCHEMA)
+
+
+def _write_segment(directory: str, rewrites: int, table: pa.Table) -> str:
+    ids = table.column('id')
+    name = f'{rewrites}_{pc.min(ids).as_py() or 0}_{pc.max(ids).as_py() or 0}_{table.num_rows}.arrow'
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f'.{name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, SCHEMA) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, os.path.join(directory, name))
+    return name
+
+
+def _remove_other_segments(directory: str, keep: str) -> None:
+    for name in os.listdir(directory):
+        if name.endswith('.arrow') and name != keep:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+def rebuild_light_curve(target_id) -> None:
+    """
+    Writes the target's light curve as one segment from the database, replacing all segments.
+    """
+    directory = light_curve_dir(target_id)
+    # read before the datums: a write committed in between makes the next read update the files again
+    state = _photometry_versions(target_id)
+    table = _to_table(list(_photometry(target_id).order_by('id').values_list(*DATUM_FIELDS)))
+    name = _write_segment(directory, state[0], table)
+    _remove_other_segments(directory, name)
+    _write_state(directory, state)
+    logger.debug(f"Light curve of target {target_id} rebuilt, {table.num_rows} datums")
+
+
+def update_light_curve(target_id) -> None:
+    """
+    Brings the stored light curve in line with the database: appends the new datums as a segment,
+    or rebuilds the light curve when datums were updated or deleted.
+    """
+    directory = light_curve_dir(target_id)
+    state = _photometry_versions(target_id)
+    stored_state = _read_state(directory)
+    segments = _segments(directory, state[0])
+    if stored_state == state and segments:
+        return
+
+    disjoint = all(previous[1] < following[0] for previous, following in zip(segments, segments[1:]))
+    if stored_state is None or stored_state[0] != state[0] or not segments or not disjoint \
+            or len(segments) >= MAX_SEGMENTS:
+        rebuild_light_curve(target_id)
+        return
+
+    rows = list(_photometry(target_id).filter(id__gt=segments[-1][1]).order_by('id').values_list(*DATUM_FIELDS))
+    if rows:
+        _write_segment(directory, state[0], _to_table(rows))
+    _write_state(directory, state)
+    logger.debug(f"Light curve of target {target_id}: {len(rows)} datums appended")
+
+
+def remove_light_curve(target_id) -> None:
+    shutil.rmtree(light_curve_dir(target_id), ignore_errors=True)
+
+
+def read_light_curve(target_id) -> pa.Table:
+    """
+    Returns all photometry datums of the target (active and inactive) in id order, columns as in SCHEMA.
+    The table is backed by the memory-mapped files.
+    """
+    for attempt in range(2):
+        update_light_curve(target_id)
+        directory = light_curve_dir(target_id)
+        state = _read_state(directory)
+        try:
+            tables = [pa.ipc.open_file(pa.memory_map(segment[3])).read_all()
+                      for segment in _segments(directory, state[0] if state else 0)]
+            return pa.concat_tables(tables) if tables else _to_table([])
+        except FileNotFoundError:
+            # a segment was replaced by a concurrent rebuild
+            if attempt:
+                raise
+    return _to_table([])
+
+
+def get_light_curve(target_id, units: Optional[Iterable[str]] = None, active_only: bool = True,
+                    measured_only: bool = False, sort_by_mjd: bool = True) -> pa.Table:
+    """
+    Reader API: the target's light curve, optionally restricted to some units (e.g. ReducedDatumUnit.MAGNITUDE),
+    to active datums and to datums with a positive error, sorted by mjd.
+    """
+    table = read_light_curve(target_id)
+    masks = []
+    if active_only:
+        masks.append(pc.equal(table.column('active'), True))
+    if units is not None:
+        masks.append(pc.is_in(table.column('unit'), value_set=pa.array(list(units), type=pa.string())))
+    if measured_only:
+        masks.append(pc.greater(table.column('error'), 0))
+    if masks:
+        mask = masks[0]
+        for other in masks[1:]:
+            mask = pc.and_kleene(mask, other)
+        table = table.filter(mask)
+    if sort_by_mjd:
+        table = table.take(pc.sort_indices(table, sort_keys=[('mjd', 'ascending'), ('id', 'ascending')]))
+    return table
+
+
+def get_data_products(table: pa.Table, *fields: str) -> Dict[int, Tuple]:
+    """
+    The given fields of the data products of the datums in the table, by data product id (one query).
+    """
+    ids = pc.unique(table.column('data_product_id').drop_null()).to_pylist()
+    if not ids:
+        return {}
+    return {row[0]: row[1:] for row in DataProduct.objects.filter(pk__in=ids).values_list('pk', *fields)}
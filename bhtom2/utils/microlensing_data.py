@@ -0,0 +1,91 @@
+"""
+Photometry of a target prepared for the microlensing fits.
+
+The measured, active photometry is read from the columnar light-curve store (bhtom2.utils.light_curve_store) and
+split into per-filter NumPy arrays (times as JD), shared by the point-lens and parallax fits.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from bhtom2.utils.bhtom_logger import BHTOMLogger
+from bhtom2.utils.light_curve_store import get_light_curve
+
+logger: BHTOMLogger = BHTOMLogger(__name__, 'Bhtom: Microlensing data')
+
+MJD_TO_JD: float = 2400000.5
+
+# filters observed by Gaia, their times are corrected with the Gaia ephemeris in the parallax fit
+GAIA_FILTERS = frozenset(('G(GAIA_ALERTS)', 'G(GAIA)', 'BP(GAIA)', 'RP(GAIA)', 'G(Gaia)', 'BP(Gaia)', 'RP(Gaia)',
+                          'G(GAIA DR3)', 'BP(GAIA DR3)', 'RP(GAIA DR3)', 'G(GAIA_DR3)', 'BP(GAIA_DR3)', 'RP(GAIA_DR3)'))
+
+
+@dataclass
+class FilterPhotometry:
+    time: np.ndarray
+    mag: np.ndarray
+    error: np.ndarray
+
+    @property
+    def median_error(self) -> float:
+        return float(np.median(self.error)) if len(self.error) else 0.
+
+
+def load_microlensing_photometry(target_id, value_units: Optional[Sequence[str]] = None) \
+        -> Dict[str, FilterPhotometry]:
+    """
+    Returns the active photometry of the target with a positive error, per filter, sorted by time.
+    Only the datums in value_units are returned when they are given. Datums without time or value are skipped.
+    """
+    table = get_light_curve(target_id, units=value_units, measured_only=True)
+    if not table.num_rows:
+        return {}
+
+    filters = table.column('filter').to_pylist()
+    values = np.array([table.column(name).to_numpy(zero_copy_only=False) for name in ('mjd', 'value', 'error')],
+                      dtype=float)
+    valid = np.isfinite(values).all(axis=0)
+    if not valid.all():
+        logger.warning(f"Skipping {int((~valid).sum())} datapoints without time or value of target {target_id}")
+
+    names, inverse = np.unique(np.array([str(name) for name in filters]), return_inverse=True)
+    photometry = {}
+    for index, name in enumerate(names):
+        selected = valid & (inverse == index)
+        if selected.any():
+            photometry[str(name)] = FilterPhotometry(time=values[0, selected] + MJD_TO_JD,
+                                                     mag=values[1, selected],
+                                                     error=values[2, selected])
+    return photometry
+
+
+def split_photometry(photometry: Dict[str, FilterPhotometry],
+                     filters: Iterable[str]) -> Tuple[Dict, Dict, Dict]:
+    """
+    Returns the times, magnitudes and errors of the filters, as dicts of arrays (empty for a filter without data).
+    """
+    times, mags, errors = (defaultdict(lambda: np.empty(0)) for _ in range(3))
+    for name in filters:
+        if name in photometry:
+            times[name] = photometry[name].time
+            mags[name] = photometry[name].mag
+            errors[name] = photometry[name].error
+    return times, mags, errors
+
+
+def largest_median_error(photometry: Dict[str, FilterPhotometry], filters: Iterable[str]) -> float:
+    """
+    The largest of the median errors of the filters, used to scale the residuals plot.
+    """
+    return max((photometry[name].median_error for name in filters if name in photometry), default=0.)
+
+
+def magnitude_range(*mags: Dict) -> Tuple[float, float]:
+    """
+    Returns the (min, max) magnitude of all filters of the given dicts.
+    """
+    values = [mag for filter_mags in mags for mag in filter_mags.values() if len(mag)]
+    return min(mag.min() for mag in values), max(mag.max() for mag in values)
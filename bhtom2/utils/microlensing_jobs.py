@@ -0,0 +1,152 @@
+"""
+Background jobs for the microlensing fits of TargetMicrolensingView.
+
+A fit is identified by the target, the version of its photometry, the kind of model, the selected filters, the
+initial parameters and the flags. Its result (the template context: data plot, fitted parameters, chi2, source
+flux and blending per filter, rendered model figure) is stored in the default cache under that key, so an
+identical request is answered from the cache and new photometry starts a new fit. Missing fits run in a background
+thread; the page shows the form and polls the status URL until the result is there. A MicrolensingFitJob row
+marks running fits: it is created with get_or_create (the primary key is the fit key), so the same fit is not
+started twice, also by other processes (the default FileBasedCache has no atomic add across processes).
+"""
+
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
+
+from bhtom_base.bhtom_targets.models import Target
+from bhtom2.models import MicrolensingFitJob
+from bhtom2.utils.bhtom_logger import BHTOMLogger
+from bhtom2.utils.microlensing_fit import fit_parallax, fit_point_lens
+from bhtom2.utils.target_cache import get_photometry_version
+
+logger: BHTOMLogger = BHTOMLogger(__name__, 'Bhtom: Microlensing jobs')
+
+FIT_FUNCTIONS = {
+    'point_lens': fit_point_lens,
+    'parallax': fit_parallax,
+}
+
+# arguments of the fit functions which change the result
+FIT_PARAMETERS = ('init_t0', 'init_te', 'init_u0', 'init_piEN', 'init_piEE', 'logu0', 'fixblending', 'auto_init',
+                  'multistart')
+
+FIT_RESULT_TIMEOUT: int = 30 * 24 * 3600
+# a fit still marked as running after this time (e.g. its process was stopped) is started again
+FIT_RUNNING_TIMEOUT: int = 15 * 60
+FIT_FAILED_TIMEOUT: int = 60
+
+DONE, RUNNING, FAILED = 'done', 'running', 'failed'
+
+# matplotlib's pyplot, used to render the model figure, is not thread safe: fits run one at a time per process
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='microlensing')
+
+
+def fit_key(target_id, kind: str, fit_args: Dict) -> str:
+    """
+    Identifies a fit: target, photometry version, model, filters (selected and shown), initial parameters and flags.
+    """
+    payload = {
+        'target': target_id,
+        'photometry': get_photometry_version(target_id),
+        'kind': kind,
+        'filters': sorted([str(name), bool(checked)] for name, checked in fit_args['sel'].items()),
+        'parameters': {name: str(fit_args[name]) for name in FIT_PARAMETERS if name in fit_args},
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def _result_key(key: str) -> str:
+    return f'microlensing_fit:{key}'
+
+
+def _running_since():
+    return timezone.now() - timedelta(seconds=FIT_RUNNING_TIMEOUT)
+
+
+def _claim_fit(key: str) -> bool:
+    """
+    Marks the fit as running, returns False when it is already running in this or another process.
+    """
+    now = timezone.now()
+    _, created = MicrolensingFitJob.objects.get_or_create(key=key, defaults={'started': now})
+    if created:
+        return True
+    # a fit marked as running for too long (e.g. its process was stopped) is taken over by one process
+    return MicrolensingFitJob.objects.filter(key=key, started__lt=_running_since()).update(started=now) == 1
+
+
+def run_fit(key: str, kind: str, target_id, fit_args: Dict) -> Dict:
+    """
+    Runs the fit and stores its result. Called in the background thread.
+    """
+    try:
+        target = Target.objects.get(pk=target_id)
+        result = dict(FIT_FUNCTIONS[kind](target, **fit_args))
+        result.pop('target', None)
+        state = {'status': DONE, 'result': result}
+        cache.set(_result_key(key), state, FIT_RESULT_TIMEOUT)
+    except Exception as e:
+        logger.error(f"Error while fitting {kind} model of target {target_id}: {e}")
+        state = {'status': FAILED, 'error': str(e)}
+        cache.set(_result_key(key), state, FIT_FAILED_TIMEOUT)
+    finally:
+        MicrolensingFitJob.objects.filter(key=key).delete()
+        close_old_connections()
+    return state
+
+
+def get_fit_state(key: str) -> Dict:
+    """
+    Returns {'status': 'done', 'result': ...}, {'status': 'failed', 'error': ...}, {'status': 'running'}
+    or {'status': None} for an unknown fit.
+    """
+    state = cache.get(_result_key(key))
+    if state is not None:
+        return state
+    if MicrolensingFitJob.objects.filter(key=key, started__gte=_running_since()).exists():
+        return {'status': RUNNING}
+    return {'status': None}
+
+
+def get_or_start_fit(target, kind: str, fit_args: Dict) -> Tuple[str, Dict]:
+    """
+    Reader API: returns the key and the state of the fit, starting it in the background when it is neither
+    stored nor running.
+    """
+    key = fit_key(target.pk, kind, fit_args)
+    state = get_fit_state(key)
+    if state['status'] is None:
+        if _claim_fit(key):
+            logger.info(f"Starting {kind} fit of target {target.pk}")
+            _executor.submit(run_fit, key, kind, target.pk, fit_args)
+        state = get_fit_state(key)
+        if state['status'] is None:
+            state = {'status': RUNNING}
+    return key, state
+
+
+def fit_context(target, fit_args: Dict, key: str, state: Dict, status_url: Optional[str] = None) -> Dict:
+    """
+    The template context for a fit: its result when done, otherwise the form values with the pending or error state.
+    """
+    if state['status'] == DONE:
+        context = dict(state['result'])
+        context['filter_counts'] = fit_args.get('filter_counts', context.get('filter_counts'))
+    else:
+        context = dict(fit_args)
+        context['selected_filters'] = [name for name, checked in fit_args['sel'].items() if checked]
+        if state['status'] == FAILED:
+            context['error_message'] = "ERROR fitting microlensing model"
+        else:
+            context['fit_pending'] = True
+            context['fit_status_url'] = status_url
+    context['target'] = target
+    context['fit_key'] = key
+    return context
@@ -0,0 +1,237 @@
+"""
+Multi-start optimizer for the microlensing fits.
+
+A single Nelder-Mead run from the heuristic start often ends in a local minimum. Here a Latin hypercube (or a
+regular grid) of starts over t0, u0, tE (and piEN, piEE with parallax) is minimized in a pool of worker processes,
+each building the MulensModel event once (without parallax the NumPy chi2 of
+bhtom2.utils.microlensing_chi2 is minimized instead). The solutions are sorted by chi2; the best one and the top-k distinct
+alternatives are returned.
+
+The module does not import Django, so the workers (started with spawn, the fits run in a background thread)
+import only NumPy, SciPy and MulensModel.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from bhtom2.utils.microlensing_chi2 import point_lens_chi2
+
+POINT_LENS_PARAMETERS = ['t_0', 'u_0', 't_E']
+
+LATIN_HYPERCUBE = 'lhs'
+GRID = 'grid'
+
+# bounds of the random starts, around the heuristic or given start
+T0_HALF_WIDTH_TE: float = 1.  # t0 within init_t0 -+ init_te
+U0_BOUNDS = (0.01, 1.5)
+TE_BOUNDS = (5., 500.)
+PIE_BOUNDS = (-0.5, 0.5)
+
+# solutions closer than this (relative to the parameter scale) are the same minimum
+SAME_SOLUTION_TOLERANCE: float = 1e-3
+
+# seed of the starts: the same fit request gives the same starts (and the cached result is reproducible)
+STARTS_SEED: int = 20231
+
+# the chi2 of the fit in a worker process, built by _init_worker
+_worker_chi2 = None
+
+
+@dataclass
+class FitSolution:
+    parameters: Dict[str, float]
+    chi2: float
+    start: Dict[str, float]
+
+
+def latin_hypercube(n: int, dimensions: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    n points in the unit hypercube, one in each of the n slices of every dimension.
+    """
+    slices = np.array([rng.permutation(n) for _ in range(dimensions)]).T
+    return (slices + rng.random((n, dimensions))) / n
+
+
+def unit_grid(n: int, dimensions: int) -> np.ndarray:
+    """
+    A regular grid of at most n points in the unit hypercube, at the centres of the cells.
+    """
+    per_dimension = max(int(np.floor(n ** (1. / dimensions) + 1e-9)), 1)
+    axis = (np.arange(per_dimension) + 0.5) / per_dimension
+    return np.stack(np.meshgrid(*([axis] * dimensions), indexing='ij'), axis=-1).reshape(-1, dimensions)
+
+
+def start_bounds(parameters_to_fit: Sequence[str], init_t0: float, init_te: float,
+                 logu0: bool) -> List[Tuple[float, float, bool]]:
+    """
+    (low, high, logarithmic) of every fitted parameter. With logu0 the fitted u_0 is log10(u0).
+    """
+    half_width = T0_HALF_WIDTH_TE * abs(init_te)
+    bounds = {
+        't_0': (init_t0 - half_width, init_t0 + half_width, False),
+        'u_0': (np.log10(U0_BOUNDS[0]), np.log10(U0_BOUNDS[1]), False) if logu0 else U0_BOUNDS + (True,),
+        't_E': TE_BOUNDS + (True,),
+        'pi_E_N': PIE_BOUNDS + (False,),
+        'pi_E_E': PIE_BOUNDS + (False,),
+    }
+    return [bounds[parameter] for parameter in parameters_to_fit]
+
+
+def start_points(parameters_to_fit: Sequence[str], initial_guess: Sequence[float], n_starts: int,
+                 method: str = LATIN_HYPERCUBE, logu0: bool = False, seed: int = STARTS_SEED) -> np.ndarray:
+    """
+    The starts of the fit: the initial guess followed by n_starts - 1 points of a Latin hypercube or grid.
+    t_E and u_0 (unless fitted as log) are spread logarithmically.
+    """
+    bounds = start_bounds(parameters_to_fit, initial_guess[0], initial_guess[2], logu0)
+    dimensions = len(parameters_to_fit)
+    if method == GRID:
+        unit = unit_grid(n_starts - 1, dimensions)
+    else:
+        unit = latin_hypercube(n_starts - 1, dimensions, np.random.default_rng(seed))
+
+    starts = np.empty_like(unit)
+    for i, (low, high, logarithmic) in enumerate(bounds):
+        if logarithmic:
+            starts[:, i] = 10 ** (np.log10(low) + unit[:, i] * (np.log10(high) - np.log10(low)))
+        else:
+            starts[:, i] = low + unit[:, i] * (high - low)
+    return np.vstack([np.asarray(initial_guess, dtype=float), starts])
+
+
+def build_event(datasets: Dict, params: Dict, coords: Optional[str], fixblending: bool, ephemeris):
+    """
+    The MulensModel event of the fit. datasets maps a filter to (times, mags, errors, is_gaia), the Gaia datasets
+    use the GaiaEphemeris ephemeris.
+    """
+    import MulensModel as mm
+    from bhtom2.utils.gaia_ephemeris import GaiaMulensData
+
+    mulens_datas = []
+    for times, mags, errors, is_gaia in datasets.values():
+        if is_gaia:
+            mulens_datas.append(GaiaMulensData(data_list=(times, mags, errors), phot_fmt='mag', add_2450000=False,
+                                               ephemeris=ephemeris))
+        else:
+            mulens_datas.append(mm.MulensData(data_list=(times, mags, errors), phot_fmt='mag', add_2450000=False))
+    model = mm.Model(params, coords=coords) if coords else mm.Model(params)
+    if fixblending:
+        return mm.Event(datasets=tuple(mulens_datas), model=model, fix_blend_flux={d: 0 for d in mulens_datas})
+    return mm.Event(datasets=tuple(mulens_datas), model=model)
+
+
+# it's chi suqared!
+def chi2_fun(theta, parameters_to_fit, event, logu0):
+    """
+    Calculate chi2 for given values of parameters
+    Keywords :
+        theta: *np.ndarray*
+            Vector of parameter values, e.g.,
+            `np.array([5380., 0.5, 20.])`.
+        parameters_to_fit: *list* of *str*
+            List of names of parameters corresponding to theta, e.g.,
+            `['t_0', 'u_0', 't_E']`.
+        event: *MulensModel.Event*
+            Event which has datasets for which chi2 will be calculated.
+        logu0: boolean
+    Returns :
+        chi2: *float*
+            Chi2 value for given model parameters.
+    """
+    # First we have to change the values of parameters in
+    # event.model.parameters to values given by theta.
+    for (parameter, value) in zip(parameters_to_fit, theta):
+        if (parameter == 't_E'): value = np.abs(value)
+        if (parameter == 'rho'): value = np.abs(value)
+        if (logu0 == True):
+            if (parameter == 'u_0'): value = np.power(10., -np.abs(value))  # LOG U0!
+
+        setattr(event.model.parameters, parameter, value)
+
+    # After that, calculating chi2 is trivial:
+    chi2 = event.get_chi2()
+    # a model MulensModel cannot compute (e.g. u_0 = 0 with the log) is rejected by the minimizer
+    return chi2 if np.isfinite(chi2) else np.inf
+
+
+def build_chi2(datasets: Dict, params: Dict, coords: Optional[str], fixblending: bool, ephemeris,
+               parameters_to_fit: Sequence[str]) -> Callable:
+    """
+    The chi2(theta, logu0) of the fit: the NumPy point-lens chi2 without parallax, else the chi2 of the
+    MulensModel event.
+    """
+    if list(parameters_to_fit) == POINT_LENS_PARAMETERS:
+        return point_lens_chi2(datasets, fixblending)
+    event = build_event(datasets, params, coords, fixblending, ephemeris)
+    return lambda theta, logu0: chi2_fun(theta, parameters_to_fit, event, logu0)
+
+
+def minimize_from_start(chi2: Callable, start, logu0) -> Tuple[np.ndarray, float]:
+    import scipy.optimize as op
+
+    result = op.minimize(chi2, x0=start, args=(logu0,), method='Nelder-Mead')
+    return result.x, float(chi2(result.x, logu0))
+
+
+def _init_worker(*chi2_args):
+    global _worker_chi2
+    _worker_chi2 = build_chi2(*chi2_args)
+
+
+def _minimize(start, logu0):
+    return minimize_from_start(_worker_chi2, start, logu0)
+
+
+def _normalized(parameters_to_fit, x) -> Dict[str, float]:
+    # the chi2 function uses |t_E|, keep the solution in the same form
+    return {p: float(abs(v)) if p == 't_E' else float(v) for p, v in zip(parameters_to_fit, x)}
+
+
+def distinct_solutions(solutions: List[FitSolution], parameters_to_fit: Sequence[str],
+                       top_k: int) -> List[FitSolution]:
+    """
+    The best top_k solutions (sorted by chi2), skipping those converged to the same minimum as a better one.
+    """
+    distinct = []
+    for solution in sorted(solutions, key=lambda s: s.chi2):
+        if not np.isfinite(solution.chi2):
+            continue
+        x = np.array([solution.parameters[p] for p in parameters_to_fit])
+        if any(np.allclose(x, [other.parameters[p] for p in parameters_to_fit],
+                           rtol=SAME_SOLUTION_TOLERANCE, atol=SAME_SOLUTION_TOLERANCE) for other in distinct):
+            continue
+        distinct.append(solution)
+        if len(distinct) == top_k:
+            break
+    return distinct
+
+
+def multi_start_fit(datasets: Dict, params: Dict, parameters_to_fit: Sequence[str], coords: Optional[str],
+                    fixblending: bool, logu0: bool, ephemeris, n_starts: int, workers: int,
+                    top_k: int, method: str = LATIN_HYPERCUBE) -> List[FitSolution]:
+    """
+    Minimizes the chi2 from n_starts starts in a pool of worker processes. Returns up to top_k distinct solutions,
+    the best first. params holds the model parameters, the fitted ones at their initial values, and ephemeris the
+    GaiaEphemeris of the Gaia datasets.
+    """
+    initial_guess = [params[parameter] for parameter in parameters_to_fit]
+    starts = start_points(parameters_to_fit, initial_guess, n_starts, method, logu0)
+    chi2_args = (datasets, params, coords, fixblending, ephemeris, parameters_to_fit)
+
+    if workers <= 1:
+        # in this process (the web process for synchronous fits): no module state shared between fits
+        chi2 = build_chi2(*chi2_args)
+        results = [minimize_from_start(chi2, start, logu0) for start in starts]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=chi2_args) as pool:
+            results = list(pool.map(_minimize, starts, [logu0] * len(starts)))
+
+    solutions = [FitSolution(parameters=_normalized(parameters_to_fit, x), chi2=chi2,
+                             start=_normalized(parameters_to_fit, start))
+                 for (x, chi2), start in zip(results, starts)]
+    return distinct_solutions(solutions, parameters_to_fit, top_k)
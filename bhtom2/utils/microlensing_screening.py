@@ -0,0 +1,185 @@
+"""
+Screening of the catalogue for microlensing events.
+
+The optical photometry of a target (the magnitudes of the filters with enough points, without WISE and Fermi
+LAT) is fitted with a point-lens
+model with free blending: the NumPy chi2 of bhtom2.utils.microlensing_chi2 is evaluated on a grid of t0 (over the
+light curve and at its most significant brightenings), tE and u0 in one vectorized pass, and the best grid model
+is refined with Nelder-Mead. The score, t0 and tE are stored in TargetMicrolensingScreening, which the target list
+filters and sorts on.
+
+The screening is incremental: a target is screened again when the count or the last id of its photometry datums
+changed since (datums written without signals, by bulk_create or straight into the database, change them too), or
+when its photometry summary was modified (datums edited through the ORM). Targets are screened in chunks by worker
+processes.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import scipy.optimize as op
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Count, Max, Q
+
+from bhtom_base.bhtom_dataproducts.models import ReducedDatum
+from bhtom_base.bhtom_targets.models import Target
+from bhtom2.models import TargetMicrolensingScreening, TargetPhotometrySummary
+from bhtom2.utils.bhtom_logger import BHTOMLogger
+from bhtom2.utils.microlensing_chi2 import PointLensChi2
+from bhtom2.utils.microlensing_data import FilterPhotometry, load_microlensing_photometry
+from bhtom2.utils.photometry_summary import OPTICAL_UNITS
+
+logger: BHTOMLogger = BHTOMLogger(__name__, 'Bhtom: Microlensing screening')
+
+MIN_FILTER_POINTS: int = 5
+MIN_POINTS: int = 20
+
+T0_GRID: int = 64
+# t0 is also tried at the times of the points brightest relative to their filter's median, in errors
+T0_BRIGHTEST: int = 8
+TE_GRID = np.geomspace(1., 1000., 16)
+U0_GRID = np.geomspace(0.01, 1.5, 8)
+REFINE_MAX_ITERATIONS: int = 400
+
+CHUNK_SIZE: int = 50
+
+
+@dataclass
+class ScreeningResult:
+    score: Optional[float] = None
+    t0: Optional[float] = None
+    te: Optional[float] = None
+    u0: Optional[float] = None
+    chi2: Optional[float] = None
+    chi2_flat: Optional[float] = None
+    point_count: int = 0
+    filter_count: int = 0
+
+
+def screening_datasets(photometry: Dict[str, FilterPhotometry]) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    The (times, mags, errors) of the filters screened: at least MIN_FILTER_POINTS points, no WISE and no LAT
+    (as in the filters offered by TargetMicrolensingView).
+    """
+    return [(p.time, p.mag, p.error) for name, p in sorted(photometry.items())
+            if 'WISE' not in name and 'LAT' not in name and len(p.time) >= MIN_FILTER_POINTS]
+
+
+def t0_grid(datasets: Sequence[Tuple[np.ndarray, np.ndarray, np.ndarray]]) -> np.ndarray:
+    times = np.concatenate([dataset[0] for dataset in datasets])
+    significance = np.concatenate([(np.median(mags) - mags) / errors for _, mags, errors in datasets])
+    brightest = times[np.argsort(significance)[-T0_BRIGHTEST:]]
+    return np.unique(np.concatenate([np.linspace(times.min(), times.max(), T0_GRID), brightest]))
+
+
+def screen_light_curve(datasets: Sequence[Tuple[np.ndarray, np.ndarray, np.ndarray]]) -> ScreeningResult:
+    """
+    Fits the point-lens model to the datasets, returns the score and the parameters of the best model.
+    """
+    point_count = sum(len(dataset[0]) for dataset in datasets)
+    result = ScreeningResult(point_count=point_count, filter_count=len(datasets))
+    if point_count < MIN_POINTS:
+        return result
+
+    chi2 = PointLensChi2(datasets)
+    chi2_flat = chi2.flat_chi2()
+    t_0, t_E, u_0 = (grid.ravel() for grid in np.meshgrid(t0_grid(datasets), TE_GRID, U0_GRID, indexing='ij'))
+    grid_chi2 = chi2.chi2_grid(t_0, u_0, t_E)
+    best = int(np.argmin(grid_chi2))
+    if not np.isfinite(grid_chi2[best]):
+        return result
+    theta, best_chi2 = np.array([t_0[best], u_0[best], t_E[best]]), float(grid_chi2[best])
+
+    refined = op.minimize(chi2, x0=theta, method='Nelder-Mead', options={'maxiter': REFINE_MAX_ITERATIONS})
+    refined_chi2, source, _ = chi2.chi2_and_fluxes(refined.x)
+    if refined_chi2 < best_chi2 and (source > 0).all():
+        theta, best_chi2 = refined.x, refined_chi2
+
+    result.t0, result.u0, result.te = (float(value) for value in chi2.parameters(theta))
+    result.u0 = abs(result.u0)
+    result.chi2 = best_chi2
+    result.chi2_flat = chi2_flat
+    if chi2_flat > 0:
+        result.score = max(1. - best_chi2 / chi2_flat, 0.)
+    return result
+
+
+def _photometry():
+    return ReducedDatum.objects.filter(data_type=settings.DATA_PRODUCT_TYPES['photometry'][0])
+
+
+def screen_target(target_id) -> Optional[TargetMicrolensingScreening]:
+    """
+    Screens the photometry of the target and stores the result. Returns None when the target was deleted meanwhile.
+    """
+    # read before the photometry: a change during the screening makes the next run screen the target again
+    version = _photometry().filter(target_id=target_id).aggregate(count=Count('id'), last_id=Max('id'))
+    summary_modified = TargetPhotometrySummary.objects.filter(target_id=target_id) \
+        .values_list('modified', flat=True).first()
+    result = screen_light_curve(screening_datasets(load_microlensing_photometry(target_id, OPTICAL_UNITS)))
+    defaults = dict(vars(result), photometry_count=version['count'], photometry_last_id=version['last_id'] or 0,
+                    summary_modified=summary_modified)
+    with transaction.atomic():
+        # the lock keeps the target until the commit: the foreign key of a deleted target fails only at the commit
+        if not Target.objects.select_for_update().filter(pk=target_id).exists():
+            return None
+        screening, _ = TargetMicrolensingScreening.objects.update_or_create(target_id=target_id, defaults=defaults)
+    return screening
+
+
+def targets_to_screen(rebuild: bool = False) -> List[int]:
+    """
+    Ids of the targets with optical photometry which were not screened since their photometry changed
+    (all of them with rebuild). One grouped query over the photometry, compared with the stored screenings.
+    """
+    photometry = _photometry().order_by().values('target_id') \
+        .annotate(count=Count('id'), last_id=Max('id'), optical=Count('id', filter=Q(value_unit__in=OPTICAL_UNITS))) \
+        .filter(optical__gt=0).values_list('target_id', 'count', 'last_id')
+    if rebuild:
+        return sorted(target_id for target_id, _, _ in photometry)
+
+    screened = {target_id: (count, last_id, modified) for target_id, count, last_id, modified
+                in TargetMicrolensingScreening.objects.values_list('target_id', 'photometry_count',
+                                                                   'photometry_last_id', 'summary_modified')}
+    summaries = dict(TargetPhotometrySummary.objects.values_list('target_id', 'modified'))
+    return sorted(target_id for target_id, count, last_id in photometry
+                  if screened.get(target_id) != (count, last_id, summaries.get(target_id)))
+
+
+def screen_targets(target_ids: Iterable[int]) -> Tuple[int, int]:
+    """
+    Screens the targets, returns the numbers of screened and failed targets (deleted targets are neither).
+    Runs in the worker processes.
+    """
+    screened = failed = 0
+    try:
+        for target_id in target_ids:
+            try:
+                if screen_target(target_id) is not None:
+                    screened += 1
+            except Exception as e:
+                failed += 1
+                logger.error(f"Error while screening target {target_id}: {e}")
+    finally:
+        close_old_connections()
+    return screened, failed
+
+
+def run_screening(target_ids: Sequence[int], workers: int = 1, chunk_size: int = CHUNK_SIZE) -> Tuple[int, int]:
+    """
+    Screens the targets in chunks, in worker processes when workers > 1. Returns the numbers of screened and
+    failed targets.
+    """
+    chunks = [target_ids[i:i + chunk_size] for i in range(0, len(target_ids), chunk_size)]
+    if workers <= 1 or len(chunks) <= 1:
+        results = [screen_targets(chunk) for chunk in chunks]
+    else:
+        # forked workers must not share the database connections of this process
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as pool:
+            results = list(pool.map(screen_targets, chunks))
+    return sum(result[0] for result in results), sum(result[1] for result in results)
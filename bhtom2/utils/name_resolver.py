@@ -0,0 +1,161 @@
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import transaction
+
+from bhtom_base.bhtom_targets.models import Target, TargetName
+from bhtom2.models import TargetNameKey
+from bhtom2.utils.bhtom_logger import BHTOMLogger
+
+logger: BHTOMLogger = BHTOMLogger(__name__, 'Bhtom: Name resolver')
+
+# prefixes of the names of one survey which name the same object, when followed by a digit: AT2019abc and
+# SN2019abc both get the second key 'tns:2019abc'. Stems are only equal within a survey, OGLE-2019-BLG-0001 and
+# KMT-2019-BLG-0001 or Gaia19abc and ASASSN-19abc are different objects.
+NAME_PREFIXES: Dict[str, str] = {'at': 'tns', 'sn': 'tns'}
+
+# minimal trigram similarity of the suggested names
+SIMILARITY_THRESHOLD: float = 0.3
+
+_SEPARATORS = re.compile(r'[\s_\-]+')
+
+
+def normalize_name(name: str) -> str:
+    """
+    Folds case, spaces, underscores and dashes: 'Gaia 19dke', 'GAIA19DKE' and 'gaia_19dke' give 'gaia19dke'.
+    """
+    return _SEPARATORS.sub('', unicodedata.normalize('NFKC', str(name)).casefold())
+
+
+def name_keys(name: str) -> List[str]:
+    """
+    Returns the lookup keys of a name: the normalized name and, for names with a prefix of NAME_PREFIXES,
+    the survey and the name without the prefix.
+    """
+    key = normalize_name(name)
+    if not key:
+        return []
+    keys = [key]
+    for prefix, survey in NAME_PREFIXES.items():
+        stem = key[len(prefix):]
+        if key.startswith(prefix) and stem[:1].isdigit():
+            keys.append(f'{survey}:{stem}')
+            break
+    return keys
+
+
+def _target_name_keys(target_id, names: Iterable[Tuple[str, str]]) -> List[TargetNameKey]:
+    keys = {}
+    for source_name, name in names:
+        for key in name_keys(name):
+            # the target's own name wins over an alias with the same key
+            if key not in keys or not source_name:
+                keys[key] = TargetNameKey(target_id=target_id, key=key, name=name, source_name=source_name)
+    return list(keys.values())
+
+
+def index_target_names(target: Target) -> None:
+    """
+    Brings the name keys of one target in line with its name and aliases, writing only the differences.
+    Called from the Target and TargetName signals.
+    """
+    names = [('', target.name)] + list(TargetName.objects.filter(target_id=target.pk)
+                                       .values_list('source_name', 'name'))
+    wanted = {key.key: key for key in _target_name_keys(target.pk, names)}
+    stored = {key.key: key for key in TargetNameKey.objects.filter(target_id=target.pk)}
+
+    stale = [key.pk for k, key in stored.items()
+             if k not in wanted or (key.name, key.source_name) != (wanted[k].name, wanted[k].source_name)]
+    missing = [key for k, key in wanted.items() if k not in stored or stored[k].pk in stale]
+    if not stale and not missing:
+        return
+    with transaction.atomic():
+        TargetNameKey.objects.filter(pk__in=stale).delete()
+        TargetNameKey.objects.bulk_create(missing)
+
+
+def bulk_index_target_names(targets: Iterable[Target], batch_size: int = 1000) -> int:
+    """
+    Rebuilds the name keys of many targets at once (backfill, bulk imports), bypassing signals.
+    Returns the number of stored keys.
+    """
+    targets = list(targets)
+    target_ids = [target.pk for target in targets]
+    names = {target.pk: [('', target.name)] for target in targets}
+    for target_id, source_name, name in TargetName.objects.filter(target_id__in=target_ids) \
+            .values_list('target_id', 'source_name', 'name'):
+        names[target_id].append((source_name, name))
+
+    keys = [key for target_id, target_names in names.items() for key in _target_name_keys(target_id, target_names)]
+    with transaction.atomic():
+        TargetNameKey.objects.filter(target_id__in=target_ids).delete()
+        TargetNameKey.objects.bulk_create(keys, batch_size=batch_size)
+    return len(keys)
+
+
+def exact_target_ids(value: str) -> List[int]:
+    """
+    Exact-hit fast path: ids of the targets having the name or alias, up to the folded case, spaces and the
+    prefixes of one survey.
+    Targets matching the full normalized name come first. One probe of the key index.
+    """
+    keys = name_keys(value)
+    if not keys:
+        return []
+    rows = TargetNameKey.objects.filter(key__in=keys).values_list('target_id', 'key')
+    full = [target_id for target_id, key in rows if key == keys[0]]
+    return list(dict.fromkeys(full + [target_id for target_id, key in rows]))
+
+
+def _contains_target_ids(value: str):
+    key = normalize_name(value)
+    return TargetNameKey.objects.filter(key__contains=key).values('target_id')
+
+
+def filter_by_name(queryset, value: str):
+    """
+    Filters a Target queryset by name or alias. Exact hits are returned alone; without an exact hit
+    the targets whose name or alias contains the value are returned (trigram index).
+    """
+    target_ids = exact_target_ids(value)
+    if target_ids:
+        return queryset.filter(pk__in=target_ids)
+    if not normalize_name(value):
+        return queryset
+    return queryset.filter(pk__in=_contains_target_ids(value))
+
+
+def resolve_target(value: str, unique: bool = True) -> Optional[Target]:
+    """
+    Resolves a name or alias to one target: the exact hit, or else the target whose name or alias contains the value.
+    For a value contained in several names, None is returned with unique=True, otherwise the earliest created target.
+    """
+    target_ids = exact_target_ids(value)
+    if target_ids:
+        return Target.objects.filter(pk=target_ids[0]).first()
+    if not normalize_name(value):
+        return None
+    targets = list(Target.objects.filter(pk__in=_contains_target_ids(value)).order_by('created', 'id')[:2])
+    if not targets or (unique and len(targets) > 1):
+        return None
+    return targets[0]
+
+
+def similar_names(value: str, limit: int = 5) -> List[Tuple[str, Target]]:
+    """
+    Fuzzy search: the names and aliases most similar to the value (trigram similarity of the keys).
+    """
+    key = normalize_name(value)
+    if not key:
+        return []
+    keys = (TargetNameKey.objects.filter(key__trigram_similar=key)
+            .annotate(similarity=TrigramSimilarity('key', key))
+            .filter(similarity__gte=SIMILARITY_THRESHOLD)
+            .select_related('target')
+            .order_by('-similarity', 'name')[:limit * 2])
+    found = {}
+    for name_key in keys:
+        found.setdefault(name_key.name, name_key.target)
+    return list(found.items())[:limit]
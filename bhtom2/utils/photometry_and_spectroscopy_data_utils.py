@@ -1,22 +1,23 @@
 import json
-import math
 import operator
-from tempfile import NamedTemporaryFile
-from typing import Any, List, Optional, Tuple
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
 
-import pandas as pd
-
-from django.conf import settings
+from django.core.cache import cache
 from bhtom_base.bhtom_targets.models import Target
 
 from bhtom_base.bhtom_dataproducts.models import ReducedDatum
+from .light_curve_store import get_data_products, get_light_curve
+from .reduced_data_utils import get_target, stream_csv, table_rows
+from .target_cache import get_photometry_version
 from .observation_data_extra_data_utils import decode_datapoint_extra_data, ObservationDatapointExtraData, OWNER_KEY
 
-from numpy import around
 
 SPECTROSCOPY: str = "spectroscopy"
 FACILITY_KEY = "facility"
 
+# cached photometry stats of targets not viewed any more expire after 30 days
+PHOTOMETRY_STATS_TIMEOUT: int = 30 * 24 * 3600
+
 
 def load_datum_json(json_values):
     if json_values:
@@ -51,134 +52,131 @@ def get_spectroscopy_observation_time_jd(reduced_datum: ReducedDatum) -> Optiona
     return None
 
 
-def get_photometry_data_table(target: Target) -> Tuple[List[List[str]], List[str]]:
-    datums = ReducedDatum.objects.filter(
-        target=target,
-        data_type=settings.DATA_PRODUCT_TYPES['photometry'][0],
-        active_flg=True
-    ).select_related('data_product')  # prefetch DataProduct for efficiency
+def _observers(observers_list, observer) -> str:
+    if observers_list:
+        return ', '.join(str(o) for o in observers_list)
+    return observer or ''
+
+
+def get_photometry_data_rows(target: Target) -> Tuple[Iterator[List[Any]], List[str]]:
+    """
+    Active photometry of the target ordered by mjd, read from the light-curve store; the observer column lists
+    the observers of the data product when it has any.
+    """
+    table = get_light_curve(target.pk)
+    data_products = get_data_products(table, 'observers')
 
     columns = ['mjd', 'value', 'error', 'facility', 'filter', 'observer']
-    data = []
 
-    for datum in datums:
-        if datum.data_product and datum.data_product.observers:
-            observers_list = datum.data_product.observers
-            observers_str = ', '.join(str(o) for o in observers_list)
-        else:
-            observers_str = datum.observer or ''
+    def rows():
+        for mjd, value, error, facility, filter, observer, data_product_id in \
+                table_rows(table, columns + ['data_product_id']):
+            observers_list = data_products.get(data_product_id, (None,))[0]
+            yield [mjd, value, error, facility, filter, _observers(observers_list, observer)]
 
-        row = [
-            datum.mjd,
-            datum.value,
-            datum.error,
-            datum.facility,
-            datum.filter,
-            observers_str
-        ]
-        data.append(row)
+    return rows(), columns
 
-    return data, columns
 
-def get_photometry_stats(target: Target) -> Tuple[List[List[str]], List[str]]:
-    data, columns = get_photometry_data_table(target)
+def get_photometry_data_table(target: Target) -> Tuple[List[List[str]], List[str]]:
+    data, columns = get_photometry_data_rows(target)
+    return list(data), columns
+
+def compute_photometry_stats(target: Target) -> Tuple[List[List[Any]], List[str]]:
+    """
+    Photometry stats per facility (observers, filters, number of points, earliest and latest MJD),
+    computed with one group-by over the active photometry of the target in the light-curve store.
+    """
+    table = get_light_curve(target.pk, sort_by_mjd=False)
+    data_products = get_data_products(table, 'observers')
+
+    columns: List[str] = ['facility', 'observer', 'filter', 'Data_points', 'Earliest_time', 'Latest_time']
+
+    if not table.num_rows:
+        return [], columns
+    df = table.select(['mjd', 'facility', 'filter', 'observer']).to_pandas()
+    df['observers'] = [data_products.get(data_product_id, (None,))[0]
+                       for data_product_id in table.column('data_product_id').to_pylist()]
 
-    df = pd.DataFrame(data=data, columns=columns)
+    # observers of the data product, if present, else the datum's observer
+    has_observers = df['observers'].map(bool)
+    df['observer'] = df['observer'].fillna('')
+    df.loc[has_observers, 'observer'] = [', '.join(str(o) for o in observers)
+                                         for observers in df.loc[has_observers, 'observers']]
 
     # For now, ignore anything after the ',' character if present
     # This is because sometimes Facility is in form "Facility, Observer"
     # and we only want to take the Facility name
     # If Facility is not present, then fill it with Owner value
     # If the Owner is blank too, fill it with "Unspecified"
-    df['facility'] = df['facility'] \
-        .apply(lambda x: None if (isinstance(x, float) and math.isnan(x)) else x) \
-        .fillna(df['observer']) \
-        .fillna('Unspecified') \
-        .apply(lambda x: str(x).split(',', 1)[0])
+    df['facility'] = df['facility'].fillna(df['observer']).fillna('Unspecified') \
+        .astype(str).str.split(',', n=1).str[0]
+    df['filter'] = df['filter'].fillna('').astype(str)
 
-    facilities = df['facility'].unique()
+    grouped = df.groupby('facility', sort=False)
+    observers = grouped['observer'].unique()
+    filters = grouped['filter'].unique()
+    counts = grouped.size()
+    earliest = grouped['mjd'].min().round(2)
+    latest = grouped['mjd'].max().round(2)
 
-    columns: List[str] = ['facility', 'observer', 'filter', 'Data_points', 'Earliest_time', 'Latest_time']
-    stats: List[List[Any]] = []
-
-    for facility in facilities:
-        observers = df[df['facility'] == facility]['observer'].unique()
-        datapoints = len(df[df['facility'] == facility].index)
-        filters = df[df['facility'] == facility]['filter'].unique()
-        earliest_time = around(df[df['facility'] == facility]['mjd'].min(), 2)
-        latest_time = around(df[df['facility'] == facility]['mjd'].max(), 2)
-
-        stats.append([facility, ", ".join(observers), ", ".join(filters), datapoints, earliest_time, latest_time])
+    stats: List[List[Any]] = [[facility, ", ".join(observers[facility]), ", ".join(filters[facility]),
+                               int(counts[facility]), float(earliest[facility]), float(latest[facility])]
+                              for facility in counts.index]
 
     stats = sorted(stats, key=operator.itemgetter(2), reverse=True)
 
     return stats, columns
 
 
-def save_data_to_temporary_file(data: List[List[Any]],
-                                columns: List[str],
-                                filename: str,
-                                sort_by: str = 'JD',
-                                sort_by_asc: bool = True) -> Tuple[NamedTemporaryFile, str]:
-    df: pd.DataFrame = pd.DataFrame(data=data,
-                                    columns=columns).sort_values(by=sort_by, ascending=sort_by_asc)
-
-    tmp: NamedTemporaryFile = NamedTemporaryFile(mode="w+",
-                                                 suffix=".csv",
-                                                 prefix=filename,
-                                                 delete=False)
-
-    with open(tmp.name, 'a') as f:
-        f.write("#By downloading the data you agree to use this acknowledgment:\n")
-        f.write(
-            "#The data was obtained via BHTOM (https://bhtom.space), which has received funding from the European\n")
-        f.write(
-            "#Union's Horizon 2020 research and innovation program under grant agreement No. 101004719 (OPTICON-RadioNet Pilot).\n")
-        f.write("#For more information about acknowledgement and data policy please visit https://about.bhtom.space\n")
-    df.to_csv(tmp.name, index=False, sep=';', mode='a')
+def get_photometry_stats(target: Target) -> Tuple[List[List[Any]], List[str]]:
+    """
+    Photometry stats of the target, cached until its photometry changes.
+    """
+    key = f'photometry_stats:{target.pk}:{get_photometry_version(target.pk)}'
+    result = cache.get(key)
+    if result is None:
+        result = compute_photometry_stats(target)
+        cache.set(key, result, PHOTOMETRY_STATS_TIMEOUT)
+    return result
 
-    return tmp, filename
 
+ACKNOWLEDGEMENT: Tuple[str, ...] = (
+    "#By downloading the data you agree to use this acknowledgment:",
+    "#The data was obtained via BHTOM (https://bhtom.space), which has received funding from the European",
+    "#Union's Horizon 2020 research and innovation program under grant agreement No. 101004719 (OPTICON-RadioNet Pilot).",
+    "#For more information about acknowledgement and data policy please visit https://about.bhtom.space",
+)
 
-def save_data_to_latex_table(data: List[List[Any]],
-                             columns: List[str],
-                             filename: str) -> Tuple[NamedTemporaryFile, str]:
-    from .latex_utils import data_to_latex_table
-
-    latex_table_str: str = data_to_latex_table(data=data, columns=columns, filename=filename)
-
-    tmp: NamedTemporaryFile = NamedTemporaryFile(mode="w+",
-                                                 suffix=".csv",
-                                                 prefix=filename,
-                                                 delete=False)
 
-    with open(tmp.name, 'w') as f:
-        f.write(latex_table_str)
+def stream_data_with_acknowledgement(data: Iterable[List[Any]], columns: List[str]) -> Iterator[str]:
+    return stream_csv(data, columns, header_lines=ACKNOWLEDGEMENT)
 
-    return tmp, filename
 
+def get_photometry_stats_latex(target_id: int) -> Tuple[Iterator[str], str]:
+    from .latex_utils import data_to_latex_table
 
-def get_photometry_stats_latex(target_id: int) -> Tuple[NamedTemporaryFile, str]:
-    target: Target = Target.objects.get(pk=target_id)
+    target: Target = get_target(target_id)
 
     data, columns = get_photometry_stats(target)
 
     filename: str = "target_%s_photometry_stats.tex" % target.name
 
-    return save_data_to_latex_table(data, columns, filename)
+    return iter([data_to_latex_table(data=data, columns=columns, filename=filename)]), filename
 
 
-def get_photometry_data_stats(target: Target) -> Tuple[NamedTemporaryFile, str]:
+def get_photometry_data_stats(target: Target) -> Tuple[Iterator[str], str]:
     stats, columns = get_photometry_stats(target)
 
     filename: str = "target_%s_photometry_stats.csv" % target.name
 
-    return save_data_to_temporary_file(stats, columns, filename, 'Data_points', False)
+    stats = sorted(stats, key=operator.itemgetter(3), reverse=True)
+
+    return stream_data_with_acknowledgement(stats, columns), filename
 
 
-def save_photometry_data_for_target_to_csv_file(target: Target) -> Tuple[NamedTemporaryFile, str]:
-    data, columns = get_photometry_data_table(target)
+def stream_photometry_data_for_target(target: Target) -> Tuple[Iterator[str], str]:
+    data, columns = get_photometry_data_rows(target)
 
     filename: str = "target_%s_photometry.csv" % target.name
 
-    return save_data_to_temporary_file(data, columns, filename)
+    return stream_data_with_acknowledgement(data, columns), filename
@@ -0,0 +1,254 @@
+"""
+Maintenance of TargetPhotometrySummary.
+
+The summary follows the TargetDataVersion counters of its target, which database triggers bump for every writer
+(the ORM, bulk_create, the upload service, CPCS). When only new datums were inserted since the last update, the
+datums with ids above the summary's last_datum_id are added to it; when datums were updated, deactivated or
+deleted, the summary is rebuilt from the database with a few aggregate queries.
+
+Saves through the ORM schedule one update per target when their transaction commits, however many datums it
+writes. Deletes send no signals (a queryset of datums is deleted with one query); summaries behind their versions
+are brought up to date by their readers (get_photometry_summary, refresh_photometry_summaries) and by the
+update_photometry_summaries command.
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Min
+
+from bhtom_base.bhtom_dataproducts.models import ReducedDatum, ReducedDatumUnit
+from bhtom_base.bhtom_targets.models import Target
+from bhtom2.models import TargetDataVersion, TargetPhotometrySummary
+from bhtom2.utils.bhtom_logger import BHTOMLogger
+
+logger: BHTOMLogger = BHTOMLogger(__name__, 'Bhtom: Photometry summary')
+
+DATUM_FIELDS: Tuple[str, ...] = ('id', 'mjd', 'value', 'error', 'filter', 'facility', 'value_unit')
+
+OPTICAL_UNITS: Tuple[str, ...] = (ReducedDatumUnit.MAGNITUDE,)
+RADIO_UNITS: Tuple[str, ...] = (ReducedDatumUnit.MILLIJANSKY,)
+XRAY_UNITS: Tuple[str, ...] = (ReducedDatumUnit.COUNTS, ReducedDatumUnit.FLUX)
+
+# fields compared by the consistency check
+SUMMARY_FIELDS: Tuple[str, ...] = ('datum_count', 'first_mjd', 'last_mjd', 'last_magnitude', 'last_magnitude_error',
+                                   'last_magnitude_filter', 'last_magnitude_facility', 'last_magnitude_mjd',
+                                   'last_magnitude_id', 'filter_counts', 'measured_filter_counts', 'facility_counts',
+                                   'unit_counts', 'has_optical', 'has_radio', 'has_xray')
+
+
+def _photometry(target_id):
+    return ReducedDatum.objects.filter(target_id=target_id, data_type=settings.DATA_PRODUCT_TYPES['photometry'][0])
+
+
+def _counts(queryset, field: str) -> Dict[str, int]:
+    return {str(key): count for key, count in queryset.order_by().values_list(field).annotate(count=Count('id'))}
+
+
+def _increment(counts: Dict[str, int], key, delta: int) -> None:
+    key = str(key)
+    count = counts.get(key, 0) + delta
+    if count > 0:
+        counts[key] = count
+    else:
+        counts.pop(key, None)
+
+
+def _set_flags(summary: TargetPhotometrySummary) -> None:
+    summary.has_optical = any(summary.unit_counts.get(unit) for unit in OPTICAL_UNITS)
+    summary.has_radio = any(summary.unit_counts.get(unit) for unit in RADIO_UNITS)
+    summary.has_xray = any(summary.unit_counts.get(unit) for unit in XRAY_UNITS)
+
+
+def compute_photometry_summary(target_id) -> TargetPhotometrySummary:
+    """
+    Computes the summary of the target from the database, without saving it.
+    """
+    active = _photometry(target_id).filter(active_flg=True)
+    stats = active.aggregate(count=Count('id'), first_mjd=Min('mjd'), last_mjd=Max('mjd'))
+    last_magnitude = active.filter(value_unit=ReducedDatumUnit.MAGNITUDE).order_by('-mjd', '-id') \
+        .values_list(*DATUM_FIELDS).first()
+
+    summary = TargetPhotometrySummary(
+        target_id=target_id,
+        datum_count=stats['count'],
+        first_mjd=stats['first_mjd'],
+        last_mjd=stats['last_mjd'],
+        filter_counts=_counts(active, 'filter'),
+        measured_filter_counts=_counts(active.filter(error__gt=0), 'filter'),
+        facility_counts=_counts(active, 'facility'),
+        unit_counts=_counts(active, 'value_unit'),
+        last_datum_id=_photometry(target_id).aggregate(last_id=Max('id'))['last_id'] or 0,
+    )
+    if last_magnitude is not None:
+        _set_last_magnitude(summary, last_magnitude)
+    _set_flags(summary)
+    return summary
+
+
+def _set_last_magnitude(summary: TargetPhotometrySummary, row: Sequence) -> None:
+    datum_id, mjd, value, error, filter, facility, unit = row[:7]
+    summary.last_magnitude_id = datum_id
+    summary.last_magnitude_mjd = mjd
+    summary.last_magnitude = value
+    summary.last_magnitude_error = error
+    summary.last_magnitude_filter = filter
+    summary.last_magnitude_facility = facility
+
+
+def _add_datum(summary: TargetPhotometrySummary, row: Sequence) -> None:
+    datum_id, mjd, value, error, filter, facility, unit = row[:7]
+    summary.datum_count += 1
+    if mjd is not None:
+        summary.first_mjd = mjd if summary.first_mjd is None else min(summary.first_mjd, mjd)
+        summary.last_mjd = mjd if summary.last_mjd is None else max(summary.last_mjd, mjd)
+    _increment(summary.filter_counts, filter, 1)
+    if error is not None and error > 0:
+        _increment(summary.measured_filter_counts, filter, 1)
+    _increment(summary.facility_counts, facility, 1)
+    _increment(summary.unit_counts, unit, 1)
+    if unit == ReducedDatumUnit.MAGNITUDE and mjd is not None and (
+            summary.last_magnitude_mjd is None
+            or (mjd, datum_id) > (summary.last_magnitude_mjd, summary.last_magnitude_id or 0)):
+        _set_last_magnitude(summary, row)
+
+
+def _photometry_versions(target_id) -> Tuple[int, int]:
+    """
+    The (photometry_version, photometry_rewrites) counters of the target.
+    """
+    return TargetDataVersion.objects.filter(target_id=target_id) \
+        .values_list('photometry_version', 'photometry_rewrites').first() or (0, 0)
+
+
+def rebuild_photometry_summary(target_id) -> TargetPhotometrySummary:
+    """
+    Recomputes and stores the summary of the target.
+    """
+    # read before the datums: a write committed in between makes the next update rebuild again
+    version, rewrites = _photometry_versions(target_id)
+    summary = compute_photometry_summary(target_id)
+    defaults = {field: getattr(summary, field) for field in SUMMARY_FIELDS + ('last_datum_id',)}
+    defaults.update(photometry_version=version, photometry_rewrites=rewrites)
+    try:
+        with transaction.atomic():
+            summary, _ = TargetPhotometrySummary.objects.update_or_create(target_id=target_id, defaults=defaults)
+    except IntegrityError:
+        # created concurrently
+        summary, _ = TargetPhotometrySummary.objects.update_or_create(target_id=target_id, defaults=defaults)
+    return summary
+
+
+def _locked_summary(target_id) -> Optional[TargetPhotometrySummary]:
+    return TargetPhotometrySummary.objects.select_for_update().filter(target_id=target_id).first()
+
+
+def update_photometry_summary(target_id) -> TargetPhotometrySummary:
+    """
+    Brings the summary up to date with the photometry versions of the target: adds the datums inserted since
+    the last update, or rebuilds the summary when datums were updated or deleted (or it is missing).
+    """
+    with transaction.atomic():
+        summary = _locked_summary(target_id)
+        version, rewrites = _photometry_versions(target_id)
+        if summary is None or summary.photometry_rewrites != rewrites:
+            return rebuild_photometry_summary(target_id)
+        if summary.photometry_version == version:
+            return summary
+        rows = list(_photometry(target_id).filter(id__gt=summary.last_datum_id).order_by('id')
+                    .values_list(*DATUM_FIELDS, 'active_flg'))
+        for row in rows:
+            if row[-1]:
+                _add_datum(summary, row)
+        if rows:
+            summary.last_datum_id = rows[-1][0]
+        summary.photometry_version = version
+        _set_flags(summary)
+        summary.save()
+    return summary
+
+
+class _PendingSummaryUpdates:
+    """
+    The targets whose summaries are updated when the current transaction commits.
+    """
+
+    def __init__(self):
+        self.target_ids: Set[int] = set()
+        self.called = False
+
+    def __call__(self):
+        self.called = True
+        target_ids = sorted(self.target_ids)
+        # targets deleted later in the transaction have no summary any more
+        for target_id in Target.objects.filter(pk__in=target_ids).order_by('pk').values_list('pk', flat=True):
+            try:
+                update_photometry_summary(target_id)
+            except Exception as e:
+                logger.error(f'Error while updating photometry summary of target {target_id}: {e}')
+
+
+def schedule_photometry_summary_update(target_id) -> None:
+    """
+    Updates the summary of the target once when the current transaction commits (at once outside of a
+    transaction), however many of its datums the transaction writes. Called from the ReducedDatum post_save
+    signal and after deleting datums.
+    """
+    connection = transaction.get_connection()
+    pending = getattr(connection, '_photometry_summary_updates', None)
+    # the callback of a rolled back transaction or savepoint is not registered any more
+    if pending is None or pending.called or not any(entry[1] is pending for entry in connection.run_on_commit):
+        pending = connection._photometry_summary_updates = _PendingSummaryUpdates()
+        pending.target_ids.add(target_id)
+        transaction.on_commit(pending)
+    else:
+        pending.target_ids.add(target_id)
+
+
+def check_photometry_summary(target_id) -> List[str]:
+    """
+    Consistency check: returns the summary fields which differ from the values computed from the database
+    (['missing'] when the target has no summary).
+    """
+    stored = TargetPhotometrySummary.objects.filter(target_id=target_id).first()
+    if stored is None:
+        return ['missing']
+    computed = compute_photometry_summary(target_id)
+    return [field for field in SUMMARY_FIELDS if getattr(stored, field) != getattr(computed, field)]
+
+
+def get_photometry_summary(target_id) -> TargetPhotometrySummary:
+    """
+    Reader API: the stored summary, brought up to date when the photometry of the target changed since.
+    """
+    summary = TargetPhotometrySummary.objects.filter(target_id=target_id).first()
+    if summary is None or (summary.photometry_version, summary.photometry_rewrites) \
+            != _photometry_versions(target_id):
+        summary = update_photometry_summary(target_id)
+    return summary
+
+
+def stale_photometry_summaries(target_ids: Optional[Iterable[int]] = None) -> List[int]:
+    """
+    Ids of the targets (of the given ones) with photometry whose summary is missing or behind their versions.
+    """
+    versions = TargetDataVersion.objects.filter(photometry_version__gt=0)
+    summaries = TargetPhotometrySummary.objects.all()
+    if target_ids is not None:
+        target_ids = list(target_ids)
+        versions = versions.filter(target_id__in=target_ids)
+        summaries = summaries.filter(target_id__in=target_ids)
+    applied = {target_id: (version, rewrites) for target_id, version, rewrites
+               in summaries.values_list('target_id', 'photometry_version', 'photometry_rewrites')}
+    return sorted(target_id for target_id, version, rewrites
+                  in versions.values_list('target_id', 'photometry_version', 'photometry_rewrites')
+                  if applied.get(target_id) != (version, rewrites))
+
+
+def refresh_photometry_summaries(target_ids: Iterable[int]) -> Dict[int, TargetPhotometrySummary]:
+    """
+    Brings the summaries of the given targets up to date (two queries when none is stale).
+    Returns the updated summaries by target id.
+    """
+    return {target_id: update_photometry_summary(target_id) for target_id in stale_photometry_summaries(target_ids)}
@@ -0,0 +1,148 @@
+"""
+In-process cache of the parsed plot JSON files under DATA_PLOTS_PATH.
+
+Entries are keyed on (path, mtime, size), so a plot rewritten by the plotting service is parsed again on the next
+read, and hold the parsed figure with its precomputed y range. The cache is a size-bounded LRU: the summed memory
+of the parsed figures (measured once when a plot is parsed, several times the size of its file) is kept below
+PLOT_CACHE_MAX_BYTES. Every worker process has its own cache, so the budget applies per worker. Cached figures are
+shared between requests and must not be modified; go.Figure copies its input.
+"""
+
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from bhtom2.utils.bhtom_logger import BHTOMLogger
+from bhtom2.utils.plot_downsampling import downsample_figure
+
+logger: BHTOMLogger = BHTOMLogger(__name__, 'Bhtom: Plot cache')
+
+# per worker process
+DEFAULT_MAX_BYTES: int = 128 * 1024 * 1024
+
+
+@dataclass
+class CachedPlot:
+    figure: Dict
+    y_range: Optional[Tuple[float, float]]
+    size: int
+    downsampled: bool = False
+
+
+def object_size(value) -> int:
+    """
+    Approximate memory held by a parsed figure: sys.getsizeof of all its containers, strings and numbers.
+    Objects referenced several times are counted each time, so the size is rather overestimated.
+    """
+    size = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+    return size
+
+
+def y_range(figure: Dict) -> Optional[Tuple[float, float]]:
+    """
+    Returns the (min, max) of the y values of all traces, None when the plot has no y values.
+    """
+    values = []
+    for trace in figure.get('data') or []:
+        if trace.get('y') is None:
+            continue
+        try:
+            values.append(np.asarray(trace['y'], dtype=float).ravel())
+        except (TypeError, ValueError):
+            continue
+    values = np.concatenate(values) if values else np.empty(0)
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return None
+    return float(values.min()), float(values.max())
+
+
+@dataclass
+class PlotCache:
+    max_bytes: int = DEFAULT_MAX_BYTES
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    size: int = 0
+    entries: OrderedDict = field(default_factory=OrderedDict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def get(self, path: str, downsampled: bool = False) -> CachedPlot:
+        """
+        Returns the parsed plot at path (relative to DATA_PLOTS_PATH), with its traces reduced for display when
+        downsampled is set. Raises FileNotFoundError when the plot does not exist.
+        """
+        full_path = settings.DATA_PLOTS_PATH + str(path)
+        stat = os.stat(full_path)
+        key = (full_path, stat.st_mtime_ns, stat.st_size, downsampled)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        if downsampled:
+            full = self.get(path)
+            figure = dict(full.figure)
+            figure['data'] = list(figure.get('data') or [])
+            # the y range stays the one of all points
+            downsampled_traces = downsample_figure(figure)
+            entry = CachedPlot(figure, full.y_range, object_size(figure['data']), downsampled_traces)
+        else:
+            with open(full_path, 'r') as json_file:
+                figure = json.load(json_file)
+            entry = CachedPlot(figure, y_range(figure), object_size(figure))
+            logger.debug(f"Plot {path} parsed, {stat.st_size} bytes in the file, {entry.size} in memory")
+
+        with self.lock:
+            if key not in self.entries:
+                self._drop_outdated(full_path, stat.st_mtime_ns, stat.st_size)
+                self.entries[key] = entry
+                self.size += entry.size
+                self._evict()
+        return entry
+
+    def _drop_outdated(self, full_path: str, mtime: int, size: int) -> None:
+        for key in [key for key in self.entries if key[0] == full_path and key[1:3] != (mtime, size)]:
+            self.size -= self.entries.pop(key).size
+
+    def _evict(self) -> None:
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            _, entry = self.entries.popitem(last=False)
+            self.size -= entry.size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self.entries), 'bytes': self.size}
+
+
+plot_cache: PlotCache = PlotCache(max_bytes=getattr(settings, 'PLOT_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+
+
+def get_plot(path: str, downsampled: bool = False) -> CachedPlot:
+    return plot_cache.get(path, downsampled)
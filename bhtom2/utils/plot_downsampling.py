@@ -0,0 +1,169 @@
+"""
+Downsampling of the stored photometry plots for display.
+
+Each trace of the plot JSON is one filter (or facility). Traces longer than MAX_POINTS_PER_TRACE are reduced with
+Largest-Triangle-Three-Buckets, which keeps the first and last point and, per bucket, the point spanning the largest
+triangle with its neighbours, so peaks and dips of the light curve survive. Selected points are real measurements,
+so their error bars and hover texts are kept unchanged. The full-resolution points of a zoomed time window are
+returned by plot_window.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from bhtom2.utils.bhtom_logger import BHTOMLogger
+
+logger: BHTOMLogger = BHTOMLogger(__name__, 'Bhtom: Plot downsampling')
+
+# most points of one trace in the default view
+MAX_POINTS_PER_TRACE: int = 1000
+
+# per-point attributes of a scatter trace, subset together with x and y
+POINT_KEYS: Sequence[str] = ('x', 'y', 'text', 'hovertext', 'customdata', 'ids')
+NESTED_POINT_KEYS: Sequence[tuple] = (('error_y', 'array'), ('error_y', 'arrayminus'),
+                                      ('error_x', 'array'), ('error_x', 'arrayminus'),
+                                      ('marker', 'color'), ('marker', 'size'), ('marker', 'symbol'))
+
+
+def x_to_float(x) -> Optional[np.ndarray]:
+    """
+    Returns the x values as floats (dates as milliseconds since the epoch), None when they cannot be converted.
+    """
+    values = np.asarray(x)
+    if values.dtype.kind in 'iuf':
+        return values.astype(float)
+    try:
+        return np.array(values, dtype='datetime64[ms]').astype('int64').astype(float)
+    except (TypeError, ValueError):
+        return None
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets, in x order.
+    x must be sorted; points with a missing y are never selected.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    valid = np.isfinite(x) & np.isfinite(y)
+    if not valid.all():
+        kept = np.flatnonzero(valid)
+        return kept[lttb_indices(x[kept], y[kept], threshold)]
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    indices = np.empty(threshold, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        indices[bucket + 1] = previous
+    return indices
+
+
+def _per_point(trace: Dict, n: int):
+    """
+    Yields (parent, container, key) of the trace attributes holding one value per point,
+    parent is None for top-level attributes.
+    """
+    for key in POINT_KEYS:
+        if isinstance(trace.get(key), (list, tuple)) and len(trace[key]) == n:
+            yield None, trace, key
+    for parent, key in NESTED_POINT_KEYS:
+        container = trace.get(parent)
+        if isinstance(container, dict) and isinstance(container.get(key), (list, tuple)) \
+                and len(container[key]) == n:
+            yield parent, container, key
+
+
+def select_points(trace: Dict, indices: np.ndarray) -> Dict:
+    """
+    Returns a copy of the trace with only the points at indices.
+    """
+    trace = dict(trace)
+    for parent in {parent for parent, _ in NESTED_POINT_KEYS}:
+        if isinstance(trace.get(parent), dict):
+            trace[parent] = dict(trace[parent])
+    n = len(trace.get('x') or ())
+    for _, container, key in list(_per_point(trace, n)):
+        values = container[key]
+        container[key] = [values[i] for i in indices]
+    return trace
+
+
+def _sorted_points(trace: Dict):
+    """
+    Returns (trace with points in x order, x as floats), or (trace, None) when x is not usable.
+    """
+    x = x_to_float(trace.get('x') or ())
+    if x is None or len(x) < 2:
+        return trace, x
+    order = np.argsort(x, kind='stable')
+    if (order[1:] < order[:-1]).any():
+        trace, x = select_points(trace, order), x[order]
+    return trace, x
+
+
+def downsample_trace(trace: Dict, max_points: int = MAX_POINTS_PER_TRACE) -> Dict:
+    """
+    Returns the trace reduced to at most max_points points, or the trace itself when it is short enough.
+    """
+    n = len(trace.get('x') or ())
+    if n <= max_points or trace.get('type', 'scatter') not in ('scatter', 'scattergl'):
+        return trace
+    trace, x = _sorted_points(trace)
+    if x is None:
+        return trace
+    try:
+        y = np.asarray(trace.get('y'), dtype=float)
+    except (TypeError, ValueError):
+        return trace
+    return select_points(trace, lttb_indices(x, y, max_points))
+
+
+def downsample_figure(figure: Dict, max_points: int = MAX_POINTS_PER_TRACE) -> bool:
+    """
+    Reduces the traces of a plot (as a dict) in place. Returns True when a trace was reduced.
+    """
+    reduced = False
+    data = figure.get('data') or []
+    for i, trace in enumerate(data):
+        downsampled = downsample_trace(trace, max_points)
+        if downsampled is not trace:
+            logger.debug(f"Trace {trace.get('name')} reduced from {len(trace['x'])} to {len(downsampled['x'])} points")
+            data[i] = downsampled
+            reduced = True
+    return reduced
+
+
+def plot_window(figure: Dict, start, end) -> List[Dict]:
+    """
+    Returns the full-resolution points of every trace with start <= x <= end, as
+    {'index': trace index, 'x': [...], 'y': [...], ...} with the per-point attributes of the trace.
+    start and end are numbers or dates, like the x values of the plot.
+    """
+    traces = []
+    for index, trace in enumerate(figure.get('data') or []):
+        x = x_to_float(trace.get('x') or ())
+        bounds = x_to_float([start, end])
+        if x is None or bounds is None or not len(x):
+            continue
+        inside = np.flatnonzero((x >= bounds[0]) & (x <= bounds[1]))
+        window = select_points(trace, inside)
+        points = {'index': index}
+        for parent, container, key in _per_point(window, len(inside)):
+            if parent is None:
+                points[key] = container[key]
+            else:
+                points.setdefault(parent, {})[key] = container[key]
+        traces.append(points)
+    return traces
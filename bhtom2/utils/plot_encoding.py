@@ -0,0 +1,72 @@
+"""
+Compact encoding of the numeric arrays of plot payloads.
+
+Lists of numbers are replaced by plotly.js typed arrays, {'dtype': 'f8', 'bdata': <base64 of the little-endian
+values>}, which plotly.js (2.28 and later) and plotly.py 6 accept in place of the list. Missing values become NaN.
+Short lists and lists with other values (dates, names) are left as they are.
+"""
+
+import base64
+from typing import Any, List, Optional
+
+import numpy as np
+
+# shorter lists are not worth encoding
+TYPED_ARRAY_MIN_LENGTH: int = 8
+
+INT32_MIN, INT32_MAX = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+
+
+def typed_array(values: List) -> Optional[dict]:
+    """
+    Returns the typed array of a list of numbers (None allowed for missing values), None for other lists.
+    """
+    if len(values) < TYPED_ARRAY_MIN_LENGTH:
+        return None
+    integers = True
+    for value in values:
+        if value is None:
+            integers = False
+        elif isinstance(value, bool) or not isinstance(value, (int, float)):
+            return None
+        elif integers and not isinstance(value, int):
+            integers = False
+    if integers:
+        array = np.asarray(values)
+        if array.min() < INT32_MIN or array.max() > INT32_MAX:
+            integers = False
+    if integers:
+        array = array.astype('<i4')
+        dtype = 'i4'
+    else:
+        array = np.array([np.nan if value is None else value for value in values], dtype='<f8')
+        dtype = 'f8'
+    return {'dtype': dtype, 'bdata': base64.b64encode(array.tobytes()).decode('ascii')}
+
+
+def encode_typed_arrays(data: Any) -> Any:
+    """
+    Returns a copy of a JSON-like structure with the lists of numbers replaced by typed arrays.
+    """
+    if isinstance(data, dict):
+        return {key: encode_typed_arrays(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        encoded = typed_array(data)
+        if encoded is not None:
+            return encoded
+        return [encode_typed_arrays(value) for value in data]
+    return data
+
+
+def decode_typed_arrays(data: Any) -> Any:
+    """
+    Inverse of encode_typed_arrays, for clients without typed-array support: NaN is returned as None.
+    """
+    if isinstance(data, dict):
+        if set(data) == {'dtype', 'bdata'}:
+            array = np.frombuffer(base64.b64decode(data['bdata']), dtype='<' + data['dtype'])
+            return [None if value != value else value for value in array.tolist()]
+        return {key: decode_typed_arrays(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [decode_typed_arrays(value) for value in data]
+    return data
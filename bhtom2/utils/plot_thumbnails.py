@@ -0,0 +1,189 @@
+"""
+Static thumbnails of the light-curve icon plots, for the target list with images.
+
+A thumbnail is drawn with Pillow from the traces of target.photometry_icon_plot and written to
+DATA_CACHE_PATH/thumbnails/<target id>_<version>.<format>. The version is derived from the path, mtime and size of
+the icon plot, so a rewritten plot gets a new file name and the images can be served with long cache headers.
+Missing or outdated thumbnails are rendered by a background thread; until then the live plot is shown.
+"""
+
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Set
+
+import numpy as np
+from django.conf import settings
+from PIL import Image, ImageColor, ImageDraw
+
+from bhtom2.utils.bhtom_logger import BHTOMLogger
+from bhtom2.utils.plot_cache import get_plot
+from bhtom2.utils.plot_downsampling import x_to_float
+
+logger: BHTOMLogger = BHTOMLogger(__name__, 'Bhtom: Plot thumbnails')
+
+THUMBNAIL_SIZE = (400, 200)
+THUMBNAIL_MARGIN: int = 8
+MARKER_RADIUS: int = 2
+
+# plotly's default trace colors, for traces without a marker color
+DEFAULT_COLORS = ('#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+                  '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf')
+
+CONTENT_TYPES: Dict[str, str] = {'png': 'image/png', 'webp': 'image/webp'}
+
+_renderer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='thumbnails')
+_pending: Set[int] = set()
+_pending_lock = threading.Lock()
+
+
+def thumbnail_format() -> str:
+    return getattr(settings, 'THUMBNAIL_FORMAT', 'png')
+
+
+def thumbnail_dir() -> str:
+    return os.path.join(settings.DATA_CACHE_PATH, 'thumbnails')
+
+
+def thumbnail_version(target) -> Optional[str]:
+    """
+    Returns the version of the target's icon plot, None when the target has no icon plot.
+    """
+    if not target.photometry_icon_plot:
+        return None
+    try:
+        stat = os.stat(settings.DATA_PLOTS_PATH + str(target.photometry_icon_plot))
+    except OSError:
+        return None
+    key = f'{target.photometry_icon_plot}:{stat.st_mtime_ns}:{stat.st_size}'
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def thumbnail_path(target_id, version: str) -> str:
+    return os.path.join(thumbnail_dir(), f'{target_id}_{version}.{thumbnail_format()}')
+
+
+def _color(trace: Dict, index: int):
+    marker = trace.get('marker') or {}
+    color = marker.get('color') if isinstance(marker.get('color'), str) else None
+    if color is None and isinstance((trace.get('line') or {}).get('color'), str):
+        color = trace['line']['color']
+    try:
+        return ImageColor.getrgb(color or DEFAULT_COLORS[index % len(DEFAULT_COLORS)])
+    except ValueError:
+        return ImageColor.getrgb(DEFAULT_COLORS[index % len(DEFAULT_COLORS)])
+
+
+def render_thumbnail_image(figure: Dict, size=THUMBNAIL_SIZE) -> Image.Image:
+    """
+    Draws the scatter traces of a plot: markers, or lines for traces in lines mode. The y axis is reversed when the
+    plot's is (magnitudes).
+    """
+    width, height = size
+    image = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(image)
+
+    traces = []
+    for index, trace in enumerate(figure.get('data') or []):
+        x = x_to_float(trace.get('x') or ())
+        try:
+            y = np.asarray(trace.get('y') or (), dtype=float)
+        except (TypeError, ValueError):
+            continue
+        if x is None or len(x) != len(y):
+            continue
+        valid = np.isfinite(x) & np.isfinite(y)
+        if valid.any():
+            traces.append((trace, index, x[valid], y[valid]))
+    if not traces:
+        return image
+
+    x_min = min(x.min() for _, _, x, _ in traces)
+    x_max = max(x.max() for _, _, x, _ in traces)
+    y_min = min(y.min() for _, _, _, y in traces)
+    y_max = max(y.max() for _, _, _, y in traces)
+    yaxis = (figure.get('layout') or {}).get('yaxis') or {}
+    y_range = yaxis.get('range') or []
+    reversed_y = yaxis.get('autorange') == 'reversed' or (len(y_range) == 2 and y_range[0] > y_range[1])
+
+    def scale(values, low, high, length):
+        span = high - low or 1.0
+        return THUMBNAIL_MARGIN + (values - low) / span * (length - 2 * THUMBNAIL_MARGIN)
+
+    for trace, index, x, y in traces:
+        px = scale(x, x_min, x_max, width)
+        py = scale(y, y_min, y_max, height)
+        if not reversed_y:
+            py = height - py
+        color = _color(trace, index)
+        if 'lines' in (trace.get('mode') or '') and len(px) > 1:
+            draw.line(list(zip(px.tolist(), py.tolist())), fill=color, width=1)
+        else:
+            for cx, cy in zip(px.tolist(), py.tolist()):
+                draw.ellipse((cx - MARKER_RADIUS, cy - MARKER_RADIUS, cx + MARKER_RADIUS, cy + MARKER_RADIUS),
+                             fill=color)
+    return image
+
+
+def render_thumbnail(target, rebuild: bool = False) -> Optional[str]:
+    """
+    Renders the thumbnail of the target's current icon plot, removing the older ones. Returns its path,
+    None when the target has no icon plot.
+    """
+    version = thumbnail_version(target)
+    if version is None:
+        return None
+    path = thumbnail_path(target.pk, version)
+    if os.path.exists(path) and not rebuild:
+        return path
+    image = render_thumbnail_image(get_plot(target.photometry_icon_plot).figure)
+    os.makedirs(thumbnail_dir(), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    image.save(tmp_path, format=thumbnail_format().upper())
+    os.replace(tmp_path, path)
+
+    prefix = f'{target.pk}_'
+    for name in os.listdir(thumbnail_dir()):
+        if name.startswith(prefix) and os.path.join(thumbnail_dir(), name) != path and not name.endswith('.tmp'):
+            try:
+                os.remove(os.path.join(thumbnail_dir(), name))
+            except OSError:
+                pass
+    logger.debug(f"Thumbnail of target {target.pk} rendered")
+    return path
+
+
+def _render_in_background(target) -> None:
+    try:
+        render_thumbnail(target)
+    except Exception as e:
+        logger.warning(f"Error while rendering thumbnail of target {target.pk}: {e}")
+    finally:
+        with _pending_lock:
+            _pending.discard(target.pk)
+
+
+def schedule_thumbnail(target) -> None:
+    """
+    Queues rendering of the target's thumbnail in the background thread, once per target.
+    """
+    with _pending_lock:
+        if target.pk in _pending:
+            return
+        _pending.add(target.pk)
+    _renderer.submit(_render_in_background, target)
+
+
+def get_thumbnail_version(target) -> Optional[str]:
+    """
+    Reader API: the version of the target's thumbnail when it is rendered and up to date, otherwise None.
+    Schedules rendering of a missing or outdated thumbnail.
+    """
+    version = thumbnail_version(target)
+    if version is None:
+        return None
+    if os.path.exists(thumbnail_path(target.pk, version)):
+        return version
+    schedule_thumbnail(target)
+    return None
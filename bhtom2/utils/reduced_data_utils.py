@@ -1,202 +1,178 @@
-from django.conf import settings
+import csv
+from typing import Any, Iterable, Iterator, List, Sequence, Tuple, Union
+from urllib.parse import quote
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from django.http import StreamingHttpResponse
 from bhtom2.utils.bhtom_logger import BHTOMLogger
 from guardian.shortcuts import get_objects_for_user
-from typing import Any, List, Tuple
 from django.contrib.auth.models import User
 
-from bhtom_base.bhtom_dataproducts.models import ReducedDatum, ReducedDatumUnit
+from bhtom_base.bhtom_dataproducts.models import ReducedDatumUnit
 from bhtom_base.bhtom_targets.models import Target
-
-from tempfile import NamedTemporaryFile
-import pandas as pd
+from bhtom2.utils.light_curve_store import get_light_curve
 
 
 logger: BHTOMLogger = BHTOMLogger(__name__, 'Bhtom: Reduced Datum utils')
 
+# rows converted from the light-curve store at once and size of the chunks sent to the client
+ROWS_CHUNK_SIZE: int = 2000
+STREAM_CHUNK_SIZE: int = 64 * 1024
+
+DATUM_COLUMNS: Tuple[str, ...] = ('mjd', 'value', 'error', 'facility', 'filter', 'observer')
+
+
+class Echo:
+    """File-like object for csv.writer: returns the written line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows: Iterable[Sequence[Any]],
+               columns: Sequence[str],
+               header_lines: Sequence[str] = (),
+               delimiter: str = ';') -> Iterator[str]:
+    """
+    Writes the header lines, the column names and the rows as CSV, yielding chunks of about STREAM_CHUNK_SIZE
+    characters. None is written as an empty field, like pandas.DataFrame.to_csv does.
+    """
+    writer = csv.writer(Echo(), delimiter=delimiter, lineterminator='\n')
+    chunk: List[str] = [line + '\n' for line in header_lines]
+    chunk.append(writer.writerow(columns))
+    size = sum(len(line) for line in chunk)
+    for row in rows:
+        line = writer.writerow(row)
+        chunk.append(line)
+        size += len(line)
+        if size >= STREAM_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+def streaming_file_response(stream: Iterable[str], filename: str,
+                            content_type: str = 'text/csv') -> StreamingHttpResponse:
+    """
+    Sends the stream as a file attachment, with the same Content-Disposition as FileResponse(as_attachment=True).
+    """
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    try:
+        filename.encode('ascii')
+        file_expr = 'filename="{}"'.format(filename.replace('\\', '\\\\').replace('"', r'\"'))
+    except UnicodeEncodeError:
+        file_expr = "filename*=utf-8''{}".format(quote(filename))
+    response['Content-Disposition'] = 'attachment; {}'.format(file_expr)
+    return response
+
+
+def get_target(target_id_name: Union[Target, int, str]) -> Target:
+    # if target_id_name is int, this is the id, if str this is name
+    if isinstance(target_id_name, Target):
+        return target_id_name
+    if isinstance(target_id_name, int):
+        return Target.objects.get(pk=target_id_name)
+    return Target.objects.get(name=target_id_name)
+
+
+def table_rows(table: pa.Table, columns: Sequence[str]) -> Iterator[Tuple]:
+    """
+    The columns of the light-curve table as tuples, converted ROWS_CHUNK_SIZE rows at a time.
+    """
+    for offset in range(0, table.num_rows, ROWS_CHUNK_SIZE):
+        yield from zip(*table.slice(offset, ROWS_CHUNK_SIZE).select(list(columns)).to_pydict().values())
+
+
+def _datum_rows(target: Target, unit: str) -> Iterator[Tuple]:
+    return table_rows(get_light_curve(target.pk, units=[unit]), DATUM_COLUMNS)
+
 
-def get_photometry_data_table(target: Target) -> Tuple[List[List[str]], List[str]]:
+def get_photometry_data_table(target: Target) -> Tuple[Iterator[Tuple], List[str]]:
 
     logger.debug(
         f'Downloading photometry as a table for target {target.name}...')
 
-    datums = ReducedDatum.objects.filter(target=target,
-                                         data_type=settings.DATA_PRODUCT_TYPES['photometry'][0],
-                                         value_unit=ReducedDatumUnit.MAGNITUDE,
-                                         active_flg=True)
-
     columns: List[str] = ['MJD', 'Magnitude',
                           'Error', 'Facility', 'Filter', 'Observer']
-    data: List[List[Any]] = []
-
-    data = [[datum.mjd,
-             datum.value,
-             datum.error,
-             datum.facility,
-             datum.filter,
-             datum.observer] for datum in datums]
 
-    return data, columns
+    return _datum_rows(target, ReducedDatumUnit.MAGNITUDE), columns
 
 
-def get_radio_data_table(target: Target) -> Tuple[List[List[str]], List[str]]:
+def get_radio_data_table(target: Target) -> Tuple[Iterator[Tuple], List[str]]:
 
     logger.debug(
         f'Downloading radio data as a table for target {target.name}...')
 
-    radio_datums = ReducedDatum.objects.filter(target=target,
-                                               data_type=settings.DATA_PRODUCT_TYPES['photometry'][0],
-                                               value_unit=ReducedDatumUnit.MILLIJANSKY,
-                                               active_flg=True)
-
     columns: List[str] = ['MJD', 'mJy',
                           'Error', 'Facility', 'Filter', 'Observer']
-    data: List[List[Any]] = []
-
-    data = [[datum.mjd,
-             datum.value,
-             datum.error,
-             datum.facility,
-             datum.filter,
-             datum.observer] for datum in radio_datums]
 
-    return data, columns
+    return _datum_rows(target, ReducedDatumUnit.MILLIJANSKY), columns
+
+
+def _merge_high_energy_rows(datums: Iterable[Tuple]) -> Iterator[List[Any]]:
+    """
+    Merges the counts and flux datums measured at the same (mjd, facility, band, observer) into one row.
+    The datums come ordered by that key, so only the current row is held.
+    """
+    row, row_key = None, None
+    for mjd, value, error, facility, band, observer, unit in datums:
+        key = (mjd, facility, band, observer)
+        if row is None or key != row_key:
+            if row is not None:
+                yield row
+            row_key = key
+            row = [mjd, None, None, None, None, facility, band, observer]
+        if unit == ReducedDatumUnit.COUNTS:
+            row[1], row[2] = value, error
+        else:
+            row[3], row[4] = value, error
+    if row is not None:
+        yield row
 
 
-def get_high_energy_data_table(target: Target) -> Tuple[List[List[str]], List[str]]:
+def get_high_energy_data_table(target: Target) -> Tuple[Iterator[List[Any]], List[str]]:
 
     logger.debug(
         f'Downloading high energy data as a table for target {target.name}...')
 
-    counts_datums = ReducedDatum.objects.filter(
-        target=target,
-        data_type=settings.DATA_PRODUCT_TYPES['photometry'][0],
-        value_unit=ReducedDatumUnit.COUNTS,
-        active_flg=True
-    )
-    flux_datums = ReducedDatum.objects.filter(
-        target=target,
-        data_type=settings.DATA_PRODUCT_TYPES['photometry'][0],
-        value_unit=ReducedDatumUnit.FLUX,
-        active_flg=True
-    )
+    table = get_light_curve(target.pk, units=[ReducedDatumUnit.COUNTS, ReducedDatumUnit.FLUX], sort_by_mjd=False)
+    table = table.take(pc.sort_indices(table, sort_keys=[(column, 'ascending') for column in
+                                                         ('mjd', 'facility', 'filter', 'observer', 'id')]))
+    datums = table_rows(table, DATUM_COLUMNS + ('unit',))
 
     columns: List[str] = ['MJD', 'COUNTS', 'COUNTS_Error',
                           'FLUX', 'FLUX_Error', 'Facility', 'Band', 'Observer']
 
-    merged_data: dict = {}
-
-    for datum in counts_datums:
-        key = (datum.mjd, datum.facility, datum.filter, datum.observer)
-        merged_data[key] = [
-            datum.mjd,
-            datum.value,
-            datum.error,
-            None,
-            None,
-            datum.facility,
-            datum.filter,
-            datum.observer
-        ]
-
-    for datum in flux_datums:
-        key = (datum.mjd, datum.facility, datum.filter, datum.observer)
-        if key not in merged_data:
-            merged_data[key] = [
-                datum.mjd,
-                None,
-                None,
-                datum.value,
-                datum.error,
-                datum.facility,
-                datum.filter,
-                datum.observer
-            ]
-        else:
-            merged_data[key][3] = datum.value
-            merged_data[key][4] = datum.error
-
-    data: List[List[Any]] = list(merged_data.values())
+    return _merge_high_energy_rows(datums), columns
 
-    return data, columns
 
-
-def save_data_to_temporary_file(data: List[List[Any]],
-                                columns: List[str],
-                                filename: str,
-                                sort_by: str = 'MJD',
-                                sort_by_asc: bool = True) -> Tuple[NamedTemporaryFile, str]:
-    df: pd.DataFrame = pd.DataFrame(data=data,
-                                    columns=columns).sort_values(by=sort_by, ascending=sort_by_asc)
-
-    tmp: NamedTemporaryFile = NamedTemporaryFile(mode="w+",
-                                                 suffix=".csv",
-                                                 prefix=filename,
-                                                 delete=False)
-
-    with open(tmp.name, 'w') as f:
-        df.to_csv(f.name,
-                  index=False,
-                  sep=';')
-
-    return tmp, filename
-
-
-def save_data_to_latex_table(data: List[List[Any]],
-                             columns: List[str],
-                             filename: str) -> Tuple[NamedTemporaryFile, str]:
-    from .latex_utils import data_to_latex_table
-
-    latex_table_str: str = data_to_latex_table(
-        data=data, columns=columns, filename=filename)
-
-    tmp: NamedTemporaryFile = NamedTemporaryFile(mode="w+",
-                                                 suffix=".csv",
-                                                 prefix=filename,
-                                                 delete=False)
-
-    with open(tmp.name, 'w') as f:
-        f.write(latex_table_str)
-
-    return tmp, filename
-
-
-def save_photometry_data_for_target_to_csv_file(target_id_name) -> Tuple[NamedTemporaryFile, str]:
-    #if target_id is int, this is the id, if str this is name:
-    if isinstance(target_id_name, int):
-        target: Target = Target.objects.get(pk=target_id_name)
-    else:
-        target: Target = Target.objects.get(name=target_id_name)
+def stream_photometry_data_for_target(target_id_name) -> Tuple[Iterator[str], str]:
+    target: Target = get_target(target_id_name)
 
     data, columns = get_photometry_data_table(target)
 
     filename: str = "target_%s_photometry.csv" % target.name
 
-    return save_data_to_temporary_file(data, columns, filename)
+    return stream_csv(data, columns), filename
 
 
-def save_radio_data_for_target_to_csv_file(target_id_name) -> Tuple[NamedTemporaryFile, str]:
-    #if target_id is int, this is the id, if str this is name:
-    if isinstance(target_id_name, int):
-        target: Target = Target.objects.get(pk=target_id_name)
-    else:
-        target: Target = Target.objects.get(name=target_id_name)
+def stream_radio_data_for_target(target_id_name) -> Tuple[Iterator[str], str]:
+    target: Target = get_target(target_id_name)
 
     data, columns = get_radio_data_table(target)
 
     filename: str = "target_%s_radio.csv" % target.name
 
-    return save_data_to_temporary_file(data, columns, filename)
+    return stream_csv(data, columns), filename
 
 
-def save_high_energy_data_for_target_to_csv_file(target_id_name) -> Tuple[NamedTemporaryFile, str]:
-    #if target_id is int, this is the id, if str this is name:
-    if isinstance(target_id_name, int):
-        target: Target = Target.objects.get(pk=target_id_name)
-    else:
-        target: Target = Target.objects.get(name=target_id_name)
+def stream_high_energy_data_for_target(target_id_name) -> Tuple[Iterator[str], str]:
+    target: Target = get_target(target_id_name)
 
     data, columns = get_high_energy_data_table(target)
 
     filename: str = "target_%s_highenergy.csv" % target.name
 
-    return save_data_to_temporary_file(data, columns, filename)
+    return stream_csv(data, columns), filename
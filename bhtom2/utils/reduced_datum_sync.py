@@ -0,0 +1,90 @@
+"""
+Incremental sync of ReducedDatums: what changed for a set of targets since a watermark.
+
+The watermark is {'last_id': highest datum id seen, 'modified': start time of the previous sync}. New datums are
+found by id (so datums created with bulk_create are included), updates, deactivations and deletions by the
+ReducedDatumChange rows, through the (target_id, modified) index. Those rows are written by database triggers
+(migration 0011), so the changes of the upload service and CPCS, which write without the ORM, are included too.
+The first page of a sync reads the changes from SYNC_OVERLAP before the watermark time, so a row may be returned
+twice; clients upsert by id. The following pages continue after the (modified, datum id) of the last change
+returned, the 'cursor' of the watermark, so any number of changes with the same time are paged through.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from bhtom_base.bhtom_dataproducts.models import ReducedDatum
+from bhtom2.models import ReducedDatumChange
+from bhtom2.utils.bhtom_logger import BHTOMLogger
+
+logger: BHTOMLogger = BHTOMLogger(__name__, 'Bhtom: Reduced datum sync')
+
+# most inserted datums and most changes returned at once
+SYNC_PAGE_SIZE: int = 5000
+
+# changes committed by transactions which started before the previous sync can carry an earlier time
+SYNC_OVERLAP: timedelta = timedelta(seconds=60)
+
+
+def changes_since(target_ids: Iterable[int], last_id: Optional[int] = None, modified=None,
+                  cursor: Optional[Tuple[datetime, int]] = None, limit: int = SYNC_PAGE_SIZE) -> Dict:
+    """
+    Returns the datums of the targets inserted after last_id, the datums updated, deactivated and deleted
+    after modified (after the (modified, datum id) cursor on the following pages of a sync), and the new
+    watermark. Without last_id (a full sync) all datums are returned as inserted.
+    has_more is set when a limit was hit; the client then asks again with the new watermark.
+    """
+    target_ids = list(target_ids)
+    now = timezone.now()
+    datums = ReducedDatum.objects.filter(target_id__in=target_ids)
+
+    inserted_query = datums.filter(id__gt=last_id) if last_id is not None else datums
+    inserted: List[ReducedDatum] = list(inserted_query.order_by('id')[:limit + 1])
+    more_inserted = len(inserted) > limit
+    inserted = inserted[:limit]
+    if more_inserted:
+        new_last_id = inserted[-1].id
+    else:
+        new_last_id = max(datums.aggregate(last_id=Max('id'))['last_id'] or 0, last_id or 0)
+
+    updated: List[ReducedDatum] = []
+    deactivated: List[int] = []
+    deleted: List[int] = []
+    more_changes = False
+    new_cursor = None
+    # a sync continued with a cursor keeps its start time, the next sync reads from there
+    new_modified = modified if cursor is not None and modified is not None else now
+    if last_id is not None:
+        # datums inserted since are returned as inserted, with their current values
+        changes = ReducedDatumChange.objects.filter(target_id__in=target_ids, datum_id__lte=last_id)
+        if cursor is not None:
+            cursor_modified, cursor_datum_id = cursor
+            changes = changes.filter(Q(modified__gt=cursor_modified)
+                                     | Q(modified=cursor_modified, datum_id__gt=cursor_datum_id))
+        elif modified is not None:
+            changes = changes.filter(modified__gt=modified - SYNC_OVERLAP)
+        changed = list(changes.order_by('modified', 'datum_id')
+                       .values_list('datum_id', 'active', 'deleted', 'modified')[:limit + 1])
+        more_changes = len(changed) > limit
+        changed = changed[:limit]
+        if more_changes:
+            new_cursor = {'modified': changed[-1][3], 'datum_id': changed[-1][0]}
+
+        deleted = [datum_id for datum_id, active, is_deleted, _ in changed if is_deleted]
+        deactivated = [datum_id for datum_id, active, is_deleted, _ in changed if not is_deleted and not active]
+        updated_ids = [datum_id for datum_id, active, is_deleted, _ in changed if not is_deleted and active]
+        updated = list(ReducedDatum.objects.filter(id__in=updated_ids).order_by('id'))
+
+    logger.debug(f"Sync of {len(target_ids)} targets: {len(inserted)} inserted, {len(updated)} updated, "
+                 f"{len(deactivated)} deactivated, {len(deleted)} deleted")
+    return {
+        'inserted': inserted,
+        'updated': updated,
+        'deactivated': deactivated,
+        'deleted': deleted,
+        'watermark': {'last_id': new_last_id, 'modified': new_modified, 'cursor': new_cursor},
+        'has_more': more_inserted or more_changes,
+    }
@@ -0,0 +1,151 @@
+from math import cos, radians, sin
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from django.db.models import F, FloatField, ExpressionWrapper, Value
+from django.db.models.functions import ACos, Degrees, Greatest, Least
+
+from bhtom_base.bhtom_targets.models import Target
+from bhtom2.models import TargetSkyPosition
+from bhtom2.utils.bhtom_logger import BHTOMLogger
+
+logger: BHTOMLogger = BHTOMLogger(__name__, 'Bhtom: Sky index')
+
+# widening of the declination band, guards against rounding of sin() at the band edges
+Z_BAND_MARGIN: float = 1e-12
+
+
+def unit_vector(ra: float, dec: float) -> Tuple[float, float, float]:
+    ra_rad = radians(ra)
+    dec_rad = radians(dec)
+    return cos(dec_rad) * cos(ra_rad), cos(dec_rad) * sin(ra_rad), sin(dec_rad)
+
+
+def sky_position_for_target(target: Target) -> Optional[TargetSkyPosition]:
+    if target.ra is None or target.dec is None:
+        return None
+    x, y, z = unit_vector(float(target.ra), float(target.dec))
+    return TargetSkyPosition(target_id=target.pk, x=x, y=y, z=z)
+
+
+def update_sky_position(target: Target) -> None:
+    """
+    Stores the sky position of a single target, or removes it if the target has no coordinates.
+    Called from the Target post_save signal.
+    """
+    position = sky_position_for_target(target)
+    if position is None:
+        TargetSkyPosition.objects.filter(target_id=target.pk).delete()
+        return
+    TargetSkyPosition.objects.update_or_create(target_id=target.pk,
+                                               defaults={'x': position.x, 'y': position.y, 'z': position.z})
+
+
+def bulk_update_sky_positions(targets: Iterable[Target], batch_size: int = 1000) -> int:
+    """
+    Stores the sky positions of many targets at once (backfill, bulk imports), bypassing signals.
+    Returns the number of stored positions.
+    """
+    positions = [position for position in (sky_position_for_target(target) for target in targets)
+                 if position is not None]
+    if not positions:
+        return 0
+    existing = set(TargetSkyPosition.objects.filter(target_id__in=[p.target_id for p in positions])
+                   .values_list('target_id', flat=True))
+    TargetSkyPosition.objects.bulk_update([p for p in positions if p.target_id in existing],
+                                          ['x', 'y', 'z'], batch_size=batch_size)
+    TargetSkyPosition.objects.bulk_create([p for p in positions if p.target_id not in existing],
+                                          batch_size=batch_size)
+    return len(positions)
+
+
+def cone_search_filter(queryset, ra, dec, radius):
+    """
+    Drop-in replacement for bhtom_base.bhtom_targets.utils.cone_search_filter backed by TargetSkyPosition.
+
+    The declination band [dec - radius, dec + radius] is selected with the index on z = sin(dec),
+    then the exact test cos(separation) >= cos(radius) is a dot product of the stored unit vectors.
+    Like the original, the queryset is annotated with the separation in degrees.
+
+    :param queryset: Target queryset
+    :param ra: Right Ascension of the cone center in degrees
+    :param dec: Declination of the cone center in degrees
+    :param radius: cone radius in degrees
+    """
+    ra = float(ra)
+    dec = float(dec)
+    radius = float(radius)
+
+    x0, y0, z0 = unit_vector(ra, dec)
+    dot = ExpressionWrapper(F('sky_position__x') * x0 + F('sky_position__y') * y0 + F('sky_position__z') * z0,
+                            output_field=FloatField())
+
+    queryset = queryset.annotate(
+        cos_separation=dot,
+        separation=ExpressionWrapper(Degrees(ACos(Greatest(Least(dot, Value(1.0)), Value(-1.0)))), output_field=FloatField())
+    )
+    if radius >= 180:
+        return queryset.filter(sky_position__isnull=False)
+
+    z_min = sin(radians(max(-90.0, dec - radius))) - Z_BAND_MARGIN
+    z_max = sin(radians(min(90.0, dec + radius))) + Z_BAND_MARGIN
+    return queryset.filter(sky_position__z__gte=z_min, sky_position__z__lte=z_max,
+                           cos_separation__gte=cos(radians(radius)))
+
+
+class InMemorySkyIndex:
+    """
+    Sky positions held in memory for many coordinate lookups, e.g. duplicate detection during bulk imports.
+
+    Positions given at construction are sorted by z = sin(dec), so a query selects the declination band
+    with a binary search and tests only the band with a vectorized dot product. Positions added later
+    (e.g. accepted rows of the imported file) are kept in a separate growing buffer.
+    """
+
+    def __init__(self, names: Iterable[str], ra: Iterable[float], dec: Iterable[float]):
+        names = np.asarray(list(names), dtype=object)
+        vectors = self._unit_vectors(np.asarray(list(ra), dtype=float), np.asarray(list(dec), dtype=float))
+        order = np.argsort(vectors[:, 2], kind='stable')
+        self._names = names[order]
+        self._vectors = vectors[order]
+        self._added_names: List[str] = []
+        self._added_vectors = np.empty((64, 3))
+
+    @classmethod
+    def from_queryset(cls, queryset) -> 'InMemorySkyIndex':
+        rows = list(queryset.filter(ra__isnull=False, dec__isnull=False).values_list('name', 'ra', 'dec'))
+        return cls([row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows])
+
+    @staticmethod
+    def _unit_vectors(ra: np.ndarray, dec: np.ndarray) -> np.ndarray:
+        ra_rad = np.radians(ra)
+        dec_rad = np.radians(dec)
+        return np.column_stack((np.cos(dec_rad) * np.cos(ra_rad), np.cos(dec_rad) * np.sin(ra_rad), np.sin(dec_rad)))
+
+    def add(self, name: str, ra: float, dec: float) -> None:
+        count = len(self._added_names)
+        if count == len(self._added_vectors):
+            self._added_vectors = np.concatenate((self._added_vectors, np.empty_like(self._added_vectors)))
+        self._added_vectors[count] = unit_vector(float(ra), float(dec))
+        self._added_names.append(name)
+
+    def query(self, ra: float, dec: float, radius: float) -> List[str]:
+        """
+        Returns the names of all positions within radius (degrees) of (ra, dec).
+        """
+        center = np.asarray(unit_vector(float(ra), float(dec)))
+        min_cos = cos(radians(radius))
+
+        z_min = sin(radians(max(-90.0, dec - radius))) - Z_BAND_MARGIN
+        z_max = sin(radians(min(90.0, dec + radius))) + Z_BAND_MARGIN
+        start = np.searchsorted(self._vectors[:, 2], z_min, side='left')
+        stop = np.searchsorted(self._vectors[:, 2], z_max, side='right')
+        band = self._vectors[start:stop]
+        found = list(self._names[start:stop][band @ center >= min_cos])
+
+        count = len(self._added_names)
+        if count:
+            matches = np.nonzero(self._added_vectors[:count] @ center >= min_cos)[0]
+            found.extend(self._added_names[i] for i in matches)
+        return found
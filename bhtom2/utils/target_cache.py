@@ -0,0 +1,153 @@
+"""
+Key-scoped invalidation of the targetList and targetDetails caches.
+
+Every target has a version and each cache has a generation. The versions are TargetDataVersion rows, bumped by
+database triggers whenever the target or its datums are written (by any writer), so nothing is done here on a
+write, and reading the versions of a whole target list is one query. A cached target table (per filter query)
+keeps the version of every target it shows; it is used while the query returns the same targets and none of
+their versions changed, and only the rows of changed targets are rendered again. Stale entries are not looked up
+any more and expire or are culled. The generations are time stamps in the caches: a culled generation never
+brings back an old entry, it only invalidates the whole cache once.
+The photometry version of a target keys values computed from its photometry (e.g. the photometry stats).
+"""
+
+import hashlib
+import time
+from typing import Dict, Iterable
+
+from django.core.cache import caches
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from bhtom2.models import TargetDataVersion
+from bhtom2.utils.bhtom_logger import BHTOMLogger
+from bhtom2.utils.photometry_summary import refresh_photometry_summaries
+
+logger: BHTOMLogger = BHTOMLogger(__name__, 'Bhtom: Target cache')
+
+TARGET_LIST_CACHE = 'targetList'
+TARGET_DETAILS_CACHE = 'targetDetails'
+
+# rendered tables of filter queries that are not requested any more expire after a week
+TARGET_TABLE_TIMEOUT: int = 7 * 24 * 3600
+
+
+def _new_version() -> str:
+    return str(time.time_ns())
+
+
+def _get_version(cache_name: str, key: str) -> str:
+    cache = caches[cache_name]
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def query_hash(query_string: str) -> str:
+    return hashlib.sha1((query_string or '').encode()).hexdigest()
+
+
+def get_cache_generation(cache_name: str) -> str:
+    return _get_version(cache_name, 'generation')
+
+
+def bump_cache_generation(cache_name: str) -> None:
+    """
+    Invalidates all entries of the cache at once (admin reset), without removing any file.
+    """
+    caches[cache_name].set('generation', _new_version(), None)
+
+
+def get_target_version(target_id) -> int:
+    return TargetDataVersion.objects.filter(target_id=target_id).values_list('version', flat=True).first() or 0
+
+
+def get_target_versions(target_ids: Iterable) -> Dict:
+    target_ids = list(target_ids)
+    versions = dict(TargetDataVersion.objects.filter(target_id__in=target_ids).values_list('target_id', 'version'))
+    return {target_id: versions.get(target_id, 0) for target_id in target_ids}
+
+
+def bump_target_version(target_id) -> None:
+    """
+    Invalidates the target's row in the cached tables and its details fragments, for changes the triggers do not
+    see (e.g. of related rows). Writes to the target and its datums bump the version by themselves.
+    """
+    TargetDataVersion.objects.get_or_create(target_id=target_id)
+    TargetDataVersion.objects.filter(target_id=target_id).update(version=F('version') + 1)
+
+
+def get_photometry_version(target_id) -> int:
+    """
+    Version of the target's photometry, for caching values computed from it: changes with every insert, update
+    or delete of its photometry datums, also those made without the ORM.
+    """
+    return TargetDataVersion.objects.filter(target_id=target_id) \
+        .values_list('photometry_version', flat=True).first() or 0
+
+
+def render_target_table(object_list, query_string: str = '') -> str:
+    """
+    Renders the target list table, cached per filter query.
+
+    The cached table is used while the query returns the same targets and none of their versions changed.
+    Otherwise it is rebuilt from the cached rows, and only the rows of targets whose version changed are rendered.
+    """
+    cache = caches[TARGET_LIST_CACHE]
+    current_hash = query_hash(query_string)
+    entry_key = f'target_table:{get_cache_generation(TARGET_LIST_CACHE)}:{current_hash}'
+    if hasattr(object_list, 'values_list'):
+        target_ids = list(object_list.values_list('pk', flat=True))
+    else:
+        target_ids = [target.pk for target in object_list]
+
+    # versions are read before the targets, so a change made meanwhile invalidates what is stored here
+    versions = get_target_versions(target_ids)
+    entry = cache.get(entry_key) or {}
+    cached_rows = entry.get('rows', {})
+    if entry.get('ids') == target_ids and \
+            all(cached_rows.get(target_id, (None,))[0] == versions[target_id] for target_id in target_ids):
+        return mark_safe(entry['html'])
+
+    targets = list(object_list)
+    target_ids = [target.pk for target in targets]
+    for target in targets:
+        if target.pk not in versions:
+            versions[target.pk] = get_target_version(target.pk)
+    changed = [target for target in targets
+               if cached_rows.get(target.pk, (None,))[0] != versions[target.pk]]
+    # the rendered rows show the point counts of the summaries, which deletes leave behind
+    summaries = refresh_photometry_summaries([target.pk for target in changed]) if changed else {}
+    rows = {}
+    rendered = 0
+    for target in targets:
+        version = versions[target.pk]
+        cached_row = cached_rows.get(target.pk)
+        if cached_row is not None and cached_row[0] == version:
+            rows[target.pk] = cached_row
+        else:
+            if target.pk in summaries:
+                target.photometry_summary = summaries[target.pk]
+            rows[target.pk] = (version,
+                               render_to_string('bhtom_targets/partials/target_table_row.html', {'target': target}))
+            rendered += 1
+
+    html = render_to_string('bhtom_targets/partials/target_table.html', {
+        'object_list': targets,
+        'rows': [mark_safe(rows[target.pk][1]) for target in targets],
+        'query_string': query_string,
+    })
+
+    cache.set(entry_key, {'ids': target_ids, 'rows': rows, 'html': html}, TARGET_TABLE_TIMEOUT)
+    logger.debug(f"Target table {current_hash} rebuilt, {rendered} of {len(targets)} rows rendered")
+    return mark_safe(html)
+
+
+def target_details_version(target_id) -> str:
+    """
+    Version of the cached fragments of the target's details page.
+    """
+    return f'{get_cache_generation(TARGET_DETAILS_CACHE)}.{get_target_version(target_id)}'
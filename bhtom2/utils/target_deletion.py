@@ -0,0 +1,39 @@
+"""
+Targets being deleted in the current thread.
+
+Deleting a Target first removes the rows of the models without signal receivers (name keys, photometry summary,
+datum changes) with one query each, then deletes the datums and names one by one, sending their post_delete
+signals while the target row still exists. Receivers which write rows pointing at the target skip them while it
+is being deleted: the foreign key is checked at commit on Postgres, so such a row makes the whole delete fail.
+
+The mark is set by the Target pre_delete signal and removed by its post_delete signal. A delete which fails in
+between leaves the mark of a target whose id is not reused; its receivers skip the derived rows, which the
+rebuild commands (update_name_index, update_photometry_summaries) restore.
+"""
+
+import threading
+from typing import Set
+
+_local = threading.local()
+
+
+def _deleted_target_ids() -> Set:
+    target_ids = getattr(_local, 'target_ids', None)
+    if target_ids is None:
+        target_ids = _local.target_ids = set()
+    return target_ids
+
+
+def mark_target_deleted(target_id) -> None:
+    _deleted_target_ids().add(target_id)
+
+
+def unmark_target_deleted(target_id) -> None:
+    _deleted_target_ids().discard(target_id)
+
+
+def is_target_deleted(target_id) -> bool:
+    """
+    True while the target is being deleted in this thread.
+    """
+    return target_id in _deleted_target_ids()
@@ -41,6 +41,8 @@ ALLOWED_HOSTS = [] + list(secret.get("ALLOWED_HOSTS", 'localhost').split(','))
 SITE_ID = int(secret.get("SITE_ID", 1))
 BHTOM_URL = secret.get('BHTOM_URL', '')
 HARVESTER_URL = secret.get('HARVESTER_URL', '')
+HARVESTER_MAX_WORKERS = int(secret.get('HARVESTER_MAX_WORKERS', 8))
+HARVESTER_TIMEOUT = int(secret.get('HARVESTER_TIMEOUT', 30))
 CPCS_URL = secret.get('CPCS_URL', '')
 UPLOAD_SERVICE_URL = secret.get('UPLOAD_SERVICE_URL', '')
 
@@ -56,6 +58,14 @@ DATA_ARCHIVE_PATH = secret.get('DATA_ARCHIVE_PATH', '/data')
 DATA_TARGETS_PATH = DATA_MEDIA_PATH + secret.get('DATA_TARGETS_PATH', '/data')
 DATA_PLOTS_PATH = secret.get('DATA_PLOTS_PATH', '/data')
 DATA_CACHE_PATH = secret.get('DATA_CACHE_PATH', '/data')
+# memory of the parsed plots cached by each worker process (bhtom2.utils.plot_cache)
+PLOT_CACHE_MAX_BYTES = int(secret.get('PLOT_CACHE_MAX_BYTES', 128 * 1024 * 1024))
+THUMBNAIL_FORMAT = secret.get('THUMBNAIL_FORMAT', 'png')
+# multi-start microlensing fits: number of starts, worker processes and alternative solutions shown
+MICROLENSING_FIT_STARTS = int(secret.get('MICROLENSING_FIT_STARTS', 32))
+MICROLENSING_FIT_WORKERS = int(secret.get('MICROLENSING_FIT_WORKERS', 4))
+MICROLENSING_FIT_TOP_K = int(secret.get('MICROLENSING_FIT_TOP_K', 5))
+MICROLENSING_SCREENING_WORKERS = int(secret.get('MICROLENSING_SCREENING_WORKERS', 4))
 DELETE_FITS_FILE_DAY = int(secret.get('DELETE_FITS_FILE_DAY', 3))
 DELETE_FITS_ERROR_FILE_DAY = int(secret.get('DELETE_FITS_ERROR_FILE_DAY', 30))
 
@@ -106,6 +116,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.sites',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_extensions',
     'guardian',
     'bhtom_base.bhtom_common.apps.TomCommonConfig',
@@ -334,11 +345,17 @@ CACHES = {
     },
     'targetList': {
         'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-        'LOCATION': DATA_CACHE_PATH + '/targetList'
+        'LOCATION': DATA_CACHE_PATH + '/targetList',
+        # FileBasedCache lists the whole directory on every set, keep it small; the target versions are kept
+        # in the database, a culled entry is only rendered again (see bhtom2.utils.target_cache)
+        'OPTIONS': {'MAX_ENTRIES': 5000}
     },
     'targetDetails': {
         'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-        'LOCATION': DATA_CACHE_PATH + '/targetDetails'
+        'LOCATION': DATA_CACHE_PATH + '/targetDetails',
+        # FileBasedCache lists the whole directory on every set, keep it small; the target versions are kept
+        # in the database, a culled entry is only rendered again (see bhtom2.utils.target_cache)
+        'OPTIONS': {'MAX_ENTRIES': 5000}
     }
 }
 